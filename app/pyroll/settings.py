@@ -56,6 +56,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its latency covers the other middleware; off unless QUERY_INSTRUMENTATION is set
+    'user.instrumentation.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -100,6 +102,46 @@ DATABASES = {
 	}
 }
 
+# On PostgreSQL, migrations create the pg_trgm extension (contrib modules,
+# CREATE privilege on the database) for name search indexes. Without it they
+# skip those indexes and search falls back to its portable tables; see
+# user/extensions.py for adding it later.
+
+# Seconds a connection is kept open for later requests (0: one connection
+# per request). Reused connections are checked first unless
+# CONN_HEALTH_CHECKS is off.
+DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('CONN_MAX_AGE', 0))
+DATABASES['default']['CONN_HEALTH_CHECKS'] = os.environ.get('CONN_HEALTH_CHECKS', 'True') == 'True'
+
+# PostgreSQL only: a psycopg connection pool of DB_POOL_MIN_SIZE to
+# DB_POOL_MAX_SIZE connections per process, replacing CONN_MAX_AGE. Requests
+# wait up to DB_POOL_TIMEOUT seconds for a free connection; connections are
+# replaced after DB_POOL_MAX_LIFETIME seconds and, with CONN_HEALTH_CHECKS,
+# checked when handed out.
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 0))
+if DB_POOL_MAX_SIZE:
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+        },
+    }
+
+# Read replica for list, report and export queries (see user/routers.py)
+REPLICA_HOST = os.environ.get('REPLICA_HOST')
+if REPLICA_HOST:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': REPLICA_HOST,
+        'PORT': os.environ.get('REPLICA_PORT') or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['user.routers.ReplicaRouter']
+
 
 
 # Password validation
@@ -149,3 +191,154 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = "user.CustomUser"
 
 
+# Payroll
+
+# Recompute stale FinalImpactPerMonth rows as soon as an input change commits,
+# inside the request that made it: one company-wide formula edit recomputes the
+# whole company. Off by default: `manage.py payroll_worker` recomputes stale rows
+# whenever its queue is empty (or run `manage.py compute_payroll --stale`).
+PAYROLL_RECOMPUTE_ON_SAVE = os.environ.get('PAYROLL_RECOMPUTE_ON_SAVE', 'False') == 'True'
+
+# Payroll runs (see user/payroll_runs.py)
+PAYROLL_RUN_CHUNK_SIZE = int(os.environ.get('PAYROLL_RUN_CHUNK_SIZE', 1000))
+PAYROLL_RUN_WORKERS = int(os.environ.get('PAYROLL_RUN_WORKERS', 0)) or None
+PAYROLL_RUN_MAX_ATTEMPTS = int(os.environ.get('PAYROLL_RUN_MAX_ATTEMPTS', 3))
+PAYROLL_RUN_LEASE_SECONDS = int(os.environ.get('PAYROLL_RUN_LEASE_SECONDS', 600))
+# A failed chunk waits PAYROLL_RUN_RETRY_DELAY seconds, doubling per attempt
+PAYROLL_RUN_RETRY_DELAY = int(os.environ.get('PAYROLL_RUN_RETRY_DELAY', 30))
+
+# Employees per transaction when applying or rolling back an increment
+# cycle (see user/increments.py); row locks are held for one chunk.
+INCREMENT_CHUNK_SIZE = int(os.environ.get('INCREMENT_CHUNK_SIZE', 1000))
+
+
+# Process-local default cache. Its 300 entry default is too small for a
+# permission snapshot and a Basic login per active user.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('LOCAL_CACHE_MAX_ENTRIES', 10000))},
+    },
+}
+
+
+# Lookup table cache (see user/lookups.py)
+
+# Seconds a process trusts its copy of Company, Department, ... before
+# checking for changes made by other processes.
+LOOKUP_CACHE_TIMEOUT = int(os.environ.get('LOOKUP_CACHE_TIMEOUT', 60))
+
+# Optional CACHES alias shared between processes (e.g. Redis/Memcached)
+LOOKUP_CACHE_ALIAS = os.environ.get('LOOKUP_CACHE_ALIAS') or None
+
+
+# Bulk user provisioning (see user/provisioning.py)
+
+# Processes hashing passwords in `manage.py create_users`; defaults to the CPU count
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 0)) or None
+
+
+# Password hashing (see user/hashers.py)
+
+# Hasher for new passwords: 'pbkdf2' (Django's default), 'scrypt', or 'argon2'
+# (requires argon2-cffi, which `manage.py check` verifies; with the parameters
+# below it is the cheapest per login).
+# Stored hashes of the other algorithms keep working and are rehashed with
+# this one on the user's next login.
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2')
+
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 0)) or None
+PASSWORD_SCRYPT_WORK_FACTOR = int(os.environ.get('PASSWORD_SCRYPT_WORK_FACTOR', 0)) or None
+PASSWORD_SCRYPT_BLOCK_SIZE = int(os.environ.get('PASSWORD_SCRYPT_BLOCK_SIZE', 0)) or None
+PASSWORD_SCRYPT_PARALLELISM = int(os.environ.get('PASSWORD_SCRYPT_PARALLELISM', 0)) or None
+# OWASP's argon2id minimum: 19 MiB, 2 iterations, 1 lane
+PASSWORD_ARGON2_TIME_COST = int(os.environ.get('PASSWORD_ARGON2_TIME_COST', 2))
+PASSWORD_ARGON2_MEMORY_COST = int(os.environ.get('PASSWORD_ARGON2_MEMORY_COST', 19456))
+PASSWORD_ARGON2_PARALLELISM = int(os.environ.get('PASSWORD_ARGON2_PARALLELISM', 1))
+
+_PASSWORD_HASHERS = {
+    'pbkdf2': 'user.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'user.hashers.ScryptPasswordHasher',
+    'argon2': 'user.hashers.Argon2PasswordHasher',
+}
+PASSWORD_HASHERS = [
+    _PASSWORD_HASHERS[PASSWORD_HASHER],
+    *(hasher for name, hasher in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER),
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+
+# Authentication
+
+# 'django.contrib.sessions.backends.cached_db' serves sessions from
+# SESSION_CACHE_ALIAS; use it only with a cache shared by all processes.
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'django.contrib.sessions.backends.db')
+SESSION_CACHE_ALIAS = os.environ.get('SESSION_CACHE_ALIAS', 'default')
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+        'user.authentication.CachedBasicAuthentication',
+    ],
+}
+
+# Seconds a verified HTTP Basic login is remembered (0 disables the cache)
+AUTH_CREDENTIALS_CACHE_TIMEOUT = int(os.environ.get('AUTH_CREDENTIALS_CACHE_TIMEOUT', 300))
+AUTH_CREDENTIALS_CACHE_ALIAS = os.environ.get('AUTH_CREDENTIALS_CACHE_ALIAS', 'default')
+
+# Permissions are read from a per-user snapshot cached for
+# PERMISSION_CACHE_TIMEOUT seconds (0 disables it); see user/permissions.py.
+# Without a cache shared by all processes, other processes see permission
+# changes after the timeout.
+# Sessions record the dotted path of the backend that logged the user in,
+# so switching from django.contrib.auth.backends.ModelBackend to this
+# backend (or back) logs out every existing session.
+AUTHENTICATION_BACKENDS = ['user.permissions.CachedModelBackend']
+PERMISSION_CACHE_TIMEOUT = int(os.environ.get('PERMISSION_CACHE_TIMEOUT', 300))
+PERMISSION_CACHE_ALIAS = os.environ.get('PERMISSION_CACHE_ALIAS', 'default')
+
+# Also require the model permissions (view_employee, add_payrollrun, ...)
+# on the employee and payroll API, on top of the staff/login checks
+API_MODEL_PERMISSIONS = os.environ.get('API_MODEL_PERMISSIONS', 'False') == 'True'
+
+
+# Employee images (see user/images.py)
+
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', BASE_DIR / 'media')
+MEDIA_URL = 'media/'
+
+# Largest accepted upload, in bytes and in pixels
+EMPLOYEE_IMAGE_MAX_BYTES = int(os.environ.get('EMPLOYEE_IMAGE_MAX_BYTES', 10 * 1024 * 1024))
+EMPLOYEE_IMAGE_MAX_PIXELS = int(os.environ.get('EMPLOYEE_IMAGE_MAX_PIXELS', 40_000_000))
+
+# Square bounding boxes of the JPEG thumbnails kept for every image
+EMPLOYEE_THUMBNAIL_SIZES = tuple(
+    int(size) for size in os.environ.get('EMPLOYEE_THUMBNAIL_SIZES', '64,256').split(',')
+)
+# Make thumbnails on a background thread after an upload commits (otherwise inline)
+EMPLOYEE_THUMBNAILS_IN_BACKGROUND = os.environ.get('EMPLOYEE_THUMBNAILS_IN_BACKGROUND', 'True') == 'True'
+
+# Seconds clients may reuse an image before revalidating it with its ETag
+EMPLOYEE_IMAGE_MAX_AGE = int(os.environ.get('EMPLOYEE_IMAGE_MAX_AGE', 300))
+
+
+# Query and latency instrumentation (see user/instrumentation.py)
+
+# 'off', 'counts' (query count, SQL time and latency only) or 'full' (also
+# reports statements repeated within a request, i.e. N+1 queries)
+QUERY_INSTRUMENTATION = os.environ.get('QUERY_INSTRUMENTATION', 'off')
+# Fraction of requests instrumented
+QUERY_INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get('QUERY_INSTRUMENTATION_SAMPLE_RATE', 1))
+# Executions of one statement within a request reported as duplicates
+QUERY_INSTRUMENTATION_DUPLICATES = int(os.environ.get('QUERY_INSTRUMENTATION_DUPLICATES', 3))
+# Requests kept in each process's ring buffer
+QUERY_INSTRUMENTATION_BUFFER = int(os.environ.get('QUERY_INSTRUMENTATION_BUFFER', 1000))
+
+# SQLite file shared by all processes and read by `manage.py query_stats`
+# (empty: ring buffer only). Records are written every BATCH requests or
+# FLUSH_SECONDS, and the last KEEP requests are kept.
+QUERY_INSTRUMENTATION_DB = os.environ.get('QUERY_INSTRUMENTATION_DB', '')
+QUERY_INSTRUMENTATION_BATCH = int(os.environ.get('QUERY_INSTRUMENTATION_BATCH', 50))
+QUERY_INSTRUMENTATION_FLUSH_SECONDS = float(os.environ.get('QUERY_INSTRUMENTATION_FLUSH_SECONDS', 10))
+QUERY_INSTRUMENTATION_KEEP = int(os.environ.get('QUERY_INSTRUMENTATION_KEEP', 100_000))
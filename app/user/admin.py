@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from .import models
+from .pagination import EstimatedCountPaginator
 from django.utils.translation import gettext_lazy as _
 
 # Register your models here.
@@ -38,23 +39,96 @@ class CustomUserAdmin(UserAdmin):
     search_fields = ("email", "full_name", "contact")
     ordering = ("email",)
 
+    def get_queryset(self, request):
+        # Genders come from the lookup cache rather than one query per row
+        return super().get_queryset(request).with_cached_lookups()
 
 
+class LargeTableAdmin(admin.ModelAdmin):
+    # Changelists over tables with one row per employee: no full COUNT(*)
+    # next to the filtered count, and an estimated count when unfiltered.
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
 
 
+@admin.register(models.Company)
+class CompanyAdmin(admin.ModelAdmin):
+    list_display = ("id", "name")
+    search_fields = ("name",)
 
 
+@admin.register(models.Designation)
+class DesignationAdmin(admin.ModelAdmin):
+    list_display = ("id", "title")
+    search_fields = ("title",)
 
 
+@admin.register(models.Department)
+class DepartmentAdmin(admin.ModelAdmin):
+    list_display = ("id", "name")
+    search_fields = ("name",)
 
 
+@admin.register(models.Section)
+class SectionAdmin(admin.ModelAdmin):
+    list_display = ("id", "name")
+    search_fields = ("name",)
 
 
+@admin.register(models.Location)
+class LocationAdmin(admin.ModelAdmin):
+    list_display = ("id", "location", "code")
+    search_fields = ("location", "code")
 
-admin.site.register(models.Designation)
-admin.site.register(models.Department)
-admin.site.register(models.Section)
-admin.site.register(models.EmployeeStatus)
-admin.site.register(models.CurrentPackageDetails)
-admin.site.register(models.ProposedPackageDetails)
-admin.site.register(models.FinalImpactPerMonth)
+
+@admin.register(models.EmployeeStatus)
+class EmployeeStatusAdmin(admin.ModelAdmin):
+    list_display = ("id", "status")
+    search_fields = ("status",)
+
+
+@admin.register(models.Formula)
+class FormulaAdmin(admin.ModelAdmin):
+    list_display = ("id", "formula_name", "formula_expression")
+    search_fields = ("formula_name", "formula_expression")
+
+
+@admin.register(models.Employee)
+class EmployeeAdmin(LargeTableAdmin):
+    list_display = ("emp_id", "fullname", "company_name", "designation", "department", "location", "date_of_joining")
+    list_select_related = ("company_name", "designation", "department", "location")
+    list_filter = ("company_name", "department", "location")
+    search_fields = ("fullname",)
+    autocomplete_fields = ("company_name", "designation", "department", "section", "location", "manager")
+    ordering = ("-emp_id",)
+
+
+@admin.register(models.CurrentPackageDetails)
+class CurrentPackageDetailsAdmin(LargeTableAdmin):
+    list_display = ("employee", "gross_salary", "vehicle", "fuel_limit", "mobile_allowance")
+    list_select_related = ("employee",)
+    raw_id_fields = ("employee",)
+    search_fields = ("employee__fullname",)
+    ordering = ("-id",)
+
+
+@admin.register(models.ProposedPackageDetails)
+class ProposedPackageDetailsAdmin(LargeTableAdmin):
+    list_display = ("employee", "increment_percentage", "increased_fuel_amount", "mobile_allowance", "vehicle")
+    list_select_related = ("employee",)
+    raw_id_fields = ("employee",)
+    autocomplete_fields = ("increased_amount", "revised_salary", "revised_fuel_allowance")
+    search_fields = ("employee__fullname",)
+    ordering = ("-id",)
+
+
+@admin.register(models.FinalImpactPerMonth)
+class FinalImpactPerMonthAdmin(LargeTableAdmin):
+    list_display = ("employee", "emp_status", "serving_years", "salary", "fuel", "total_amount", "is_stale")
+    list_select_related = ("employee", "emp_status")
+    list_filter = ("is_stale",)
+    raw_id_fields = ("employee",)
+    autocomplete_fields = ("emp_status", "gratuity", "bonus", "leave_encashment", "mobile_allowance", "total")
+    search_fields = ("employee__fullname",)
+    ordering = ("-id",)
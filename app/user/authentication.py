@@ -0,0 +1,48 @@
+"""
+HTTP Basic authentication for API clients that remembers verified
+credentials.
+
+Basic auth sends the password with every request, and every request would
+otherwise pay a full password hash. A successful check is cached for
+``AUTH_CREDENTIALS_CACHE_TIMEOUT`` seconds under an HMAC of the
+credentials. The entry also holds an HMAC of the stored password hash, so
+a password change or deactivation takes effect on the next request.
+
+This is the cache for API credentials: the API has no token scheme
+(``rest_framework.authtoken`` is not installed), so clients that are not
+browsers send HTTP Basic credentials on every request, and those are what
+cost a hash. Browser sessions are looked up by session key, not hashed,
+and can be served from the cache with ``SESSION_ENGINE`` (see settings).
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.utils.crypto import constant_time_compare, salted_hmac
+from rest_framework.authentication import BasicAuthentication
+
+
+def _digest(value):
+    return salted_hmac('user.authentication', value, algorithm='sha256').hexdigest()
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+
+    def authenticate_credentials(self, userid, password, request=None):
+        timeout = getattr(settings, 'AUTH_CREDENTIALS_CACHE_TIMEOUT', 300)
+        if not timeout:
+            return super().authenticate_credentials(userid, password, request)
+
+        cache = caches[getattr(settings, 'AUTH_CREDENTIALS_CACHE_ALIAS', 'default')]
+        key = f'auth:basic:{_digest(f"{userid}:{password}")}'
+        cached = cache.get(key)
+        if cached is not None:
+            pk, password_digest = cached
+            user = get_user_model()._default_manager.filter(pk=pk, is_active=True).first()
+            if user is not None and constant_time_compare(_digest(user.password), password_digest):
+                return user, None
+            cache.delete(key)
+
+        user, auth = super().authenticate_credentials(userid, password, request)
+        cache.set(key, (user.pk, _digest(user.password)), timeout)
+        return user, auth
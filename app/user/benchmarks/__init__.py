@@ -0,0 +1,85 @@
+"""
+Benchmarks run through ``manage.py benchmark``.
+
+Each benchmark is a function registered with ``@benchmark(name)`` that
+returns a dict of measurements. Benchmarks that need data seed it with
+``user.benchmarks.data.seed``; the command runs them against a throwaway
+test database and calls ``reset`` in between. ``employees`` overrides the
+number of employees a benchmark seeds. ``--json`` saves the results with
+the commit and environment; ``--compare`` prints the change of each
+measurement from such a file.
+"""
+
+import statistics
+import time
+from importlib import import_module
+
+
+MODULES = (
+    'user.benchmarks.formulas',
+    'user.benchmarks.employees',
+    'user.benchmarks.indexes',
+    'user.benchmarks.auth',
+    'user.benchmarks.projections',
+    'user.benchmarks.admin',
+    'user.benchmarks.payroll',
+    'user.benchmarks.import_export',
+    'user.benchmarks.aggregates',
+    'user.benchmarks.hierarchy',
+    'user.benchmarks.connections',
+    'user.benchmarks.permissions',
+    'user.benchmarks.search',
+    'user.benchmarks.increments',
+)
+
+REGISTRY = {}
+
+
+def benchmark(name):
+    def register(func):
+        REGISTRY[name] = func
+        return func
+    return register
+
+
+def load():
+    for module in MODULES:
+        import_module(module)
+    return REGISTRY
+
+
+def reset():
+    """Empty the database and the in-process caches."""
+    from django.core.management import call_command
+
+    from user import formulas, lookups
+
+    call_command('flush', interactive=False, verbosity=0)
+    formulas.clear_cache()
+    for model in lookups.LOOKUP_MODELS:
+        lookups.get_cache(model).invalidate()
+
+
+def timed(func, repeat=1):
+    """Return the best wall-clock time in seconds over ``repeat`` calls."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def latencies(func, repeat):
+    """Return ``{'p50_ms', 'p99_ms'}`` over ``repeat`` calls of ``func``."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'p50_ms': round(statistics.median(samples), 2),
+        'p99_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 2),
+    }
@@ -0,0 +1,52 @@
+import math
+
+from django.contrib import admin
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from user.models import CurrentPackageDetails, CustomUser, Employee, FinalImpactPerMonth, ProposedPackageDetails
+
+from . import benchmark, data, latencies
+
+
+CHANGELISTS = {
+    'employee': Employee,
+    'current_package': CurrentPackageDetails,
+    'proposed_package': ProposedPackageDetails,
+    'impact': FinalImpactPerMonth,
+}
+
+# Page requested for the deep-page variant, when the table has that many
+DEEP_PAGE = 10
+
+
+def deep_page(model):
+    """``DEEP_PAGE``, or the last changelist page of ``model`` when it has fewer."""
+    pages = math.ceil(model.objects.count() / admin.site.get_model_admin(model).list_per_page)
+    return max(1, min(DEEP_PAGE, pages))
+
+
+@benchmark('admin')
+def run(employees=None, repeat=10):
+    employees = employees or 20_000
+    data.seed(employees=employees)
+    admin = CustomUser.objects.create_superuser('benchmark@example.com', 'benchmark')
+    client = Client()
+    client.force_login(admin)
+
+    results = {'employees': employees}
+    for name, model in CHANGELISTS.items():
+        url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+        page = results[f'{name}_deep_page'] = deep_page(model)
+        for variant, params in (('', {}), ('_deep_page', {'p': page}), ('_search', {'q': 'Employee 42'})):
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url, params)
+            assert response.status_code == 200, response.status_code
+            results[f'{name}{variant}_queries'] = len(queries)
+            results.update({
+                f'{name}{variant}_{key}': value
+                for key, value in latencies(lambda: client.get(url, params), repeat).items()
+            })
+    return results
@@ -0,0 +1,34 @@
+from django.test import Client
+from django.urls import reverse
+
+from user import payroll, summaries
+from user.models import CustomUser, Employee
+
+from . import benchmark, data, latencies, timed
+
+
+@benchmark('aggregates')
+def run(employees=None, repeat=10):
+    employees = employees or 100_000
+    data.seed(employees=employees)
+    payroll.compute_batch()
+    results = {'employees': employees}
+
+    results['refresh_all_s'] = round(timed(summaries.refresh), 3)
+    groups = list(summaries.employee_groups(Employee.objects.order_by('pk')[:100]))
+    results['refresh_groups'] = len(groups)
+    results['refresh_groups_s'] = round(timed(lambda: summaries.refresh(groups)), 3)
+
+    # Live GROUP BY over every employee, which the summary table replaces
+    results.update({
+        f'live_aggregate_{key}': value
+        for key, value in latencies(lambda: list(summaries.aggregate(Employee.objects.all())), repeat).items()
+    })
+
+    user = CustomUser.objects.create(email='benchmark@example.com', full_name='Benchmark', is_staff=True)
+    client = Client()
+    client.force_login(user)
+    url = reverse('payroll-summary')
+    assert client.get(url).status_code == 200
+    results.update({f'summary_api_{key}': value for key, value in latencies(lambda: client.get(url), repeat).items()})
+    return results
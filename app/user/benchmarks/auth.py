@@ -0,0 +1,70 @@
+import base64
+import importlib.util
+import time
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.test import RequestFactory, override_settings
+
+from user.authentication import CachedBasicAuthentication
+from user.models import CustomUser, Gender
+
+from . import benchmark, latencies
+
+
+PASSWORD = 'correct horse battery staple'
+
+
+def _hashers(preferred):
+    hashers = settings._PASSWORD_HASHERS
+    return [hashers[preferred], *(hasher for name, hasher in hashers.items() if name != preferred)]
+
+
+def _logins_per_sec(email, seconds):
+    count = 0
+    start = time.perf_counter()
+    while True:
+        assert authenticate(email=email, password=PASSWORD) is not None
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return round(count / elapsed, 2)
+
+
+@benchmark('logins')
+def run(employees=None, seconds=3):
+    """
+    Logins per second of one process, i.e. per core, for each hasher,
+    the cost of the rehash on the first login after switching hashers,
+    and HTTP Basic API requests with and without the credentials cache.
+    """
+    gender = Gender.objects.create(gender='Other')
+    results = {}
+    strategies = ['pbkdf2', 'scrypt']
+    if importlib.util.find_spec('argon2') is not None:
+        strategies.append('argon2')
+    else:
+        results['argon2'] = 'argon2-cffi not installed'
+
+    for index, strategy in enumerate(strategies):
+        with override_settings(PASSWORD_HASHERS=_hashers(strategy)):
+            user = CustomUser.objects.create_user(
+                f'Login {strategy}', f'{strategy}@example.com', None, gender, f'0{index}', PASSWORD,
+            )
+            results[f'{strategy}_logins_per_sec'] = _logins_per_sec(user.email, seconds)
+
+    # First login after the preferred hasher changes verifies the old hash and stores a new one
+    with override_settings(PASSWORD_HASHERS=_hashers(strategies[-1])):
+        start = time.perf_counter()
+        authenticate(email='pbkdf2@example.com', password=PASSWORD)
+        results['rehash_login_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        results['rehashed_to'] = CustomUser.objects.get(email='pbkdf2@example.com').password.split('$', 1)[0]
+
+    credentials = base64.b64encode(f'{strategies[-1]}@example.com:{PASSWORD}'.encode()).decode()
+    request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Basic {credentials}')
+    backend = CachedBasicAuthentication()
+    with override_settings(PASSWORD_HASHERS=_hashers(strategies[-1])):
+        with override_settings(AUTH_CREDENTIALS_CACHE_TIMEOUT=0):
+            results.update({f'basic_uncached_{key}': value for key, value in latencies(lambda: backend.authenticate(request), 10).items()})
+        results.update({f'basic_cached_{key}': value for key, value in latencies(lambda: backend.authenticate(request), 200).items()})
+    return results
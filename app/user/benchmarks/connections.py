@@ -0,0 +1,70 @@
+"""
+Request latency with a new connection per request, persistent connections
+(with and without health checks) and, on PostgreSQL with psycopg_pool
+installed, a connection pool. Each request is followed by
+``close_old_connections`` as a WSGI server does at request end.
+"""
+
+import importlib.util
+import time
+
+from django.db import close_old_connections, connection
+from django.test import Client
+from django.urls import reverse
+
+from user.models import CustomUser, Employee
+
+from . import benchmark, data, latencies
+
+
+def _modes():
+    modes = {
+        'per_request': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False},
+        'persistent': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': False},
+        'persistent_checked': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True},
+    }
+    if connection.vendor == 'postgresql' and importlib.util.find_spec('psycopg_pool'):
+        pool = {'pool': {'min_size': 2, 'max_size': 4}}
+        modes['pool'] = {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': pool}
+        modes['pool_checked'] = {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': True, 'OPTIONS': pool}
+    return modes
+
+
+def _connect_ms(repeat):
+    samples = []
+    for _ in range(repeat):
+        connection.close()
+        start = time.perf_counter()
+        connection.ensure_connection()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(sorted(samples)[len(samples) // 2], 3)
+
+
+@benchmark('connections')
+def run(employees=None, repeat=200):
+    employees = employees or 1000
+    data.seed(employees=employees)
+    user = CustomUser.objects.create(email='benchmark@example.com', full_name='Benchmark', is_staff=True)
+    client = Client()
+    client.force_login(user)
+    url = reverse('employee-detail', args=[Employee.objects.order_by('pk').values_list('pk', flat=True).first()])
+
+    def request():
+        response = client.get(url)
+        assert response.status_code == 200, response.status_code
+        close_old_connections()
+
+    results = {'database': connection.vendor, 'connect_ms': _connect_ms(20)}
+    original = {key: connection.settings_dict.get(key) for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS', 'OPTIONS')}
+    try:
+        for name, overrides in _modes().items():
+            connection.close()
+            connection.settings_dict.update(original, **overrides)
+            request()
+            results.update({f'{name}_{key}': value for key, value in latencies(request, repeat).items()})
+            if 'pool' in connection.settings_dict['OPTIONS']:
+                connection.close_pool()
+    finally:
+        connection.close()
+        connection.settings_dict.update(original)
+    return results
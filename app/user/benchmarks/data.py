@@ -0,0 +1,123 @@
+"""Seeded synthetic HR data for benchmarks."""
+
+import datetime
+import random
+from decimal import Decimal
+
+from django.db import transaction
+
+from user.models import (
+    Company, CurrentPackageDetails, Department, Designation, Employee, EmployeeStatus,
+    FinalImpactPerMonth, Formula, Location, ProposedPackageDetails, Section,
+)
+
+
+FORMULAS = (
+    ('Increased Amount', 'gross_salary * increment_percentage / 100'),
+    ('Revised Salary', 'gross_salary + increased_amount'),
+    ('Revised Fuel', 'fuel_limit + increased_fuel_amount'),
+    ('Gratuity', 'round(revised_salary / 12 * min(serving_years, 30) / 12, 2)'),
+    ('Bonus', 'revised_salary * 0.0833'),
+    ('Leave Encashment', 'revised_salary / 30 * 2.5'),
+)
+
+
+def _money(rnd, low, high):
+    return Decimal(rnd.randrange(low * 100, high * 100)) / 100
+
+
+def seed(employees=1000, companies=5, departments=20, sections=10, designations=30,
+         locations=10, packages=True, seed=0, batch_size=5000):
+    """
+    Create ``employees`` employees spread over freshly created lookup rows,
+    with current/proposed packages and impact rows when ``packages`` is set.
+    The same ``seed`` always produces the same data.
+    """
+    rnd = random.Random(seed)
+    with transaction.atomic():
+        company_rows = Company.objects.bulk_create(Company(name=f'Company {i}') for i in range(companies))
+        department_rows = Department.objects.bulk_create(Department(name=f'Department {i}') for i in range(departments))
+        section_rows = Section.objects.bulk_create(Section(name=f'Section {i}') for i in range(sections))
+        designation_rows = Designation.objects.bulk_create(Designation(title=f'Designation {i}') for i in range(designations))
+        location_rows = Location.objects.bulk_create(
+            Location(location=f'Location {i}', code=f'L{i:03}') for i in range(locations)
+        )
+        status = EmployeeStatus.objects.create(status='Active')
+        formulas = {
+            name: Formula.objects.create(formula_name=name, formula_expression=expression)
+            for name, expression in FORMULAS
+        }
+
+        start = datetime.date(1995, 1, 1)
+        employee_rows = Employee.objects.bulk_create(
+            (
+                Employee(
+                    fullname=f'Employee {i} {rnd.choice("ABCDEFGHJKLMNPRSTW")}{rnd.randrange(1000):03}',
+                    company_name=rnd.choice(company_rows),
+                    designation=rnd.choice(designation_rows),
+                    department=rnd.choice(department_rows),
+                    section=rnd.choice(section_rows),
+                    location=rnd.choice(location_rows),
+                    date_of_joining=start + datetime.timedelta(days=rnd.randrange(11_000)),
+                )
+                for i in range(employees)
+            ),
+            batch_size=batch_size,
+        )
+
+        if packages:
+            CurrentPackageDetails.objects.bulk_create(
+                (
+                    CurrentPackageDetails(
+                        employee=employee,
+                        gross_salary=_money(rnd, 30_000, 900_000),
+                        vehicle=_money(rnd, 0, 50_000),
+                        fuel_limit=_money(rnd, 0, 40_000),
+                        mobile_allowance=_money(rnd, 0, 10_000),
+                    )
+                    for employee in employee_rows
+                ),
+                batch_size=batch_size,
+            )
+            ProposedPackageDetails.objects.bulk_create(
+                (
+                    ProposedPackageDetails(
+                        employee=employee,
+                        increment_percentage=_money(rnd, 0, 25),
+                        increased_amount=formulas['Increased Amount'],
+                        revised_salary=formulas['Revised Salary'],
+                        increased_fuel_amount=_money(rnd, 0, 5_000),
+                        revised_fuel_allowance=formulas['Revised Fuel'],
+                        mobile_allowance=_money(rnd, 0, 10_000),
+                        vehicle=_money(rnd, 0, 50_000),
+                    )
+                    for employee in employee_rows
+                ),
+                batch_size=batch_size,
+            )
+            FinalImpactPerMonth.objects.bulk_create(
+                (
+                    FinalImpactPerMonth(
+                        employee=employee,
+                        emp_status=status,
+                        serving_years=0,
+                        salary=0,
+                        fuel=0,
+                        gratuity=formulas['Gratuity'],
+                        bonus=formulas['Bonus'],
+                        leave_encashment=formulas['Leave Encashment'],
+                        is_stale=True,
+                    )
+                    for employee in employee_rows
+                ),
+                batch_size=batch_size,
+            )
+
+    return {
+        'companies': companies,
+        'departments': departments,
+        'sections': sections,
+        'designations': designations,
+        'locations': locations,
+        'employees': employees,
+    }
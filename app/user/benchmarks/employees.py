@@ -0,0 +1,45 @@
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.pagination import Cursor
+
+from user.models import CustomUser, Employee
+from user.pagination import EmployeeCursorPagination
+
+from . import benchmark, data, latencies
+
+
+@benchmark('employee_api')
+def run(employees=None, repeat=20):
+    employees = employees or 100_000
+    data.seed(employees=employees)
+    user = CustomUser(email='benchmark@example.com', full_name='Benchmark', is_staff=True)
+    user.save()
+    client = Client()
+    client.force_login(user)
+
+    url = reverse('employee-list')
+    page_size = EmployeeCursorPagination.page_size
+    depth = max(employees - page_size, 0)
+    position = Employee.objects.order_by('emp_id').values_list('emp_id', flat=True)[depth]
+    paginator = EmployeeCursorPagination()
+    paginator.base_url = url
+    deep_url = paginator.encode_cursor(Cursor(offset=0, reverse=False, position=str(position)))
+
+    results = {'employees': employees}
+    for name, page_url in (('first_page', url), ('deep_page', deep_url)):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(page_url)
+        assert response.status_code == 200, response.status_code
+        results[f'{name}_queries'] = len(queries)
+        results.update({f'{name}_{key}': value for key, value in latencies(lambda: client.get(page_url), repeat).items()})
+
+    detail_url = reverse('employee-detail', args=[position])
+    results.update({f'detail_{key}': value for key, value in latencies(lambda: client.get(detail_url), repeat).items()})
+
+    # The same depth through OFFSET, for comparison with the keyset page
+    ordered = Employee.objects.order_by('emp_id')
+    results.update({f'offset_sql_{key}': value for key, value in latencies(lambda: list(ordered[depth:depth + page_size]), repeat).items()})
+    results.update({f'keyset_sql_{key}': value for key, value in latencies(lambda: list(ordered.filter(emp_id__gt=position)[:page_size]), repeat).items()})
+    return results
@@ -0,0 +1,60 @@
+import random
+from decimal import Decimal
+
+from user import formulas
+
+from . import benchmark, timed
+
+
+EXPRESSIONS = (
+    'gross_salary * increment_percentage / 100',
+    'gross_salary + gross_salary * increment_percentage / 100',
+    'round(gross_salary / 26 * 30 * serving_years, 2)',
+    'max(gross_salary * 0.1, 5000)',
+    'gross_salary + fuel_limit + mobile_allowance + vehicle',
+)
+
+
+def _rows(count, seed=0):
+    rnd = random.Random(seed)
+    return [
+        {
+            'gross_salary': Decimal(rnd.randrange(50_000, 900_000)) / 100 * 100,
+            'increment_percentage': Decimal(rnd.randrange(0, 2500)) / 100,
+            'fuel_limit': Decimal(rnd.randrange(0, 500)),
+            'mobile_allowance': Decimal(rnd.randrange(0, 300)),
+            'vehicle': Decimal(rnd.randrange(0, 100_000)),
+            'serving_years': rnd.randrange(0, 30),
+        }
+        for _ in range(count)
+    ]
+
+
+@benchmark('formulas')
+def run(employees=None, repeat=3):
+    rows = employees or 20_000
+    data = _rows(rows)
+    # Parsing is slow enough that a slice of the rows gives a stable rate
+    cold_data = data[:max(rows // 10, 1)]
+
+    def cold():
+        for row in cold_data:
+            for expression in EXPRESSIONS:
+                formulas.compile_expression(expression).evaluate(row)
+
+    compiled = [formulas.compile_expression(expression) for expression in EXPRESSIONS]
+
+    def cached():
+        for row in data:
+            for formula in compiled:
+                formula.evaluate(row)
+
+    evaluations = rows * len(EXPRESSIONS)
+    cold_rate = len(cold_data) * len(EXPRESSIONS) / timed(cold, repeat)
+    cached_rate = evaluations / timed(cached, repeat)
+    return {
+        'evaluations': evaluations,
+        'cold_parse_per_sec': round(cold_rate),
+        'cached_per_sec': round(cached_rate),
+        'speedup': round(cached_rate / cold_rate, 1),
+    }
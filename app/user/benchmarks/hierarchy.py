@@ -0,0 +1,47 @@
+from user import hierarchy
+from user.models import Employee
+
+from . import benchmark, data, latencies, timed
+
+
+def _cost_by_levels(manager_id):
+    # What the closure table replaces: one query per reporting level
+    employee_ids, level = [], [manager_id]
+    while level:
+        level = list(Employee.objects.filter(manager_id__in=level).values_list('pk', flat=True))
+        employee_ids.extend(level)
+    return hierarchy.cost(Employee.objects.filter(pk__in=employee_ids))
+
+
+@benchmark('hierarchy')
+def run(employees=None, fanout=8, repeat=10):
+    employees = employees or 100_000
+    data.seed(employees=employees)
+    ids = list(Employee.objects.order_by('pk').values_list('pk', flat=True))
+    # A tree where the employee at position i reports to the one at (i - 1) // fanout
+    updates = [Employee(pk=pk, manager_id=ids[(index - 1) // fanout]) for index, pk in enumerate(ids) if index]
+    Employee.objects.bulk_update(updates, ['manager'], batch_size=5000)
+
+    results = {'employees': employees, 'fanout': fanout}
+    lines = 0
+
+    def rebuild():
+        nonlocal lines
+        lines = hierarchy.rebuild()
+
+    results['rebuild_s'] = round(timed(rebuild), 3)
+    results['lines'] = lines
+
+    # The root's first report heads the largest subtree
+    vp = ids[1]
+    results['vp_headcount'] = hierarchy.cost(hierarchy.under(vp))['headcount']
+    assert _cost_by_levels(vp) == hierarchy.cost(hierarchy.under(vp))
+    results.update({f'closure_{key}': value for key, value in latencies(lambda: hierarchy.cost(hierarchy.under(vp)), repeat).items()})
+    results.update({f'by_levels_{key}': value for key, value in latencies(lambda: _cost_by_levels(vp), repeat).items()})
+
+    # Moving a second-level manager and everyone under them
+    employee = Employee.objects.get(pk=ids[fanout + 1])
+    results['move_subtree_size'] = hierarchy.under(employee).count() + 1
+    employee.manager_id = ids[2]
+    results['move_subtree_s'] = round(timed(employee.save), 3)
+    return results
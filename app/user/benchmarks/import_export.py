@@ -0,0 +1,61 @@
+import csv
+import io
+import random
+
+from user import exporters, importers
+
+from . import benchmark, data, timed
+
+
+def _import_csv(rows, seed=0):
+    rnd = random.Random(seed)
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['fullname', 'date_of_joining', *importers.LOOKUP_COLUMNS, *importers.PACKAGE_COLUMNS])
+    for i in range(rows):
+        writer.writerow([
+            f'Imported {i}',
+            f'{rnd.randrange(1, 29):02}/{rnd.randrange(1, 13):02}/{rnd.randrange(1995, 2025)}',
+            f'Company {rnd.randrange(5)}',
+            f'Designation {rnd.randrange(30)}',
+            f'Department {rnd.randrange(20)}',
+            f'Section {rnd.randrange(10)}',
+            f'Location {rnd.randrange(10)}',
+            rnd.randrange(30_000, 900_000),
+            rnd.randrange(0, 50_000),
+            rnd.randrange(0, 40_000),
+            rnd.randrange(0, 10_000),
+        ])
+    return output.getvalue().encode()
+
+
+@benchmark('import_export')
+def run(employees=None):
+    employees = employees or 50_000
+    data.seed(employees=employees)
+    results = {'employees': employees}
+
+    for file_format in exporters.STREAMS:
+        size = 0
+
+        def export():
+            nonlocal size
+            size = sum(len(chunk) for chunk in exporters.stream_export(file_format))
+
+        elapsed = timed(export)
+        results[f'export_{file_format}_s'] = round(elapsed, 3)
+        results[f'export_{file_format}_rows_per_sec'] = round(employees / elapsed)
+        results[f'export_{file_format}_bytes'] = size
+
+    content = _import_csv(employees)
+    result = None
+
+    def import_csv():
+        nonlocal result
+        result = importers.import_file(io.BytesIO(content), 'employees.csv')
+
+    elapsed = timed(import_csv)
+    assert not result.errors, result.errors[:5]
+    results['import_csv_s'] = round(elapsed, 3)
+    results['import_csv_rows_per_sec'] = round(employees / elapsed)
+    return results
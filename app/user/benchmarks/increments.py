@@ -0,0 +1,39 @@
+from user import increments
+from user.models import CurrentPackageDetails, IncrementCycle
+
+from . import benchmark, data, timed
+
+
+@benchmark('increments')
+def run(employees=None, chunk_size=1000, loop_employees=1000):
+    """
+    Dry run, application and rollback of an increment cycle over
+    ``employees`` (20k by default), ``chunk_size`` employees per
+    transaction, including the recomputation of impact rows and summaries
+    that follows, against saving ``loop_employees`` packages one by one.
+    """
+    employees = employees or 20_000
+    data.seed(employees=employees)
+    chunks = -(-employees // chunk_size)
+    results = {'employees': employees, 'chunks': chunks}
+
+    results['dry_run_s'] = round(timed(lambda: increments.apply_cycle(dry_run=True, chunk_size=chunk_size)), 3)
+    summary = {}
+    elapsed = timed(lambda: summary.update(increments.apply_cycle(chunk_size=chunk_size)))
+    results['apply_s'] = round(elapsed, 3)
+    results['apply_per_sec'] = round(employees / elapsed)
+
+    cycle = IncrementCycle.objects.get(pk=summary['cycle'])
+    results['rollback_s'] = round(timed(lambda: increments.rollback_cycle(cycle, chunk_size=chunk_size)), 3)
+
+    # The load-modify-save loop the cycle replaces, with every signal
+    packages = list(CurrentPackageDetails.objects.order_by('pk')[:loop_employees])
+
+    def save_each():
+        for package in packages:
+            package.gross_salary += 1
+            package.save()
+
+    elapsed = timed(save_each)
+    results['save_loop_per_sec'] = round(len(packages) / elapsed)
+    return results
@@ -0,0 +1,103 @@
+"""
+Employee filter and name search with and without the indexes added in
+migration 0005. The indexes are dropped for the "before" run and
+restored afterwards.
+"""
+
+import datetime
+from importlib import import_module
+
+from django.db import connection
+
+from user.models import Company, Department, Employee, Location
+
+from . import benchmark, data, latencies
+
+
+_migration = import_module('user.migrations.0005_employee_indexes')
+
+INDEXED_FIELDS = (
+    (Employee, 'fullname'),
+    (Company, 'name'),
+    (Department, 'name'),
+    (Location, 'code'),
+)
+
+
+def _queries():
+    company = Company.objects.order_by('pk').first()
+    department = Department.objects.order_by('pk').first()
+    location = Location.objects.order_by('pk').first()
+    return {
+        'company_department': Employee.objects.filter(company_name=company, department=department),
+        'company_location': Employee.objects.filter(company_name=company, location=location),
+        'joining_range': Employee.objects.filter(
+            date_of_joining__range=(datetime.date(2001, 1, 1), datetime.date(2001, 3, 31)),
+        ),
+        'company_joining_range': Employee.objects.filter(
+            company_name=company, date_of_joining__gte=datetime.date(2015, 1, 1),
+        ),
+        'name_prefix': Employee.objects.filter(fullname__startswith='Employee 4242'),
+        'name_contains': Employee.objects.filter(fullname__icontains='4242 K'),
+        'company_by_name': Company.objects.filter(name='Company 3'),
+        'location_by_code': Location.objects.filter(code='L007'),
+    }
+
+
+def _measure(repeat):
+    results = {}
+    for name, queryset in _queries().items():
+        plan = queryset.explain()
+        results[name] = {
+            **latencies(lambda: list(queryset.all()), repeat),
+            'rows': queryset.count(),
+            'plan': ' | '.join(line.strip() for line in plan.splitlines() if line.strip()),
+        }
+    return results
+
+
+def _toggle_indexes(enabled):
+    with connection.schema_editor() as schema_editor:
+        for model, field_name in INDEXED_FIELDS:
+            field = model._meta.get_field(field_name)
+            unindexed = field.clone()
+            unindexed.set_attributes_from_name(field_name)
+            unindexed.model = model
+            unindexed.db_index = False
+            if enabled:
+                schema_editor.alter_field(model, unindexed, field)
+            else:
+                schema_editor.alter_field(model, field, unindexed)
+        # SQLite rebuilds the table on alter_field, which may already have
+        # recreated the Meta indexes
+        with connection.cursor() as cursor:
+            existing = connection.introspection.get_constraints(cursor, Employee._meta.db_table)
+        for index in Employee._meta.indexes:
+            if enabled and index.name not in existing:
+                schema_editor.add_index(Employee, index)
+            elif not enabled and index.name in existing:
+                schema_editor.remove_index(Employee, index)
+        if enabled:
+            _migration.create_postgres_indexes(None, schema_editor)
+        else:
+            _migration.drop_postgres_indexes(None, schema_editor)
+
+
+@benchmark('indexes')
+def run(employees=None, repeat=10):
+    employees = employees or 100_000
+    data.seed(employees=employees, companies=20, departments=40, locations=25, packages=False)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    after = _measure(repeat)
+    _toggle_indexes(False)
+    try:
+        before = _measure(repeat)
+    finally:
+        _toggle_indexes(True)
+
+    results = {'employees': employees}
+    for name in after:
+        results[name] = {'before': before[name], 'after': after[name]}
+    return results
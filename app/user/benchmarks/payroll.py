@@ -0,0 +1,30 @@
+from user import dependencies, payroll, payroll_runs
+from user.models import Company, Employee
+
+from . import benchmark, data, timed
+
+
+@benchmark('payroll')
+def run(employees=None, chunk_size=1000):
+    employees = employees or 100_000
+    data.seed(employees=employees)
+    results = {'employees': employees}
+
+    elapsed = timed(payroll.compute_batch)
+    results['compute_batch_s'] = round(elapsed, 3)
+    results['compute_batch_per_sec'] = round(employees / elapsed)
+
+    # Flagged and recomputed on commit, as after an edit of their inputs
+    changed = list(Employee.objects.order_by('pk').values_list('pk', flat=True)[:employees // 10])
+    results['mark_stale_10pct_s'] = round(timed(lambda: dependencies.mark_stale(changed)), 3)
+
+    company = Company.objects.order_by('pk').first()
+    run = payroll_runs.create_run(company, chunk_size=chunk_size)
+    elapsed = timed(lambda: payroll_runs.execute(run.pk, workers=1))
+    run.refresh_from_db()
+    assert run.status == run.DONE, run.error
+    results['run_employees'] = run.total_employees
+    results['run_chunks'] = run.total_chunks
+    results['run_s'] = round(elapsed, 3)
+    results['run_per_sec'] = round(run.total_employees / elapsed) if elapsed else None
+    return results
@@ -0,0 +1,71 @@
+import copy
+
+from django.contrib.auth.models import Group, Permission
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from user import permissions
+from user.models import CustomUser
+
+from . import benchmark, latencies, timed
+
+
+PERM = 'user.view_employee'
+
+
+def _fresh(user):
+    # A user instance without ModelBackend's per-instance caches, as each request loads
+    clone = copy.copy(user)
+    for attr in ('_perm_cache', '_user_perm_cache', '_group_perm_cache'):
+        clone.__dict__.pop(attr, None)
+    return clone
+
+
+def _queries(func):
+    with CaptureQueriesContext(connection) as queries:
+        func()
+    return len(queries)
+
+
+@benchmark('permissions')
+def run(employees=None, users=1000, groups=10, repeat=200):
+    """
+    ``has_perm`` on a new user instance, as on every request, with and
+    without the permission snapshot cache, and checking ``users`` users
+    one by one against the batched ``permissions.has_perms``.
+    """
+    codenames = list(Permission.objects.order_by('pk')[:20 * groups])
+    group_objects = Group.objects.bulk_create([Group(name=f'Group {index}') for index in range(groups)])
+    for index, group in enumerate(group_objects):
+        group.permissions.set(codenames[index * 20:(index + 1) * 20])
+    CustomUser.objects.bulk_create([
+        CustomUser(email=f'user{index}@example.com', full_name=f'User {index}', contact=f'{index:07d}')
+        for index in range(users)
+    ])
+    everyone = list(CustomUser.objects.order_by('pk'))
+    Membership = CustomUser.groups.through
+    Membership.objects.bulk_create([
+        Membership(customuser_id=user.pk, group_id=group_objects[(index + offset) % groups].pk)
+        for index, user in enumerate(everyone) for offset in range(3)
+    ])
+    user = everyone[0]
+
+    def check():
+        return _fresh(user).has_perm(PERM)
+
+    results = {}
+    with override_settings(PERMISSION_CACHE_TIMEOUT=0):
+        results['uncached_queries'] = _queries(check)
+        results.update({f'uncached_{key}': value for key, value in latencies(check, repeat).items()})
+        results['one_by_one_ms'] = round(timed(lambda: [_fresh(other).has_perm(PERM) for other in everyone]) * 1000, 2)
+        results['batched_ms'] = round(timed(lambda: permissions.has_perms(everyone, [PERM])) * 1000, 2)
+        results['batched_queries'] = _queries(lambda: permissions.has_perms(everyone, [PERM]))
+
+    permissions.invalidate()
+    check()
+    results['cached_queries'] = _queries(check)
+    results.update({f'cached_{key}': value for key, value in latencies(check, repeat).items()})
+    permissions.has_perms(everyone, [PERM])
+    results['batched_cached_ms'] = round(timed(lambda: permissions.has_perms(everyone, [PERM])) * 1000, 2)
+    return results
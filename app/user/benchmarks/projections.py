@@ -0,0 +1,18 @@
+import datetime
+
+from user import projections
+
+from . import benchmark, data, timed
+
+
+@benchmark('projection')
+def run(employees=None, years=10):
+    employees = employees or 100_000
+    data.seed(employees=employees)
+    start = datetime.date.today()
+    return {
+        'employees': employees,
+        'months': years * 12,
+        'workforce_s': round(timed(lambda: projections.project(years=years, start=start)), 3),
+        'by_company_s': round(timed(lambda: projections.project(years=years, start=start, group_by='company_name_id')), 3),
+    }
@@ -0,0 +1,30 @@
+from user import search
+
+from . import benchmark, data, latencies, timed
+
+
+# Type-ahead as an HR user types, over names like 'Employee 4242 K123'
+QUERIES = {
+    'one_letter': 'e',
+    'common_prefix': 'emplo',
+    'name_prefix': 'k12',
+    'two_words': 'employee 4242',
+    'typo': 'emplyee 4242',
+    'org_name': 'department 3 k1',
+    'no_match': 'zzzz',
+}
+
+
+@benchmark('search')
+def run(employees=None, repeat=20):
+    """
+    Type-ahead search latency, and the time to index all employees, at
+    100k employees by default.
+    """
+    employees = employees or 100_000
+    data.seed(employees=employees, packages=False)
+    results = {'rebuild_s': round(timed(search.rebuild), 2)}
+    for name, query in QUERIES.items():
+        results[f'{name}_results'] = len(search.search(query))
+        results.update({f'{name}_{key}': value for key, value in latencies(lambda: list(search.search(query)), repeat).items()})
+    return results
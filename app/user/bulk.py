@@ -0,0 +1,56 @@
+"""
+Set-based updates of many rows to different values.
+
+``bulk_update`` writes a ``CASE WHEN pk = ... THEN ...`` branch per row
+for every field, which Django spends most of its time building and the
+database evaluates row by row. ``update`` joins the new values to the
+table instead, with one ``UPDATE ... SET ... FROM`` statement: on
+PostgreSQL from one array per column (``unnest``), elsewhere from a
+``VALUES`` list per batch of rows. Databases without ``UPDATE ... FROM``
+get ``bulk_update``.
+"""
+
+from django.db import connections, router
+
+
+def supports_update_from(connection):
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 33)
+    return connection.vendor == 'postgresql'
+
+
+def update(objs, fields):
+    """Save ``fields`` (attnames) of ``objs``, saved instances of one model, without signals."""
+    objs = list(objs)
+    if not objs:
+        return
+    model = type(objs[0])
+    connection = connections[router.db_for_write(model)]
+    if not supports_update_from(connection):
+        model._base_manager.bulk_update(objs, fields)
+        return
+
+    quote = connection.ops.quote_name
+    opts = model._meta
+    fields = [opts.pk, *(opts.get_field(name) for name in fields)]
+    table = quote(opts.db_table)
+    columns = [[field.get_db_prep_save(getattr(obj, field.attname), connection) for obj in objs] for field in fields]
+    # Named column1, column2, ... after the VALUES default
+    assignments = ', '.join(f'{quote(field.column)} = v.column{index}' for index, field in enumerate(fields[1:], 2))
+    names = ', '.join(f'column{index}' for index in range(1, len(fields) + 1))
+    where = f'WHERE {table}.{quote(opts.pk.column)} = v.column1'
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            arrays = ', '.join(f'%s::{field.cast_db_type(connection)}[]' for field in fields)
+            cursor.execute(f'UPDATE {table} SET {assignments} FROM unnest({arrays}) AS v ({names}) {where}', columns)
+            return
+        rows = list(zip(*columns))
+        row = f"({', '.join(['%s'] * len(fields))})"
+        batch_size = connection.ops.bulk_batch_size(fields, objs)
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.execute(
+                f"UPDATE {table} SET {assignments} FROM (VALUES {', '.join([row] * len(batch))}) AS v {where}",
+                [value for values in batch for value in values],
+            )
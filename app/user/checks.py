@@ -0,0 +1,28 @@
+"""System checks for settings that depend on optional packages."""
+
+import hashlib
+
+from django.conf import settings
+from django.core.checks import Error, register
+
+
+@register()
+def check_password_hasher(app_configs, **kwargs):
+    """``PASSWORD_HASHER`` must name a hasher this installation can run."""
+    hasher = getattr(settings, 'PASSWORD_HASHER', 'pbkdf2')
+    if hasher == 'argon2':
+        try:
+            import argon2  # noqa: F401
+        except ImportError:
+            return [Error(
+                "PASSWORD_HASHER is 'argon2' but argon2-cffi is not installed.",
+                hint="pip install argon2-cffi, or choose 'pbkdf2' or 'scrypt'.",
+                id='user.E001',
+            )]
+    if hasher == 'scrypt' and not hasattr(hashlib, 'scrypt'):
+        return [Error(
+            "PASSWORD_HASHER is 'scrypt' but this Python's hashlib has no scrypt (OpenSSL 1.1+ needed).",
+            hint="Choose 'pbkdf2' or 'argon2'.",
+            id='user.E002',
+        )]
+    return []
@@ -0,0 +1,116 @@
+"""
+Dependency tracking between payroll inputs and ``FinalImpactPerMonth``.
+
+Each step in ``payroll.STEPS`` reads the variables named in its formula.
+``dependency_graph`` resolves those into the set of input variables every
+step ultimately depends on, so a save that changes e.g. ``vehicle`` only
+marks an employee stale if one of their formulas actually reads it.
+
+Stale impact rows get ``is_stale`` set and are recomputed by
+``payroll_worker`` when its queue is empty, or, with
+``PAYROLL_RECOMPUTE_ON_SAVE``, in one batch once the surrounding
+transaction commits. Impact rows saved by ``payroll.compute_employee``
+are results, not inputs, and never mark anything stale.
+"""
+
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from . import formulas, payroll
+from .models import CurrentPackageDetails, Employee, FinalImpactPerMonth, ProposedPackageDetails
+
+
+# (model, attname) -> input variable
+INPUT_FIELDS = {(model, field): variable for variable, (model, field) in payroll.INPUTS.items()}
+INPUT_FIELDS[(Employee, 'date_of_joining')] = 'serving_years'
+
+# model -> attnames of its formula foreign keys
+FORMULA_FIELDS = {}
+for _variable, _model, _field, _ in payroll.STEPS:
+    FORMULA_FIELDS.setdefault(_model, set()).add(f'{_field}_id')
+
+
+def dependency_graph(compiled_by_step):
+    """
+    Map every step variable to the input variables it depends on,
+    following references to earlier steps.
+
+    ``compiled_by_step`` maps step variables to ``CompiledFormula``;
+    missing steps use their fallback expression.
+    """
+    graph = {}
+    for variable, _, _, _ in payroll.STEPS:
+        compiled = compiled_by_step.get(variable) or payroll.fallback(variable)
+        inputs = set()
+        for name in compiled.names:
+            inputs.update(graph.get(name, {name}))
+        graph[variable] = frozenset(inputs)
+    return graph
+
+
+def employee_inputs(employee_id):
+    """Return every input variable the payroll results of one employee read."""
+    lookups = payroll.formula_lookups()
+    row = Employee.objects.filter(pk=employee_id).values_list(*lookups.values()).first()
+    if row is None:
+        return frozenset()
+    formula_ids = dict(zip(lookups, row))
+    compiled_by_id = formulas.get_compiled_many(formula_ids.values())
+    graph = dependency_graph({
+        variable: compiled_by_id.get(formula_id) for variable, formula_id in formula_ids.items()
+    })
+    return frozenset().union(*(graph[field] for field in payroll.RESULTS.values() if field in graph))
+
+
+def mark_stale(employees, recompute=True):
+    """
+    Flag the impact rows of ``employees`` (ids or an Employee queryset)
+    stale and, with ``recompute``, schedule their recomputation. Returns
+    the flagged employee ids.
+    """
+    impacts = FinalImpactPerMonth.objects.filter(employee__in=employees)
+    employee_ids = list(impacts.values_list('employee_id', flat=True))
+    if employee_ids:
+        FinalImpactPerMonth.objects.filter(employee_id__in=employee_ids).update(is_stale=True)
+        if recompute and getattr(settings, 'PAYROLL_RECOMPUTE_ON_SAVE', False):
+            transaction.on_commit(partial(payroll.recompute_stale, employee_ids))
+    return employee_ids
+
+
+def instance_changed(instance, created):
+    """Mark the owning employee stale if a save touched one of its payroll inputs."""
+    if getattr(instance, '_computed', False):
+        return
+    model = type(instance)
+    employee_id = instance.pk if model is Employee else instance.employee_id
+    changed = None if created else instance.changed_fields()
+
+    if changed is None or changed & FORMULA_FIELDS.get(model, set()) or 'employee_id' in changed:
+        mark_stale([employee_id])
+        return
+
+    variables = {INPUT_FIELDS[(model, field)] for field in changed if (model, field) in INPUT_FIELDS}
+    if variables and variables & employee_inputs(employee_id):
+        mark_stale([employee_id])
+
+
+def formula_users(formula_id):
+    """Employees whose proposed package or impact row links ``formula_id``."""
+    query = Q()
+    for lookup in payroll.formula_lookups().values():
+        query |= Q(**{lookup: formula_id})
+    return Employee.objects.filter(query).values('emp_id')
+
+
+def formula_changed(formula, created):
+    if created:
+        return
+    changed = formula.changed_fields()
+    if changed is None or 'formula_expression' in changed:
+        mark_stale(formula_users(formula.pk))
+
+
+TRACKED_MODELS = (Employee, CurrentPackageDetails, ProposedPackageDetails, FinalImpactPerMonth)
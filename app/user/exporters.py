@@ -0,0 +1,227 @@
+"""
+Streaming payroll export as CSV or XLSX.
+
+The export is a single joined query over Employee and its lookups and
+package rows, read with ``.iterator(chunk_size=...)`` so PostgreSQL uses a
+server-side cursor. Rows are encoded as they arrive; nothing holds the
+whole result in memory. The XLSX writer produces a minimal workbook
+(inline strings, date cells, one sheet) through ``zipfile`` on an
+unseekable buffer so it can be streamed too.
+
+CSV text cells that a spreadsheet would read as a formula (starting with
+``=``, ``+``, ``-``, ``@``, tab or carriage return) are prefixed with
+``'``. XLSX inline strings are never evaluated, so they are left as is.
+"""
+
+import csv
+import datetime
+import re
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from .models import Employee
+
+
+# (header, Employee lookup)
+COLUMNS = (
+    ('Employee ID', 'emp_id'),
+    ('Full Name', 'fullname'),
+    ('Company', 'company_name__name'),
+    ('Designation', 'designation__title'),
+    ('Department', 'department__name'),
+    ('Section', 'section__name'),
+    ('Location', 'location__location'),
+    ('Date of Joining', 'date_of_joining'),
+    ('Gross Salary', 'currentpackagedetails__gross_salary'),
+    ('Vehicle', 'currentpackagedetails__vehicle'),
+    ('Fuel Limit', 'currentpackagedetails__fuel_limit'),
+    ('Mobile Allowance', 'currentpackagedetails__mobile_allowance'),
+    ('Increment %', 'proposedpackagedetails__increment_percentage'),
+    ('Increased Fuel Amount', 'proposedpackagedetails__increased_fuel_amount'),
+    ('Proposed Mobile Allowance', 'proposedpackagedetails__mobile_allowance'),
+    ('Proposed Vehicle', 'proposedpackagedetails__vehicle'),
+    ('Status', 'finalimpactpermonth__emp_status__status'),
+    ('Serving Years', 'finalimpactpermonth__serving_years'),
+    ('Revised Salary', 'finalimpactpermonth__salary'),
+    ('Fuel', 'finalimpactpermonth__fuel'),
+    ('Gratuity', 'finalimpactpermonth__gratuity_amount'),
+    ('Bonus', 'finalimpactpermonth__bonus_amount'),
+    ('Leave Encashment', 'finalimpactpermonth__leave_encashment_amount'),
+    ('Final Mobile Allowance', 'finalimpactpermonth__mobile_allowance_amount'),
+    ('Total Impact', 'finalimpactpermonth__total_amount'),
+)
+
+CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def export_rows(employees=None, chunk_size=CHUNK_SIZE):
+    """Yield one tuple per employee in ``COLUMNS`` order."""
+    if employees is None:
+        employees = Employee.objects.all()
+    lookups = [lookup for _, lookup in COLUMNS]
+    return employees.order_by('emp_id').values_list(*lookups).iterator(chunk_size=chunk_size)
+
+
+class _Echo:
+    # File-like object whose write() hands the data back, see
+    # https://docs.djangoproject.com/en/5.2/howto/outputting-csv/#streaming-large-csv-files
+
+    def write(self, value):
+        return value
+
+
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([header for header, _ in COLUMNS])
+    for row in rows:
+        yield writer.writerow(map(_csv_cell, row))
+
+
+class _StreamBuffer:
+    # Unseekable sink for zipfile; drained by the generator after each write
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+_INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Payroll" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Cell styles: 0 general, 1 date (built-in format 14), 2 date and time (22)
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font/></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf/></cellStyleXfs>'
+        '<cellXfs count="3"><xf/>'
+        '<xf numFmtId="14" applyNumberFormat="1"/><xf numFmtId="22" applyNumberFormat="1"/></cellXfs>'
+        '</styleSheet>'
+    ),
+}
+
+# Day 0 of spreadsheet date serials (1900 date system, past the 1900 leap bug)
+_EPOCH = datetime.datetime(1899, 12, 30)
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, (int, Decimal, float)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    if isinstance(value, datetime.datetime):
+        serial = (value.replace(tzinfo=None) - _EPOCH) / datetime.timedelta(days=1)
+        return f'<c s="2"><v>{serial}</v></c>'
+    if isinstance(value, datetime.date):
+        return f'<c s="1"><v>{(value - _EPOCH.date()).days}</v></c>'
+    text = escape(_INVALID_XML.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(map(_xlsx_cell, values)) + '</row>'
+
+
+def stream_xlsx(rows, flush_every=500):
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_PARTS.items():
+            archive.writestr(name, content)
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _xlsx_row(header for header, _ in COLUMNS)
+            ).encode())
+            yield buffer.drain()
+            for index, row in enumerate(rows, start=1):
+                sheet.write(_xlsx_row(row).encode())
+                if index % flush_every == 0:
+                    yield buffer.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
+
+
+STREAMS = {
+    'csv': stream_csv,
+    'xlsx': stream_xlsx,
+}
+
+
+def stream_export(file_format, employees=None, chunk_size=CHUNK_SIZE):
+    """Yield the encoded export of ``employees`` chunk by chunk."""
+    for chunk in STREAMS[file_format](export_rows(employees, chunk_size)):
+        yield chunk.encode() if isinstance(chunk, str) else chunk
@@ -0,0 +1,50 @@
+"""
+Optional PostgreSQL extensions.
+
+pg_trgm backs the trigram indexes of migrations 0005 and 0009 and typo
+tolerant matching in ``user.search``. It ships with PostgreSQL's contrib
+modules, which not every server has installed, and creating it needs the
+CREATE privilege on the database (it is a trusted extension from
+PostgreSQL 13 on). Migrations create it when they can and skip the
+indexes that need it otherwise; search then uses its portable index. After
+installing it later, run ``CREATE EXTENSION pg_trgm``, the two index
+statements of those migrations and ``manage.py rebuild_search_index``.
+"""
+
+from django.db import DatabaseError, transaction
+
+
+TRIGRAM = 'pg_trgm'
+
+# (alias, database name, extension) -> installed
+_installed = {}
+
+
+def _key(connection, name):
+    return connection.alias, connection.settings_dict['NAME'], name
+
+
+def installed(connection, name):
+    """Whether extension ``name`` is installed in the database of ``connection``."""
+    if connection.vendor != 'postgresql':
+        return False
+    key = _key(connection, name)
+    if key not in _installed:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1 FROM pg_extension WHERE extname = %s', [name])
+            _installed[key] = cursor.fetchone() is not None
+    return _installed[key]
+
+
+def create(schema_editor, name):
+    """Create extension ``name`` if the server allows it; return whether it is installed."""
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return False
+    try:
+        with transaction.atomic(using=connection.alias):
+            schema_editor.execute(f'CREATE EXTENSION IF NOT EXISTS {connection.ops.quote_name(name)}')
+    except DatabaseError:
+        pass
+    _installed.pop(_key(connection, name), None)
+    return installed(connection, name)
@@ -0,0 +1,206 @@
+"""
+Safe evaluator for ``Formula.formula_expression``.
+
+Expressions are plain arithmetic over package fields, e.g.
+``gross_salary * increment_percentage / 100``. Each expression is parsed
+once, checked against a whitelist of AST nodes and compiled into a Python
+function taking the referenced fields as positional arguments. Compiled
+formulas are cached per Formula id and dropped when the row is saved or
+deleted (see ``user.signals``). Other processes miss those signals, so a
+cached formula is only used while its expression matches the row.
+"""
+
+import ast
+from decimal import Decimal, DecimalException, ROUND_HALF_UP
+
+
+CENT = Decimal('0.01')
+
+# Largest exponent ``**`` accepts, so an expression cannot tie up a worker
+MAX_EXPONENT = 100
+
+
+def _round(value, places=0):
+    return value.quantize(Decimal(1).scaleb(-int(places)), rounding=ROUND_HALF_UP)
+
+
+def _power(base, exponent):
+    if abs(exponent) > MAX_EXPONENT:
+        raise FormulaError(f"Exponent {exponent} is larger than {MAX_EXPONENT}")
+    return base ** exponent
+
+
+# Callables an expression may use, e.g. ``max(gross_salary * 0.1, 5000)``
+FUNCTIONS = {
+    'abs': abs,
+    'min': min,
+    'max': max,
+    'round': _round,
+}
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare,
+    ast.IfExp, ast.Call, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.UAdd, ast.USub, ast.Not, ast.And, ast.Or,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+)
+
+
+class FormulaError(ValueError):
+    pass
+
+
+class CompiledFormula:
+    """
+    A parsed and compiled formula expression.
+
+    ``names`` lists the variables the expression reads, in the order the
+    compiled function expects them.
+    """
+
+    __slots__ = ('expression', 'names', 'function')
+
+    def __init__(self, expression, names, function):
+        self.expression = expression
+        self.names = names
+        self.function = function
+
+    def __repr__(self):
+        return f"<CompiledFormula {self.expression!r}>"
+
+    def evaluate(self, variables):
+        try:
+            args = [to_decimal(variables[name]) for name in self.names]
+        except KeyError as exc:
+            raise FormulaError(f"Missing value for {exc.args[0]!r} in {self.expression!r}") from None
+        return self(*args)
+
+    def __call__(self, *args):
+        try:
+            return self.function(*args)
+        except (DecimalException, TypeError, ZeroDivisionError) as exc:
+            raise FormulaError(f"Cannot evaluate {self.expression!r}: {exc!r}") from exc
+
+
+def to_decimal(value):
+    if value is None:
+        return Decimal(0)
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, float):
+        return Decimal(str(value))
+    return Decimal(value)
+
+
+def to_cents(value):
+    return to_decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _validate(tree, expression):
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise FormulaError(f"{type(node).__name__} is not allowed in {expression!r}")
+        if isinstance(node, ast.Name) and node.id.startswith('_'):
+            raise FormulaError(f"Invalid name {node.id!r} in {expression!r}")
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+                raise FormulaError(f"Only {', '.join(sorted(FUNCTIONS))} may be called in {expression!r}")
+            if node.keywords:
+                raise FormulaError(f"Keyword arguments are not allowed in {expression!r}")
+        if isinstance(node, ast.Constant) and (
+            isinstance(node.value, bool) or not isinstance(node.value, (int, float))
+        ):
+            raise FormulaError(f"Only numeric constants are allowed in {expression!r}")
+
+
+class _BindConstants(ast.NodeTransformer):
+    # Replace numeric literals with names bound to Decimal values so that no
+    # float arithmetic happens and constants are not rebuilt on every call,
+    # and ``**`` with the bounded _power.
+
+    def __init__(self):
+        self.constants = {}
+
+    def visit_Constant(self, node):
+        name = f'_c{len(self.constants)}'
+        self.constants[name] = Decimal(str(node.value))
+        return ast.copy_location(ast.Name(id=name, ctx=ast.Load()), node)
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Pow):
+            call = ast.Call(func=ast.Name(id='_power', ctx=ast.Load()), args=[node.left, node.right], keywords=[])
+            return ast.copy_location(call, node)
+        return node
+
+
+def compile_expression(expression):
+    """Parse, validate and compile ``expression`` without touching the cache."""
+    expression = (expression or '').strip()
+    if not expression:
+        raise FormulaError("Formula expression is empty")
+    try:
+        tree = ast.parse(expression, mode='eval')
+    except SyntaxError as exc:
+        raise FormulaError(f"Invalid formula {expression!r}: {exc.msg}") from None
+    _validate(tree, expression)
+
+    names = sorted({
+        node.id for node in ast.walk(tree)
+        if isinstance(node, ast.Name) and node.id not in FUNCTIONS
+    })
+    binder = _BindConstants()
+    body = binder.visit(tree.body)
+    arguments = ast.arguments(
+        posonlyargs=[], args=[ast.arg(arg=name) for name in names],
+        kwonlyargs=[], kw_defaults=[], defaults=[],
+    )
+    lambda_tree = ast.fix_missing_locations(ast.Expression(body=ast.Lambda(args=arguments, body=body)))
+    namespace = {'__builtins__': {}, **FUNCTIONS, '_power': _power, **binder.constants}
+    function = eval(compile(lambda_tree, '<formula>', 'eval'), namespace)
+    return CompiledFormula(expression, tuple(names), function)
+
+
+# Compiled formulas keyed by Formula id
+_cache = {}
+
+
+def get_compiled(formula):
+    compiled = _cache.get(formula.pk)
+    if compiled is None or compiled.expression != (formula.formula_expression or '').strip():
+        compiled = compile_expression(formula.formula_expression)
+        if formula.pk is not None:
+            _cache[formula.pk] = compiled
+    return compiled
+
+
+def get_compiled_many(formula_ids):
+    """
+    Return ``{formula_id: CompiledFormula}`` for ``formula_ids``. The
+    expressions are read in one query; only new or changed ones are compiled.
+    """
+    from .models import Formula
+
+    formula_ids = {pk for pk in formula_ids if pk is not None}
+    if not formula_ids:
+        return {}
+    result = {}
+    for pk, expression in Formula.objects.filter(pk__in=formula_ids).values_list('id', 'formula_expression'):
+        compiled = _cache.get(pk)
+        if compiled is None or compiled.expression != (expression or '').strip():
+            compiled = _cache[pk] = compile_expression(expression)
+        result[pk] = compiled
+    return result
+
+
+def evaluate(formula, variables):
+    return get_compiled(formula).evaluate(variables)
+
+
+def invalidate(formula_id):
+    _cache.pop(formula_id, None)
+
+
+def clear_cache():
+    _cache.clear()
@@ -0,0 +1,54 @@
+"""
+Password hashers whose cost parameters come from settings.
+
+``PASSWORD_HASHER`` picks the one used for new passwords (see settings).
+Django's ``check_password`` rehashes a password on the next successful
+login whenever its algorithm or parameters differ from the preferred
+hasher, so changing the strategy needs no migration of stored hashes.
+"""
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', None) or hashers.PBKDF2PasswordHasher.iterations
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+
+    @property
+    def work_factor(self):
+        return getattr(settings, 'PASSWORD_SCRYPT_WORK_FACTOR', None) or hashers.ScryptPasswordHasher.work_factor
+
+    @property
+    def block_size(self):
+        return getattr(settings, 'PASSWORD_SCRYPT_BLOCK_SIZE', None) or hashers.ScryptPasswordHasher.block_size
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'PASSWORD_SCRYPT_PARALLELISM', None) or hashers.ScryptPasswordHasher.parallelism
+
+    @property
+    def maxmem(self):
+        # hashlib refuses more than 32 MiB by default; scrypt needs 128 * n * r
+        return 2 * 128 * self.work_factor * self.block_size
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Requires argon2-cffi."""
+
+    @property
+    def time_cost(self):
+        return getattr(settings, 'PASSWORD_ARGON2_TIME_COST', None) or hashers.Argon2PasswordHasher.time_cost
+
+    @property
+    def memory_cost(self):
+        return getattr(settings, 'PASSWORD_ARGON2_MEMORY_COST', None) or hashers.Argon2PasswordHasher.memory_cost
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'PASSWORD_ARGON2_PARALLELISM', None) or hashers.Argon2PasswordHasher.parallelism
@@ -0,0 +1,122 @@
+"""
+Org hierarchy queries.
+
+The structure Company -> Department -> Section -> Employee comes from the
+employee's foreign keys. ``employee_org_idx`` indexes them in that order,
+so any prefix (a company, a department of it, a section of that) is one
+index range.
+
+Reporting lines come from ``Employee.manager``. ``ReportingLine`` is their
+closure table: one row for each (manager, employee) pair at any depth.
+Everyone under a manager is then one join on its (ancestor, descendant)
+index, with no query per level. Saves keep it in step through
+``user.signals``. Run ``rebuild`` after changing ``manager`` with
+``update()`` or ``bulk_update``, which send no signals.
+"""
+
+from django.db import transaction
+from django.db.models import Q
+
+from . import summaries
+from .models import Employee, ReportingLine
+
+
+# Name -> Employee field, for org filters and grouping
+ORG_FIELDS = {
+    'company': 'company_name_id',
+    'department': 'department_id',
+    'section': 'section_id',
+    'location': 'location_id',
+}
+
+
+def under(manager, employees=None):
+    """Employees reporting to ``manager`` (an Employee or id), directly or through others."""
+    if employees is None:
+        employees = Employee.objects.all()
+    return employees.filter(ancestor_lines__ancestor=manager)
+
+
+def cost(employees, group_by=()):
+    """
+    Headcount and payroll totals of ``employees`` (see
+    ``summaries.totals``), in one query. With ``group_by`` (Employee
+    fields), one row per group.
+    """
+    employees = employees.order_by()
+    if group_by:
+        return list(employees.values(*group_by).annotate(**summaries.totals()).order_by(*group_by))
+    return employees.aggregate(**summaries.totals())
+
+
+def check_manager(employee):
+    if employee.manager_loops():
+        raise ValueError(f"Employee {employee.manager_id} reports to employee {employee.pk}; cannot be their manager")
+
+
+@transaction.atomic
+def move(employee):
+    """Rewrite the lines of ``employee`` and everyone under them after a change of ``manager``."""
+    below = ReportingLine.objects.filter(ancestor_id=employee.pk)
+    # Lines from above the employee into their subtree
+    (
+        ReportingLine.objects.filter(Q(descendant_id=employee.pk) | Q(descendant_id__in=below.values('descendant_id')))
+        .exclude(ancestor_id=employee.pk)
+        .exclude(ancestor_id__in=below.values('descendant_id'))
+        .delete()
+    )
+    if employee.manager_id is None:
+        return
+    ancestors = [
+        (employee.manager_id, 1),
+        *((ancestor, depth + 1) for ancestor, depth in
+          ReportingLine.objects.filter(descendant_id=employee.manager_id).values_list('ancestor_id', 'depth')),
+    ]
+    subtree = [(employee.pk, 0), *below.values_list('descendant_id', 'depth')]
+    ReportingLine.objects.bulk_create(
+        (
+            ReportingLine(ancestor_id=ancestor, descendant_id=descendant, depth=depth + ancestor_depth)
+            for descendant, depth in subtree
+            for ancestor, ancestor_depth in ancestors
+        ),
+        batch_size=5000,
+    )
+
+
+def instance_changed(employee, created):
+    if created:
+        moved = employee.manager_id is not None
+    else:
+        changed = employee.changed_fields()
+        moved = changed is None or 'manager_id' in changed
+    if moved:
+        move(employee)
+
+
+def employee_deleted(employee):
+    # Reports are set to no manager without signals: detach their subtrees
+    # from the managers above. Lines of the employee itself cascade.
+    ReportingLine.objects.filter(
+        descendant__in=ReportingLine.objects.filter(ancestor_id=employee.pk).values('descendant_id'),
+        ancestor__in=ReportingLine.objects.filter(descendant_id=employee.pk).values('ancestor_id'),
+    ).delete()
+
+
+def rebuild():
+    """Recreate ``ReportingLine`` from ``Employee.manager``. Returns the number of lines."""
+    managers = dict(Employee.objects.exclude(manager=None).values_list('pk', 'manager_id'))
+    lines = []
+    for employee_id, manager_id in managers.items():
+        seen = {employee_id}
+        depth = 1
+        while manager_id is not None:
+            if manager_id in seen:
+                raise ValueError(f"The reporting line of employee {employee_id} loops")
+            seen.add(manager_id)
+            lines.append(ReportingLine(ancestor_id=manager_id, descendant_id=employee_id, depth=depth))
+            manager_id = managers.get(manager_id)
+            depth += 1
+    with transaction.atomic():
+        ReportingLine.objects.all().delete()
+        ReportingLine.objects.bulk_create(lines, batch_size=5000)
+    return len(lines)
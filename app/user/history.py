@@ -0,0 +1,157 @@
+"""
+Effective-dated history of employee packages.
+
+Every save of a ``CurrentPackageDetails`` or ``ProposedPackageDetails``
+appends a ``PackageHistory`` row that holds only the fields that changed.
+The row takes effect today, or from the date set with ``effective`` for
+retroactive corrections. Deleting a package appends a tombstone row
+(``deleted``) the same way. The package in force on a date is rebuilt by
+applying the rows up to that date in ``(effective_date, id)`` order,
+starting over after a tombstone. They are read with one range query on
+``package_history_as_of_idx``.
+
+History rows are kept when their employee is deleted, so they reference
+it without a database constraint.
+"""
+
+import contextlib
+import contextvars
+from decimal import Decimal
+
+from django.utils import timezone
+
+from .models import CurrentPackageDetails, PackageHistory, ProposedPackageDetails
+
+
+HISTORY_MODELS = {
+    CurrentPackageDetails: PackageHistory.CURRENT,
+    ProposedPackageDetails: PackageHistory.PROPOSED,
+}
+
+KIND_MODELS = {kind: model for model, kind in HISTORY_MODELS.items()}
+
+_effective_date = contextvars.ContextVar('package_effective_date', default=None)
+
+
+@contextlib.contextmanager
+def effective(date):
+    """Record package changes saved inside the block as effective from ``date``."""
+    token = _effective_date.set(date)
+    try:
+        yield
+    finally:
+        _effective_date.reset(token)
+
+
+def effective_date():
+    return _effective_date.get() or timezone.localdate()
+
+
+_fields = {}
+
+
+def history_fields(model):
+    """attname -> field of the package fields kept in the history."""
+    fields = _fields.get(model)
+    if fields is None:
+        fields = _fields[model] = {
+            field.attname: field for field in model._meta.concrete_fields
+            if not field.primary_key and field.attname != 'employee_id'
+        }
+    return fields
+
+
+def _encode(value):
+    return str(value) if isinstance(value, Decimal) else value
+
+
+def snapshot(instance, names=None):
+    return {
+        name: _encode(getattr(instance, name))
+        for name in history_fields(type(instance)) if names is None or name in names
+    }
+
+
+def instance_changed(instance, created):
+    changed = None if created else instance.changed_fields()
+    if changed is not None:
+        changed &= history_fields(type(instance)).keys()
+        if not changed:
+            return
+    PackageHistory.objects.create(
+        employee_id=instance.employee_id,
+        kind=HISTORY_MODELS[type(instance)],
+        effective_date=effective_date(),
+        changes=snapshot(instance, changed),
+    )
+
+
+def instance_deleted(instance):
+    PackageHistory.objects.create(
+        employee_id=instance.employee_id,
+        kind=HISTORY_MODELS[type(instance)],
+        effective_date=effective_date(),
+        changes={},
+        deleted=True,
+    )
+
+
+def record_many(instances, batch_size=1000):
+    """Record full snapshots of ``instances``, e.g. after a ``bulk_create``."""
+    date = effective_date()
+    PackageHistory.objects.bulk_create(
+        (
+            PackageHistory(
+                employee_id=instance.employee_id,
+                kind=HISTORY_MODELS[type(instance)],
+                effective_date=date,
+                changes=snapshot(instance),
+            )
+            for instance in instances
+        ),
+        batch_size=batch_size,
+    )
+
+
+def packages_as_of(employees, date, kind=PackageHistory.CURRENT):
+    """
+    Return ``{employee_id: package}`` with the unsaved package instances of
+    ``employees`` (ids or an Employee queryset) in force on ``date``, in one
+    query. Employees without a package on that date, or whose package was
+    deleted by then, are left out.
+    """
+    model = KIND_MODELS[kind]
+    fields = history_fields(model)
+    values = {}
+    rows = (
+        PackageHistory.objects
+        .filter(employee__in=employees, kind=kind, effective_date__lte=date)
+        .order_by('employee_id', 'effective_date', 'id')
+        .values_list('employee_id', 'changes', 'deleted')
+    )
+    for employee_id, changes, deleted in rows.iterator():
+        if deleted:
+            values.pop(employee_id, None)
+            continue
+        values.setdefault(employee_id, {}).update(
+            (name, fields[name].to_python(value)) for name, value in changes.items() if name in fields
+        )
+    return {employee_id: model(employee_id=employee_id, **package) for employee_id, package in values.items()}
+
+
+def package_as_of(employee, date, kind=PackageHistory.CURRENT):
+    employee_id = getattr(employee, 'pk', employee)
+    return packages_as_of([employee_id], date, kind).get(employee_id)
+
+
+def salary_changes(employees, start, end):
+    """
+    Gross salary of ``employees`` on ``start`` and ``end``, for increment
+    reports: ``{employee_id: (start_salary or None, end_salary)}``.
+    """
+    before = packages_as_of(employees, start)
+    after = packages_as_of(employees, end)
+    return {
+        employee_id: (before[employee_id].gross_salary if employee_id in before else None, package.gross_salary)
+        for employee_id, package in after.items()
+    }
@@ -0,0 +1,226 @@
+"""
+Employee image pipeline.
+
+Uploads are streamed to a temporary file chunk by chunk by
+``LimitedUploadHandler``, which rejects files over
+``EMPLOYEE_IMAGE_MAX_BYTES`` and hashes the content as it arrives. After
+validation with Pillow, ``store`` saves the file under its SHA-256
+(``employee_images/ab/abcd....jpg``). The digest doubles as the ETag, and
+identical uploads share one file.
+
+Thumbnails in ``EMPLOYEE_THUMBNAIL_SIZES`` are made once the transaction
+that set the image commits (see ``user.signals``), on a background
+thread, or by ``manage.py generate_thumbnails``. A thumbnail requested
+before that is queued too, and the original image is served meanwhile.
+Failures on the background thread are logged.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import SkipFile, TemporaryFileUploadHandler
+from django.db import transaction
+
+
+logger = logging.getLogger(__name__)
+
+IMAGE_DIR = 'employee_images'
+THUMBNAIL_DIR = 'employee_images/thumbnails'
+
+# Pillow format -> stored extension
+FORMATS = {
+    'JPEG': '.jpg',
+    'PNG': '.png',
+    'WEBP': '.webp',
+    'GIF': '.gif',
+}
+
+CONTENT_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.webp': 'image/webp',
+    '.gif': 'image/gif',
+}
+
+_DIGEST = re.compile(r'[0-9a-f]{64}')
+
+
+class ImageValidationError(ValueError):
+    pass
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def thumbnail_sizes():
+    return tuple(_setting('EMPLOYEE_THUMBNAIL_SIZES', (64, 256)))
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """
+    Stream uploads to a temporary file, hashing them on the way. Files
+    over ``max_size`` bytes are skipped and flagged with ``too_large``.
+    """
+
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size or _setting('EMPLOYEE_IMAGE_MAX_BYTES', 10 * 1024 * 1024)
+        self.too_large = False
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.digest = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_size:
+            self.too_large = True
+            self.file.close()
+            raise SkipFile()
+        self.digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.sha256 = self.digest.hexdigest()
+        return file
+
+
+def validate(file):
+    """Check that ``file`` is an image Pillow can read; return its format."""
+    from PIL import Image
+
+    max_pixels = _setting('EMPLOYEE_IMAGE_MAX_PIXELS', 40_000_000)
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            if image.format not in FORMATS:
+                raise ImageValidationError(f"Unsupported image format {image.format}")
+            if image.width * image.height > max_pixels:
+                raise ImageValidationError(f"Image is larger than {max_pixels} pixels")
+            image.verify()
+            image_format = image.format
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise ImageValidationError("Not a valid image") from None
+    finally:
+        file.seek(0)
+    return image_format
+
+
+def _sha256(file):
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def store(file):
+    """Validate ``file`` and save it under its content hash. Returns the storage name."""
+    extension = FORMATS[validate(file)]
+    digest = getattr(file, 'sha256', None) or _sha256(file)
+    name = f'{IMAGE_DIR}/{digest[:2]}/{digest}{extension}'
+    if not default_storage.exists(name):
+        name = default_storage.save(name, file)
+    return name
+
+
+def thumbnail_name(name, size):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return f'{THUMBNAIL_DIR}/{size}/{stem}.jpg'
+
+
+def make_thumbnails(name, force=False):
+    """Create the missing thumbnails of the stored image ``name``. Returns how many were made."""
+    from PIL import Image, ImageOps
+
+    missing = [
+        size for size in thumbnail_sizes()
+        if force or not default_storage.exists(thumbnail_name(name, size))
+    ]
+    if not missing:
+        return 0
+    with default_storage.open(name, 'rb') as file, Image.open(file) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode != 'RGB':
+            background = Image.new('RGB', original.size, 'white')
+            background.paste(original, mask=original.convert('RGBA').getchannel('A'))
+            original = background
+        for size in missing:
+            image = original.copy()
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, 'JPEG', quality=85, optimize=True, progressive=True)
+            target = thumbnail_name(name, size)
+            if default_storage.exists(target):
+                default_storage.delete(target)
+            default_storage.save(target, ContentFile(buffer.getvalue()))
+    return len(missing)
+
+
+def thumbnail_errors():
+    """Exceptions ``make_thumbnails`` raises for an image it cannot read."""
+    from PIL import Image, UnidentifiedImageError
+
+    return (OSError, UnidentifiedImageError, Image.DecompressionBombError)
+
+
+_executor = None
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def _thumbnails_done(name, future):
+    with _pending_lock:
+        _pending.discard(name)
+    exc = future.exception()
+    if exc is not None:
+        logger.error("Could not make the thumbnails of %s", name, exc_info=exc)
+
+
+def schedule_thumbnails(name):
+    """
+    Make the thumbnails of ``name`` on a background thread, or now when
+    disabled. An image already queued is not queued again.
+    """
+    global _executor
+    if not _setting('EMPLOYEE_THUMBNAILS_IN_BACKGROUND', True):
+        make_thumbnails(name)
+        return
+    with _pending_lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='thumbnails')
+    _executor.submit(make_thumbnails, name).add_done_callback(lambda future: _thumbnails_done(name, future))
+
+
+def instance_changed(employee, created):
+    """Queue thumbnails of a newly set employee image once the save commits."""
+    changed = None if created else employee.changed_fields()
+    if employee.image and (changed is None or 'image' in changed):
+        name = employee.image.name
+        transaction.on_commit(lambda: schedule_thumbnails(name))
+
+
+def etag(name, size=None):
+    """ETag of the stored image ``name``, or of its ``size`` thumbnail."""
+    stem = os.path.splitext(os.path.basename(name))[0]
+    if not _DIGEST.fullmatch(stem):
+        # Uploaded before content-hash names
+        stem = hashlib.sha256(f'{name}:{default_storage.size(name)}'.encode()).hexdigest()
+    return f'{stem}-{size}' if size else stem
+
+
+def content_type(name):
+    return CONTENT_TYPES.get(os.path.splitext(name)[1].lower(), 'application/octet-stream')
@@ -0,0 +1,318 @@
+"""
+Streaming import of employees and their current packages from CSV/XLSX.
+
+Rows are read through a generator and inserted with ``bulk_create`` in
+chunks, each chunk in its own transaction. Company, designation,
+department, section and location names are resolved through name -> id
+maps that are loaded once per import and extended with ``bulk_create``,
+inside the chunk's transaction, when a chunk introduces new names.
+
+Values are checked against the model fields (lengths, digits) per row,
+so one bad row is reported on its own instead of failing its chunk.
+"""
+
+import codecs
+import csv
+import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+from django.utils.dateparse import parse_date
+
+from . import history, lookups, search, summaries
+
+from .models import (
+    Company, CurrentPackageDetails, Department, Designation, Employee, Location, Section,
+)
+
+
+# Spreadsheet column -> (model, name field)
+LOOKUP_COLUMNS = {
+    'company': (Company, 'name'),
+    'designation': (Designation, 'title'),
+    'department': (Department, 'name'),
+    'section': (Section, 'name'),
+    'location': (Location, 'location'),
+}
+
+# Employee foreign key filled from each lookup column
+LOOKUP_FIELDS = {
+    'company': 'company_name_id',
+    'designation': 'designation_id',
+    'department': 'department_id',
+    'section': 'section_id',
+    'location': 'location_id',
+}
+
+PACKAGE_COLUMNS = ('gross_salary', 'vehicle', 'fuel_limit', 'mobile_allowance')
+
+REQUIRED_COLUMNS = ('fullname', 'date_of_joining', *LOOKUP_COLUMNS, 'gross_salary')
+
+DATE_FORMATS = ('%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y')
+
+
+class ImportDataError(ValueError):
+    pass
+
+
+def read_csv(file):
+    """
+    Yield ``(row_number, row)`` for each non-blank row of a binary UTF-8
+    CSV file, ``row`` keyed by lower-cased header. Row numbers count the
+    header as row 1 and include blank rows, as a spreadsheet shows them.
+    """
+    reader = csv.reader(codecs.iterdecode(file, 'utf-8-sig'))
+    row_number = 1
+    try:
+        header = next(reader, None)
+        if header is None:
+            return
+        header = [name.strip().lower() for name in header]
+        for row_number, row in enumerate(reader, start=2):
+            if any(row):
+                yield row_number, dict(zip(header, row))
+    except UnicodeDecodeError:
+        raise ImportDataError(
+            f"The file is not UTF-8 encoded (at row {row_number + 1}); save it as \"CSV UTF-8\" and try again"
+        ) from None
+
+
+def read_xlsx(file):
+    """Yield ``(row_number, row)`` for each non-blank row of the first sheet of an XLSX workbook."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [str(name or '').strip().lower() for name in header]
+        for row_number, row in enumerate(rows, start=2):
+            if any(value not in (None, '') for value in row):
+                yield row_number, dict(zip(header, row))
+    finally:
+        workbook.close()
+
+
+READERS = {
+    'csv': read_csv,
+    'xlsx': read_xlsx,
+}
+
+
+def file_format(name):
+    extension = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+    if extension not in READERS:
+        raise ImportDataError(f"Unsupported file type {name!r}; expected one of {', '.join(READERS)}")
+    return extension
+
+
+class LookupMap:
+    """name -> id map of one lookup model, extended on demand."""
+
+    def __init__(self, model, name_field, create_missing=True):
+        self.model = model
+        self.name_field = name_field
+        self.create_missing = create_missing
+        self.ids = {
+            self.key(name): pk
+            for name, pk in model.objects.values_list(name_field, 'id').order_by('id')
+        }
+
+    @staticmethod
+    def key(name):
+        return ' '.join(str(name).split()).casefold()
+
+    def add_missing(self, names):
+        """
+        Create rows for ``names`` that are not known yet, in one
+        ``bulk_create``, and return their keys for ``discard``. Call it
+        inside the transaction that uses the new ids.
+        """
+        missing = {}
+        for name in names:
+            key = self.key(name)
+            if key not in self.ids:
+                missing.setdefault(key, ' '.join(str(name).split()))
+        if not missing or not self.create_missing:
+            return []
+        self.model.objects.bulk_create(
+            [self.model(**{self.name_field: name}) for name in missing.values()]
+        )
+        created = self.model.objects.filter(**{f'{self.name_field}__in': missing.values()})
+        for name, pk in created.values_list(self.name_field, 'id'):
+            self.ids.setdefault(self.key(name), pk)
+        # bulk_create sends no post_save signal
+        lookups.invalidate(self.model)
+        return list(missing)
+
+    def discard(self, keys):
+        """Forget ids created by ``add_missing`` in a transaction that rolled back."""
+        for key in keys:
+            self.ids.pop(key, None)
+
+    def get(self, name):
+        return self.ids.get(self.key(name))
+
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+def _validate(model, field_name, column, value):
+    try:
+        model._meta.get_field(field_name).run_validators(value)
+    except ValidationError as exc:
+        raise ImportDataError(f"{column}: {' '.join(exc.messages)}") from None
+    return value
+
+
+def _decimal(value, column):
+    if value in (None, ''):
+        return Decimal(0)
+    try:
+        number = Decimal(str(value).replace(',', '').strip())
+    except InvalidOperation:
+        raise ImportDataError(f"{column}: {value!r} is not a number") from None
+    return _validate(CurrentPackageDetails, column, column, number)
+
+
+def _date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    text = _text(value)
+    parsed = parse_date(text) if text else None
+    for date_format in DATE_FORMATS:
+        if parsed is not None:
+            break
+        try:
+            parsed = datetime.datetime.strptime(text, date_format).date()
+        except ValueError:
+            pass
+    if parsed is None:
+        raise ImportDataError(f"date_of_joining: {value!r} is not a valid date")
+    return parsed
+
+
+def parse_row(row):
+    """Validate one spreadsheet row and return its cleaned values."""
+    missing = [column for column in REQUIRED_COLUMNS if _text(row.get(column)) == '']
+    if missing:
+        raise ImportDataError(f"Missing value for {', '.join(missing)}")
+    cleaned = {
+        'fullname': _validate(Employee, 'fullname', 'fullname', _text(row['fullname'])),
+        'date_of_joining': _date(row['date_of_joining']),
+        'remarks': _text(row.get('remarks')),
+    }
+    for column, (model, name_field) in LOOKUP_COLUMNS.items():
+        cleaned[column] = _validate(model, name_field, column, ' '.join(_text(row[column]).split()))
+    for column in PACKAGE_COLUMNS:
+        cleaned[column] = _decimal(row.get(column), column)
+    return cleaned
+
+
+class ImportResult:
+
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+    def error(self, row_number, message):
+        """Record a row error, or with ``row_number`` None one for the whole file."""
+        self.errors.append({'row': row_number, 'error': str(message)})
+
+    def as_dict(self):
+        return {'created': self.created, 'failed': len(self.errors), 'errors': self.errors}
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        try:
+            chunk = list(islice(iterator, size))
+        except ImportDataError as exc:
+            # The reader gave up on the file; rows before it were imported
+            yield [], exc
+            return
+        if not chunk:
+            return
+        yield chunk, None
+
+
+def import_employees(rows, chunk_size=1000, create_missing=True):
+    """
+    Import ``rows`` (an iterable of ``(row_number, dict)``, e.g. from
+    ``read_csv``) and return an ``ImportResult``. An ``ImportDataError``
+    raised by ``rows`` ends the import with a file-level error.
+    """
+    lookups = {
+        column: LookupMap(model, name_field, create_missing)
+        for column, (model, name_field) in LOOKUP_COLUMNS.items()
+    }
+    result = ImportResult()
+
+    for chunk, file_error in _chunks(rows, chunk_size):
+        if file_error is not None:
+            result.error(None, file_error)
+            break
+        parsed = []
+        for row_number, row in chunk:
+            try:
+                parsed.append((row_number, parse_row(row)))
+            except ImportDataError as exc:
+                result.error(row_number, exc)
+
+        created = {}
+        numbers = []
+        try:
+            with transaction.atomic():
+                for column, lookup in lookups.items():
+                    created[column] = lookup.add_missing(values[column] for _, values in parsed)
+
+                employees, packages = [], []
+                for row_number, values in parsed:
+                    foreign_keys = {LOOKUP_FIELDS[column]: lookups[column].get(values[column]) for column in lookups}
+                    unknown = [column for column in lookups if foreign_keys[LOOKUP_FIELDS[column]] is None]
+                    if unknown:
+                        result.error(row_number, f"Unknown {', '.join(unknown)}")
+                        continue
+                    employees.append(Employee(
+                        fullname=values['fullname'],
+                        date_of_joining=values['date_of_joining'],
+                        remarks=values['remarks'],
+                        **foreign_keys,
+                    ))
+                    packages.append(values)
+                    numbers.append(row_number)
+
+                Employee.objects.bulk_create(employees)
+                current_packages = CurrentPackageDetails.objects.bulk_create([
+                    CurrentPackageDetails(employee=employee, **{column: values[column] for column in PACKAGE_COLUMNS})
+                    for employee, values in zip(employees, packages)
+                ])
+                # bulk_create sends no post_save signal
+                history.record_many(current_packages)
+                search.index_employees(employees)
+                summaries.mark_groups(
+                    (employee.company_name_id, employee.department_id, employee.location_id)
+                    for employee in employees
+                )
+        except DatabaseError as exc:
+            for column, keys in created.items():
+                lookups[column].discard(keys)
+            # Failing before the rows were checked fails them all
+            for row_number in numbers or [row_number for row_number, _ in parsed]:
+                result.error(row_number, f"Chunk rolled back: {exc}")
+        else:
+            result.created += len(employees)
+
+    return result
+
+
+def import_file(file, name, chunk_size=1000, create_missing=True):
+    return import_employees(READERS[file_format(name)](file), chunk_size, create_missing)
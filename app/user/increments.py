@@ -0,0 +1,276 @@
+"""
+Applying an approved increment cycle: every employee's proposed package
+becomes their current one.
+
+The new current package is the revised salary and fuel allowance, as
+computed by ``payroll.STEPS`` on the effective date, and the proposed
+mobile allowance and vehicle (see ``APPLIED_FIELDS``). ``apply_cycle``
+walks the employees with both packages in emp_id order,
+``INCREMENT_CHUNK_SIZE`` at a time. Each chunk is one transaction: it
+locks the chunk's current packages, computes the new values column-wise
+with one query, writes them with ``bulk.update`` (``UPDATE ... FROM``)
+and records an ``IncrementChange`` and a ``PackageHistory`` row
+(effective on the cycle's date) per changed employee. The proposal inputs
+in ``CONSUMED_FIELDS`` are reset in the same transaction, so applying
+again does not raise the same packages twice. Locks are held for one chunk only; a
+failure leaves the committed chunks applied and the cycle ``FAILED``,
+ready to roll back.
+
+With ``dry_run`` nothing is written and the diff is returned instead.
+``rollback_cycle`` restores the previous values in the same way, except
+for packages changed again since the cycle, which it leaves alone, and
+restores the reset proposals of the packages it restores. A new cycle is
+refused while one covering the same company is applying or failed (roll
+a failed one back first). A cycle left ``APPLYING`` by a process that
+died can be rolled back with ``force``.
+
+Bulk writes send no signals, so each chunk flags its employees' impact
+rows stale itself. Stale rows are recomputed (with
+``PAYROLL_RECOMPUTE_ON_SAVE``) and payroll summaries refreshed once per
+cycle, not per chunk, as every chunk touches most summary groups.
+"""
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import bulk, dependencies, history, payroll, summaries
+from .models import Company, CurrentPackageDetails, Employee, IncrementChange, IncrementCycle, ProposedPackageDetails
+
+
+# CurrentPackageDetails field -> payroll variable it is set to
+APPLIED_FIELDS = {
+    'gross_salary': 'revised_salary',
+    'fuel_limit': 'revised_fuel_allowance',
+    'mobile_allowance': 'proposed_mobile_allowance',
+    'vehicle': 'proposed_vehicle',
+}
+
+# ProposedPackageDetails field -> value once applied. The proposed mobile
+# allowance and vehicle need no reset: they now equal the current package.
+CONSUMED_FIELDS = {
+    'increment_percentage': Decimal(0),
+    'increased_fuel_amount': Decimal(0),
+}
+
+PACKAGE_ID = 'currentpackagedetails__id'
+PROPOSAL_ID = 'proposedpackagedetails__id'
+
+
+def _chunk_size(chunk_size):
+    return chunk_size or getattr(settings, 'INCREMENT_CHUNK_SIZE', 1000)
+
+
+def _chunks(queryset, field, chunk_size):
+    """Yield the values of ``field`` in ``queryset`` in ascending chunks, one query each."""
+    last = None
+    while True:
+        chunk = queryset.order_by(field)
+        if last is not None:
+            chunk = chunk.filter(**{f'{field}__gt': last})
+        chunk = list(chunk.values_list(field, flat=True)[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+
+
+def _lock(employee_ids):
+    # Taken before reading so no save slips in between; no-op on SQLite,
+    # which locks the whole database at the first write
+    for model in (CurrentPackageDetails, ProposedPackageDetails):
+        list(model.objects.select_for_update().filter(employee_id__in=employee_ids).values_list('pk'))
+
+
+def _encode(values):
+    return history.snapshot(CurrentPackageDetails(**values))
+
+
+def _decode(changes):
+    fields = history.history_fields(CurrentPackageDetails)
+    return {name: fields[name].to_python(value) for name, value in changes.items()}
+
+
+def _write(packages, changes, effective_date, proposals):
+    """
+    Save ``packages`` (CurrentPackageDetails with every field set) and
+    ``proposals`` (ProposedPackageDetails with ``CONSUMED_FIELDS`` set),
+    and what follows from them.
+    """
+    bulk.update(packages, APPLIED_FIELDS)
+    if proposals:
+        bulk.update(proposals, CONSUMED_FIELDS)
+    if changes:
+        IncrementChange.objects.bulk_create(changes)
+    with history.effective(effective_date):
+        history.record_many(packages)
+    dependencies.mark_stale([package.employee_id for package in packages], recompute=False)
+
+
+def _finish(employees):
+    """Bring what depends on the packages of ``employees`` (an Employee queryset) up to date."""
+    if getattr(settings, 'PAYROLL_RECOMPUTE_ON_SAVE', False):
+        transaction.on_commit(payroll.recompute_stale)
+    summaries.mark_employees(employees)
+
+
+def _apply_chunk(cycle, employee_ids, effective_date, diff):
+    employees = Employee.objects.filter(emp_id__in=employee_ids, proposedpackagedetails__isnull=False)
+    columns, size = payroll.fetch_columns(employees, extra=[PACKAGE_ID, PROPOSAL_ID])
+    payroll.compute_columns(columns, size, effective_date)
+
+    packages, changes, proposals = [], [], []
+    for index in range(size):
+        previous = {field: columns[field][index] for field in APPLIED_FIELDS}
+        applied = {field: columns[variable][index] for field, variable in APPLIED_FIELDS.items()}
+        if previous == applied:
+            continue
+        employee_id = columns['emp_id'][index]
+        diff.append({
+            'employee_id': employee_id,
+            'changes': {
+                field: (previous[field], applied[field])
+                for field in APPLIED_FIELDS if previous[field] != applied[field]
+            },
+        })
+        if cycle is not None:
+            packages.append(CurrentPackageDetails(id=columns[PACKAGE_ID][index], employee_id=employee_id, **applied))
+            proposals.append(ProposedPackageDetails(
+                id=columns[PROPOSAL_ID][index], employee_id=employee_id, **CONSUMED_FIELDS,
+            ))
+            changes.append(IncrementChange(
+                cycle=cycle, employee_id=employee_id, previous=_encode(previous), applied=_encode(applied),
+                proposed={field: str(columns[field][index]) for field in CONSUMED_FIELDS},
+            ))
+    if packages:
+        _write(packages, changes, effective_date, proposals)
+    return size
+
+
+def _start_cycle(company_id, effective_date):
+    """Create the cycle, unless one covering the same employees is applying or failed."""
+    with transaction.atomic():
+        # Serializes concurrent applies to overlapping companies (no-op on SQLite)
+        companies = Company.objects.select_for_update()
+        if company_id is not None:
+            companies = companies.filter(pk=company_id)
+        list(companies.values_list('pk'))
+        open_cycles = IncrementCycle.objects.filter(status__in=(IncrementCycle.APPLYING, IncrementCycle.FAILED))
+        if company_id is not None:
+            open_cycles = open_cycles.filter(Q(company_id=company_id) | Q(company__isnull=True))
+        open_cycle = open_cycles.order_by('pk').first()
+        if open_cycle is not None:
+            raise ValueError(
+                f"Increment cycle {open_cycle.pk} is {open_cycle.get_status_display().lower()} for "
+                f"{'all companies' if open_cycle.company_id is None else f'company {open_cycle.company_id}'}; "
+                "wait for it to finish or roll it back first"
+            )
+        return IncrementCycle.objects.create(company_id=company_id, effective_date=effective_date)
+
+
+def apply_cycle(company=None, effective_date=None, dry_run=False, chunk_size=None):
+    """
+    Apply the proposed packages of ``company``'s employees (default: all
+    companies) from ``effective_date`` (default: today).
+
+    Returns ``{'cycle', 'employees', 'changed', 'totals', 'diff'}``:
+    the IncrementCycle id (None for a dry run), the employees considered
+    and changed, the change of each package field summed over them, and
+    for a dry run ``[{'employee_id', 'changes': {field: (old, new)}}]``.
+    Raises ValueError while another cycle covering the same employees is
+    applying or failed.
+    """
+    effective_date = effective_date or timezone.localdate()
+    company_id = getattr(company, 'pk', company)
+    employees = Employee.objects.filter(currentpackagedetails__isnull=False, proposedpackagedetails__isnull=False)
+    if company_id is not None:
+        employees = employees.filter(company_name_id=company_id)
+
+    cycle = None
+    if not dry_run:
+        cycle = _start_cycle(company_id, effective_date)
+    diff, count = [], 0
+    try:
+        for employee_ids in _chunks(employees, 'emp_id', _chunk_size(chunk_size)):
+            with transaction.atomic():
+                if cycle is not None:
+                    _lock(employee_ids)
+                count += _apply_chunk(cycle, employee_ids, effective_date, diff)
+    except Exception as exc:
+        if cycle is not None:
+            IncrementCycle.objects.filter(pk=cycle.pk).update(
+                status=IncrementCycle.FAILED, error=str(exc), changed_employees=cycle.changes.count(),
+                finished_at=timezone.now(),
+            )
+            _finish(employees)
+        raise
+
+    if cycle is not None:
+        IncrementCycle.objects.filter(pk=cycle.pk).update(
+            status=IncrementCycle.APPLIED, changed_employees=len(diff), finished_at=timezone.now(),
+        )
+        _finish(employees)
+    totals = dict.fromkeys(APPLIED_FIELDS, Decimal(0))
+    for row in diff:
+        for field, (old, new) in row['changes'].items():
+            totals[field] += new - old
+    return {
+        'cycle': cycle.pk if cycle is not None else None,
+        'employees': count,
+        'changed': len(diff),
+        'totals': totals,
+        'diff': diff if dry_run else None,
+    }
+
+
+def _rollback_chunk(cycle, employee_ids):
+    changes = {
+        employee_id: (_decode(previous), _decode(applied), proposed)
+        for employee_id, previous, applied, proposed in (
+            cycle.changes.filter(employee_id__in=employee_ids)
+            .values_list('employee_id', 'previous', 'applied', 'proposed')
+        )
+    }
+    packages = []
+    current = CurrentPackageDetails.objects.filter(employee_id__in=employee_ids)
+    for pk, employee_id, *values in current.values_list('pk', 'employee_id', *APPLIED_FIELDS):
+        previous, applied, _ = changes[employee_id]
+        if dict(zip(APPLIED_FIELDS, values)) == applied:
+            packages.append(CurrentPackageDetails(id=pk, employee_id=employee_id, **previous))
+    # The proposals of restored packages, unless edited since
+    restored = {package.employee_id for package in packages}
+    proposals = []
+    proposed = ProposedPackageDetails.objects.filter(employee_id__in=restored)
+    for pk, employee_id, *values in proposed.values_list('pk', 'employee_id', *CONSUMED_FIELDS):
+        consumed = changes[employee_id][2]
+        if consumed and dict(zip(CONSUMED_FIELDS, values)) == CONSUMED_FIELDS:
+            proposals.append(ProposedPackageDetails(
+                id=pk, employee_id=employee_id, **{field: Decimal(value) for field, value in consumed.items()},
+            ))
+    if packages:
+        _write(packages, None, cycle.effective_date, proposals)
+    return len(packages)
+
+
+def rollback_cycle(cycle, chunk_size=None, force=False):
+    """
+    Restore the packages ``cycle`` changed, chunk by chunk like
+    ``apply_cycle``. Returns ``{'restored', 'skipped'}``; skipped packages
+    were changed since, or deleted. With ``force`` an ``APPLYING`` cycle
+    is rolled back too; only use it once the process applying it is gone.
+    """
+    allowed = (IncrementCycle.APPLIED, IncrementCycle.FAILED, *((IncrementCycle.APPLYING,) if force else ()))
+    if cycle.status not in allowed:
+        raise ValueError(f"Cannot roll back a cycle that is {cycle.get_status_display().lower()}")
+    restored = total = 0
+    for employee_ids in _chunks(cycle.changes.all(), 'employee_id', _chunk_size(chunk_size)):
+        with transaction.atomic():
+            _lock(employee_ids)
+            restored += _rollback_chunk(cycle, employee_ids)
+        total += len(employee_ids)
+    IncrementCycle.objects.filter(pk=cycle.pk).update(status=IncrementCycle.ROLLED_BACK, rolled_back_at=timezone.now())
+    _finish(Employee.objects.filter(pk__in=cycle.changes.values('employee_id')))
+    return {'restored': restored, 'skipped': total - restored}
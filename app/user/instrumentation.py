@@ -0,0 +1,333 @@
+"""
+Per-view query and latency instrumentation.
+
+``QueryInstrumentationMiddleware`` records, for each request, the view,
+status, response latency, number of queries and time spent in SQL. Every
+database connection gets one ``execute_wrapper`` for the life of the
+process, which counts into the ``QueryCounter`` of the current context
+(a ContextVar set by the middleware). Concurrent requests, and async
+views whose queries run on the shared sync thread, therefore each count
+their own queries only. The middleware is sync and async capable.
+In 'full' mode it also records the statements run at least
+``QUERY_INSTRUMENTATION_DUPLICATES`` times, with the line of project
+code that first repeated them. These are usually N+1 queries: a related
+object, or a ``__str__`` that reads one, loaded once per row.
+
+``QUERY_INSTRUMENTATION`` selects the mode:
+
+- ``'off'``: the middleware removes itself from the stack.
+- ``'counts'``: a counter per query, no statement text kept. Near-zero
+  overhead; ``QUERY_INSTRUMENTATION_SAMPLE_RATE`` cuts it further.
+- ``'full'``: counts plus duplicate detection.
+
+Records go to a per-process ring buffer (``recent()``). When
+``QUERY_INSTRUMENTATION_DB`` names a SQLite file, they are also written
+to it in batches on a background thread, keeping the last
+``QUERY_INSTRUMENTATION_KEEP`` requests, for ``manage.py query_stats``.
+
+Queries run while a streaming response is consumed happen after the
+middleware returns and are not counted; its latency is to the first byte.
+"""
+
+import atexit
+import bisect
+import json
+import random
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Duplicated statements kept per request
+MAX_DUPLICATES = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    recorded_at REAL NOT NULL,
+    method TEXT NOT NULL,
+    view TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    latency_ms REAL NOT NULL,
+    queries INTEGER NOT NULL,
+    sql_ms REAL NOT NULL,
+    duplicates TEXT
+)
+"""
+
+COLUMNS = ('recorded_at', 'method', 'view', 'status', 'latency_ms', 'queries', 'sql_ms', 'duplicates')
+
+
+def _origin():
+    # Innermost frame of project code, skipping this module
+    root = str(Path(settings.BASE_DIR)) + '/'
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(root) and filename != __file__ and 'site-packages' not in filename:
+            return f"{filename[len(root):]}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+class QueryCounter:
+    """``execute_wrapper`` counting queries and SQL time, and repeated statements when ``full``."""
+
+    __slots__ = ('queries', 'sql_time', 'statements')
+
+    def __init__(self, full=False):
+        self.queries = 0
+        self.sql_time = 0.0
+        # SQL with placeholders -> [executions, origin of the first repeat]
+        self.statements = {} if full else None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries += 1
+            if self.statements is not None:
+                entry = self.statements.get(sql)
+                if entry is None:
+                    self.statements[sql] = [1, None]
+                else:
+                    entry[0] += 1
+                    if entry[1] is None:
+                        entry[1] = _origin()
+
+    def duplicates(self, threshold):
+        """``[[sql, executions, origin], ...]`` run at least ``threshold`` times, most first."""
+        if not self.statements:
+            return []
+        repeated = [
+            [sql, count, origin] for sql, (count, origin) in self.statements.items() if count >= threshold
+        ]
+        repeated.sort(key=lambda entry: -entry[1])
+        return repeated[:MAX_DUPLICATES]
+
+
+# Counter of the request being handled in this context, if instrumented
+_counter = ContextVar('query_counter', default=None)
+
+
+def _count(execute, sql, params, many, context):
+    counter = _counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    return counter(execute, sql, params, many, context)
+
+
+def install(connection, **kwargs):
+    """Add the counting wrapper to ``connection`` (a DatabaseWrapper) once."""
+    if _count not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count)
+
+
+class SQLiteSink:
+    """Append-only SQLite file keeping the last ``keep`` request records."""
+
+    def __init__(self, path, keep):
+        self.path = path
+        self.keep = keep
+        self._created = False
+
+    def connect(self):
+        db = sqlite3.connect(self.path, timeout=5)
+        if not self._created:
+            db.execute(SCHEMA)
+            self._created = True
+        return db
+
+    def write(self, records):
+        db = self.connect()
+        try:
+            with db:
+                db.executemany(
+                    f"INSERT INTO requests ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                    [
+                        (*record[:-1], json.dumps(record[-1]) if record[-1] else None)
+                        for record in records
+                    ],
+                )
+                db.execute("DELETE FROM requests WHERE id <= (SELECT MAX(id) FROM requests) - ?", (self.keep,))
+        finally:
+            db.close()
+
+    def read(self, since=None, view=None):
+        db = self.connect()
+        try:
+            sql = f"SELECT {', '.join(COLUMNS)} FROM requests WHERE recorded_at >= ?"
+            params = [since or 0]
+            if view:
+                sql += " AND view LIKE ?"
+                params.append(f'%{view}%')
+            rows = db.execute(sql + " ORDER BY id", params).fetchall()
+        finally:
+            db.close()
+        return [
+            dict(zip(COLUMNS, (*row[:-1], json.loads(row[-1]) if row[-1] else [])))
+            for row in rows
+        ]
+
+    def clear(self):
+        db = self.connect()
+        try:
+            with db:
+                db.execute("DELETE FROM requests")
+        finally:
+            db.close()
+
+
+_buffer = deque(maxlen=1000)
+_pending = []
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+_sink = None
+
+
+def sink():
+    """The configured ``SQLiteSink``, or None."""
+    global _sink
+    path = settings.QUERY_INSTRUMENTATION_DB
+    if not path:
+        return None
+    if _sink is None or _sink.path != str(path):
+        _sink = SQLiteSink(str(path), settings.QUERY_INSTRUMENTATION_KEEP)
+    return _sink
+
+
+_writer = None
+
+
+def record(entry):
+    """Add a request record to the ring buffer and, in batches, to the sink on a background thread."""
+    global _last_flush, _writer
+    _buffer.append(entry)
+    if not settings.QUERY_INSTRUMENTATION_DB:
+        return
+    with _lock:
+        _pending.append(entry)
+        due = (
+            len(_pending) >= settings.QUERY_INSTRUMENTATION_BATCH
+            or time.monotonic() - _last_flush >= settings.QUERY_INSTRUMENTATION_FLUSH_SECONDS
+        )
+        if not due:
+            return
+        # Not due again until this flush has run
+        _last_flush = time.monotonic()
+        if _writer is None:
+            _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='query-instrumentation')
+    _writer.submit(flush)
+
+
+def flush():
+    """Write the pending records to the sink."""
+    global _last_flush
+    with _lock:
+        records = _pending[:]
+        _pending.clear()
+        _last_flush = time.monotonic()
+    if records and sink() is not None:
+        sink().write(records)
+
+
+atexit.register(flush)
+
+
+def recent():
+    """Records of this process, oldest first, as dicts."""
+    return [dict(zip(COLUMNS, entry)) for entry in list(_buffer)]
+
+
+def histogram(latencies_ms):
+    """Request counts per ``LATENCY_BUCKETS_MS`` bucket, plus one for slower requests."""
+    counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    for latency in latencies_ms:
+        counts[bisect.bisect_left(LATENCY_BUCKETS_MS, latency)] += 1
+    return counts
+
+
+class QueryInstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        global _buffer
+        mode = settings.QUERY_INSTRUMENTATION
+        if mode not in ('counts', 'full'):
+            raise MiddlewareNotUsed
+        if _buffer.maxlen != settings.QUERY_INSTRUMENTATION_BUFFER:
+            _buffer = deque(_buffer, maxlen=settings.QUERY_INSTRUMENTATION_BUFFER)
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.full = mode == 'full'
+        self.sample_rate = settings.QUERY_INSTRUMENTATION_SAMPLE_RATE
+        self.threshold = settings.QUERY_INSTRUMENTATION_DUPLICATES
+        # Connections opened from now on, in any thread, and those of this one
+        connection_created.connect(install, dispatch_uid='query_instrumentation')
+        for connection in connections.all(initialized_only=True):
+            install(connection)
+
+    def sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        counter = QueryCounter(self.full)
+        token = _counter.set(counter)
+        try:
+            start = time.perf_counter()
+            response = self.get_response(request)
+            latency = time.perf_counter() - start
+        finally:
+            _counter.reset(token)
+        self.record(request, response, counter, latency)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        counter = QueryCounter(self.full)
+        token = _counter.set(counter)
+        try:
+            start = time.perf_counter()
+            response = await self.get_response(request)
+            latency = time.perf_counter() - start
+        finally:
+            _counter.reset(token)
+        self.record(request, response, counter, latency)
+        return response
+
+    def record(self, request, response, counter, latency):
+        match = request.resolver_match
+        record((
+            time.time(),
+            request.method,
+            match.view_name if match else '<unresolved>',
+            response.status_code,
+            round(latency * 1000, 3),
+            counter.queries,
+            round(counter.sql_time * 1000, 3),
+            counter.duplicates(self.threshold),
+        ))
@@ -0,0 +1,264 @@
+"""
+Read-through cache for the small lookup tables.
+
+Company, Department, Section, Designation, Location, EmployeeStatus and
+Gender rarely change but are joined on nearly every employee read. Each
+model gets a ``LookupCache`` that keeps ``id -> object`` and
+``name -> id`` maps in process memory.
+
+A process trusts its copy for ``LOOKUP_CACHE_TIMEOUT`` seconds. With
+``LOOKUP_CACHE_ALIAS`` set, the maps and a version number are also kept in
+that Django cache: saves bump the version, so after the timeout other
+processes compare versions (one cache read) instead of reloading from the
+database. Without it, an expired copy is simply reloaded.
+
+Invalidation only marks the copy stale; readers keep using the maps they
+already hold and the next access reloads them. A reload replaces the maps
+rather than mutating them, and readers take each map into a local once.
+
+Cached instances are shared; treat them as read-only. Async code uses
+the ``a``-prefixed functions, which load through the async ORM and cache
+APIs and never block the event loop.
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import Company, Department, Designation, EmployeeStatus, Gender, Location, Section
+
+
+# model -> field holding its display name
+LOOKUP_MODELS = {
+    Company: 'name',
+    Department: 'name',
+    Section: 'name',
+    Designation: 'title',
+    Location: 'location',
+    EmployeeStatus: 'status',
+    Gender: 'gender',
+}
+
+
+def normalize(name):
+    return ' '.join(str(name).split()).casefold()
+
+
+class LookupCache:
+
+    def __init__(self, model, name_field):
+        self.model = model
+        self.name_field = name_field
+        self.key = f'lookups:{model._meta.label_lower}'
+        self.version = None
+        self.objects = None
+        self.ids = None
+        self.checked_at = None
+        # Bumped by invalidate(), so a load racing with it is not trusted
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.async_locks = weakref.WeakKeyDictionary()
+
+    @staticmethod
+    def shared():
+        alias = getattr(settings, 'LOOKUP_CACHE_ALIAS', None)
+        return caches[alias] if alias else None
+
+    def shared_version(self, shared):
+        version = shared.get(f'{self.key}:version')
+        if version is None:
+            shared.add(f'{self.key}:version', time.time_ns(), None)
+            version = shared.get(f'{self.key}:version')
+        return version
+
+    def load(self):
+        shared = self.shared()
+        version = self.shared_version(shared) if shared is not None else None
+        if self.objects is not None and version is not None and version == self.version:
+            return
+
+        objects = shared.get(f'{self.key}:{version}') if shared is not None else None
+        if objects is None:
+            objects = list(self.model.objects.all())
+            if shared is not None:
+                shared.set(f'{self.key}:{version}', objects)
+        self.set_objects(objects, version)
+
+    async def ashared_version(self, shared):
+        version = await shared.aget(f'{self.key}:version')
+        if version is None:
+            await shared.aadd(f'{self.key}:version', time.time_ns(), None)
+            version = await shared.aget(f'{self.key}:version')
+        return version
+
+    async def aload(self):
+        shared = self.shared()
+        version = await self.ashared_version(shared) if shared is not None else None
+        if self.objects is not None and version is not None and version == self.version:
+            return
+
+        objects = await shared.aget(f'{self.key}:{version}') if shared is not None else None
+        if objects is None:
+            objects = [obj async for obj in self.model.objects.all()]
+            if shared is not None:
+                await shared.aset(f'{self.key}:{version}', objects)
+        self.set_objects(objects, version)
+
+    def set_objects(self, objects, version=None):
+        ids = {normalize(getattr(obj, self.name_field)): obj.pk for obj in objects}
+        self.ids = ids
+        self.objects = {obj.pk: obj for obj in objects}
+        self.version = version
+
+    def is_fresh(self):
+        timeout = getattr(settings, 'LOOKUP_CACHE_TIMEOUT', 60)
+        checked_at = self.checked_at
+        return checked_at is not None and time.monotonic() - checked_at < timeout
+
+    def ensure_loaded(self):
+        if self.is_fresh():
+            return
+        with self.lock:
+            if not self.is_fresh():
+                generation = self.generation
+                self.load()
+                if generation == self.generation:
+                    self.checked_at = time.monotonic()
+
+    async def aensure_loaded(self):
+        if self.is_fresh():
+            return
+        # One lock per event loop, so concurrent requests wait for a single load
+        loop = asyncio.get_running_loop()
+        lock = self.async_locks.get(loop)
+        if lock is None:
+            lock = self.async_locks[loop] = asyncio.Lock()
+        async with lock:
+            if not self.is_fresh():
+                generation = self.generation
+                await self.aload()
+                if generation == self.generation:
+                    self.checked_at = time.monotonic()
+
+    def get(self, pk):
+        """Return the instance with ``pk``; unknown ids are read through to the database."""
+        if pk is None:
+            return None
+        self.ensure_loaded()
+        objects = self.objects
+        obj = objects.get(pk)
+        if obj is None:
+            obj = self.model.objects.filter(pk=pk).first()
+            if obj is not None:
+                self.remember(objects, obj)
+        return obj
+
+    async def aget(self, pk):
+        if pk is None:
+            return None
+        await self.aensure_loaded()
+        objects = self.objects
+        obj = objects.get(pk)
+        if obj is None:
+            obj = await self.model.objects.filter(pk=pk).afirst()
+            if obj is not None:
+                self.remember(objects, obj)
+        return obj
+
+    def remember(self, objects, obj):
+        # Into the maps the caller read from; a reload in between replaced them
+        objects[obj.pk] = obj
+        if objects is self.objects:
+            self.ids.setdefault(normalize(getattr(obj, self.name_field)), obj.pk)
+
+    def get_id(self, name):
+        self.ensure_loaded()
+        return self.ids.get(normalize(name))
+
+    async def aget_id(self, name):
+        await self.aensure_loaded()
+        return self.ids.get(normalize(name))
+
+    def all(self):
+        self.ensure_loaded()
+        return list(self.objects.values())
+
+    def invalidate(self):
+        self.generation += 1
+        self.checked_at = None
+        shared = self.shared()
+        if shared is not None:
+            shared.set(f'{self.key}:version', time.time_ns(), None)
+
+
+_caches = {model: LookupCache(model, name_field) for model, name_field in LOOKUP_MODELS.items()}
+
+
+def get_cache(model):
+    return _caches[model]
+
+
+def get(model, pk):
+    return _caches[model].get(pk)
+
+
+def get_id(model, name):
+    return _caches[model].get_id(name)
+
+
+async def aget(model, pk):
+    return await _caches[model].aget(pk)
+
+
+async def aget_id(model, name):
+    return await _caches[model].aget_id(name)
+
+
+def invalidate(model):
+    # Drop the copy now and again after commit, so that a reload racing
+    # with the transaction does not keep the old rows.
+    _caches[model].invalidate()
+    transaction.on_commit(_caches[model].invalidate)
+
+
+_lookup_fields = {}
+
+
+def lookup_fields(model):
+    """Foreign keys of ``model`` that point at a cached lookup model."""
+    fields = _lookup_fields.get(model)
+    if fields is None:
+        fields = _lookup_fields[model] = [
+            field for field in model._meta.concrete_fields
+            if field.many_to_one and field.related_model in _caches
+        ]
+    return fields
+
+
+def attach(instances):
+    """
+    Set the lookup foreign keys of ``instances`` from the cache so that
+    accessing e.g. ``employee.company_name`` runs no query.
+    """
+    for instance in instances:
+        for field in lookup_fields(type(instance)):
+            if not field.is_cached(instance):
+                obj = _caches[field.related_model].get(getattr(instance, field.attname))
+                if obj is not None:
+                    field.set_cached_value(instance, obj)
+    return instances
+
+
+async def aattach(instances):
+    for instance in instances:
+        for field in lookup_fields(type(instance)):
+            if not field.is_cached(instance):
+                obj = await _caches[field.related_model].aget(getattr(instance, field.attname))
+                if obj is not None:
+                    field.set_cached_value(instance, obj)
+    return instances
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from user import increments
+from user.models import Company, IncrementCycle
+
+
+class Command(BaseCommand):
+    help = "Turn the proposed packages into the current ones, or roll an increment cycle back"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help="Company id (default: all companies)")
+        parser.add_argument('--effective', type=parse_date, help="Effective date, as YYYY-MM-DD (default: today)")
+        parser.add_argument('--chunk-size', type=int, help="Employees per transaction (default: INCREMENT_CHUNK_SIZE)")
+        parser.add_argument('--dry-run', action='store_true', help="Show the changes without writing them")
+        parser.add_argument('--rollback', type=int, metavar='CYCLE', help="Restore the packages of a cycle instead")
+        parser.add_argument('--force', action='store_true',
+                            help="With --rollback, also roll back a cycle still marked applying (its process died)")
+
+    def handle(self, *args, **options):
+        if options['rollback']:
+            cycle = IncrementCycle.objects.filter(pk=options['rollback']).first()
+            if cycle is None:
+                raise CommandError(f"Increment cycle {options['rollback']} does not exist")
+            try:
+                result = increments.rollback_cycle(cycle, chunk_size=options['chunk_size'], force=options['force'])
+            except ValueError as exc:
+                raise CommandError(exc)
+            self.stdout.write(self.style.SUCCESS(
+                f"Rolled back increment cycle {cycle.pk}: {result['restored']} restored, "
+                f"{result['skipped']} changed or deleted since and left alone"
+            ))
+            return
+
+        if options['company'] and not Company.objects.filter(pk=options['company']).exists():
+            raise CommandError(f"Company {options['company']} does not exist")
+        try:
+            result = increments.apply_cycle(
+                company=options['company'], effective_date=options['effective'],
+                dry_run=options['dry_run'], chunk_size=options['chunk_size'],
+            )
+        except ValueError as exc:
+            raise CommandError(exc)
+        if options['dry_run']:
+            for row in result['diff']:
+                changes = ', '.join(f"{field} {old} -> {new}" for field, (old, new) in row['changes'].items())
+                self.stdout.write(f"{row['employee_id']}: {changes}")
+        totals = ', '.join(f"{field} {delta:+}" for field, delta in result['totals'].items())
+        summary = f"{result['changed']} of {result['employees']} packages"
+        if options['dry_run']:
+            self.stdout.write(f"Dry run: {summary} would change ({totals})")
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Applied increment cycle {result['cycle']}: {summary} changed ({totals})"
+            ))
@@ -0,0 +1,99 @@
+import datetime
+import json
+import platform
+import subprocess
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from user import benchmarks
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Run performance benchmarks against a throwaway test database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help="Benchmarks to run (default: all)")
+        parser.add_argument('--list', action='store_true', help="List available benchmarks")
+        parser.add_argument('--employees', type=int, help="Number of employees to seed")
+        parser.add_argument('--json', metavar='FILE', help="Also write the results as JSON ('-' for stdout)")
+        parser.add_argument('--compare', metavar='FILE', help="Print changes from the JSON results of an earlier run")
+
+    def handle(self, *args, **options):
+        registry = benchmarks.load()
+        if options['list']:
+            for name in sorted(registry):
+                self.stdout.write(name)
+            return
+
+        names = options['names'] or sorted(registry)
+        unknown = set(names).difference(registry)
+        if unknown:
+            raise CommandError(f"Unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as file:
+                    baseline = json.load(file)['results']
+            except (OSError, ValueError, KeyError) as exc:
+                raise CommandError(f"Cannot read {options['compare']}: {exc}")
+
+        to_stdout = options['json'] == '-'
+        report = {
+            'meta': {
+                'commit': _commit(),
+                'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'platform': platform.platform(),
+                'employees': options['employees'],
+            },
+            'results': {},
+        }
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            for name in names:
+                benchmarks.reset()
+                results = registry[name](employees=options['employees'])
+                report['results'][name] = results
+                if to_stdout:
+                    continue
+                self.stdout.write(self.style.SUCCESS(name))
+                for key, value in results.items():
+                    self.stdout.write(f"  {key}: {value}{self._change(baseline, name, key, value)}")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if options['json']:
+            output = json.dumps(report, indent=2, default=str)
+            if to_stdout:
+                self.stdout.write(output)
+            else:
+                with open(options['json'], 'w') as file:
+                    file.write(output + '\n')
+
+    def _change(self, baseline, name, key, value):
+        old = (baseline or {}).get(name, {}).get(key)
+        if (
+            isinstance(old, bool) or isinstance(value, bool)
+            or not isinstance(old, (int, float)) or not isinstance(value, (int, float))
+        ):
+            return ''
+        if not old:
+            return f" (was {old})"
+        return f" (was {old}, {(value - old) / old:+.1%})"
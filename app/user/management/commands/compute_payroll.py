@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from user import payroll
+from user.models import Employee, EmployeeStatus
+
+
+class Command(BaseCommand):
+    help = "Compute FinalImpactPerMonth for a company or department in one batch"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help="Company id")
+        parser.add_argument('--department', type=int, help="Department id")
+        parser.add_argument('--status', type=int, help="EmployeeStatus id for newly created impact rows")
+        parser.add_argument('--stale', action='store_true', help="Only recompute impact rows flagged stale")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        employees = Employee.objects.all()
+        if options['stale']:
+            employees = employees.filter(finalimpactpermonth__is_stale=True)
+        if options['company']:
+            employees = employees.filter(company_name_id=options['company'])
+        if options['department']:
+            employees = employees.filter(department_id=options['department'])
+
+        emp_status = None
+        if options['status']:
+            try:
+                emp_status = EmployeeStatus.objects.get(pk=options['status'])
+            except EmployeeStatus.DoesNotExist:
+                raise CommandError(f"EmployeeStatus {options['status']} does not exist")
+
+        summary = payroll.compute_batch(employees, emp_status=emp_status, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            "Computed {computed} employees: {updated} updated, {created} created, {skipped} skipped".format(**summary)
+        ))
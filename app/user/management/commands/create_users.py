@@ -0,0 +1,63 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from user import importers, provisioning
+from user.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Create staff accounts from a CSV or XLSX file with columns full_name, email, gender, "
+        "contact and optionally password and groups (separated by ';')"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--group', action='append', default=[], dest='groups',
+                            help="Add every user to this group (repeatable)")
+        parser.add_argument('--invite', action='store_true',
+                            help="Give users unusable passwords and write invite tokens instead of hashing passwords")
+        parser.add_argument('--tokens', help="Write email, uid and token of each invited user to this CSV file")
+        parser.add_argument('--workers', type=int, help="Processes hashing passwords (default: CPU count)")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def rows(self, path, numbers):
+        with open(path, 'rb') as file:
+            for row_number, row in importers.READERS[importers.file_format(path)](file):
+                numbers.append(row_number)
+                yield {
+                    'full_name': str(row.get('full_name') or '').strip(),
+                    'email': str(row.get('email') or '').strip(),
+                    'gender': str(row.get('gender') or '').strip(),
+                    'contact': str(row.get('contact') or '').strip(),
+                    'password': row.get('password') or None,
+                    'groups': [name.strip() for name in str(row.get('groups') or '').split(';') if name.strip()],
+                }
+
+    def handle(self, *args, **options):
+        if options['tokens'] and not options['invite']:
+            raise CommandError("--tokens requires --invite")
+        numbers = []
+        try:
+            users, errors = CustomUser.objects.bulk_create_users(
+                self.rows(options['path'], numbers),
+                groups=options['groups'],
+                invite=options['invite'],
+                workers=options['workers'],
+                batch_size=options['batch_size'],
+            )
+        except (OSError, importers.ImportDataError) as exc:
+            raise CommandError(exc)
+
+        for index, message in errors:
+            self.stderr.write(f"Row {numbers[index]}: {message}")
+
+        if options['tokens']:
+            with open(options['tokens'], 'w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(['email', 'uid', 'token'])
+                for user in users:
+                    writer.writerow([user.email, *provisioning.invite_token(user)])
+
+        self.stdout.write(self.style.SUCCESS(f"Created {len(users)} users, {len(errors)} rows failed"))
@@ -0,0 +1,33 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from user import exporters
+from user.models import Employee
+from user.routers import stream_from_replica
+
+
+class Command(BaseCommand):
+    help = "Stream the joined employee/package/impact payroll view as CSV or XLSX"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(exporters.STREAMS), default='csv')
+        parser.add_argument('--output', help="File to write (default: stdout)")
+        parser.add_argument('--company', type=int, help="Company id")
+        parser.add_argument('--department', type=int, help="Department id")
+        parser.add_argument('--chunk-size', type=int, default=exporters.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        employees = Employee.objects.all()
+        if options['company']:
+            employees = employees.filter(company_name_id=options['company'])
+        if options['department']:
+            employees = employees.filter(department_id=options['department'])
+
+        chunks = stream_from_replica(exporters.stream_export(options['format'], employees, options['chunk_size']))
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                output.writelines(chunks)
+        else:
+            sys.stdout.buffer.writelines(chunks)
+            sys.stdout.flush()
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from user import images
+from user.models import Employee
+
+
+class Command(BaseCommand):
+    help = "Make the missing thumbnails of employee images"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Remake existing thumbnails")
+
+    def handle(self, *args, **options):
+        names = (
+            Employee.objects.exclude(image='').exclude(image__isnull=True)
+            .values_list('image', flat=True).distinct().iterator()
+        )
+        made = failed = 0
+        errors = images.thumbnail_errors()
+        for name in names:
+            try:
+                made += images.make_thumbnails(name, force=options['force'])
+            except errors as exc:
+                failed += 1
+                self.stderr.write(f"{name}: {type(exc).__name__}: {exc}")
+        self.stdout.write(f"Made {made} thumbnails ({failed} images unreadable)")
@@ -0,0 +1,39 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from user import importers
+
+
+class Command(BaseCommand):
+    help = "Stream employees and their current packages from a CSV or XLSX file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--no-create-missing', action='store_false', dest='create_missing',
+            help="Reject rows naming an unknown company, department, ... instead of creating it",
+        )
+        parser.add_argument('--report', help="Write the per-row error report to this JSON file")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as file:
+                result = importers.import_file(
+                    file, options['path'], options['chunk_size'], options['create_missing'],
+                )
+        except (OSError, importers.ImportDataError) as exc:
+            raise CommandError(exc)
+
+        if options['report']:
+            with open(options['report'], 'w') as report:
+                json.dump(result.as_dict(), report, indent=2)
+        else:
+            for error in result.errors:
+                where = 'File' if error['row'] is None else f"Row {error['row']}"
+                self.stderr.write(f"{where}: {error['error']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.created} employees, {len(result.errors)} rows failed"
+        ))
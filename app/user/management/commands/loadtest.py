@@ -0,0 +1,133 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+DEFAULT_PATHS = (
+    '/pyroll/async/employees/1/',
+    '/pyroll/async/employees/1/package/',
+    '/pyroll/async/payroll/summary/',
+)
+
+
+async def _read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed")
+    status = int(status_line.split()[1])
+    length, chunked, close = None, False, False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value:
+            chunked = True
+        elif name == 'connection' and value == 'close':
+            close = True
+
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length is not None:
+        await reader.readexactly(length)
+    else:
+        await reader.read()
+        close = True
+    return status, close
+
+
+async def _client(base_url, paths, headers, deadline, samples, errors):
+    url = urlsplit(base_url)
+    port = url.port or (443 if url.scheme == 'https' else 80)
+    request_head = ''.join(f'{name}: {value}\r\n' for name, value in headers)
+    reader = writer = None
+    index = 0
+    while time.perf_counter() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(url.hostname, port, ssl=url.scheme == 'https')
+            start = time.perf_counter()
+            writer.write(
+                f'GET {path} HTTP/1.1\r\nHost: {url.netloc}\r\n{request_head}Connection: keep-alive\r\n\r\n'.encode()
+            )
+            await writer.drain()
+            status, close = await _read_response(reader)
+            samples.append(time.perf_counter() - start)
+            if status >= 400:
+                errors[status] = errors.get(status, 0) + 1
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError) as exc:
+            errors[type(exc).__name__] = errors.get(type(exc).__name__, 0) + 1
+            close = True
+        if close and writer is not None:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def _run(base_url, paths, headers, concurrency, duration):
+    samples, errors = [], {}
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(
+        _client(base_url, paths, headers, deadline, samples, errors) for _ in range(concurrency)
+    ))
+    samples.sort()
+    return {
+        'requests': len(samples),
+        'req_per_sec': round(len(samples) / duration, 1),
+        'p50_ms': round(statistics.median(samples) * 1000, 2) if samples else None,
+        'p99_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 2) if samples else None,
+        'errors': errors,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test running deployments and compare req/s and latency, e.g. "
+        "start 'gunicorn pyroll.wsgi' on :8000 and 'uvicorn pyroll.asgi:application' on :8001, then run "
+        "'loadtest --target wsgi=http://127.0.0.1:8000 --target asgi=http://127.0.0.1:8001 "
+        "--header \"Cookie: sessionid=...\"'"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', required=True, metavar='NAME=URL',
+                            help="Base URL of a deployment (repeatable)")
+        parser.add_argument('--path', action='append', dest='paths', metavar='PATH',
+                            help="Path to request, cycled per client (repeatable; default: the async read endpoints)")
+        parser.add_argument('--header', action='append', default=[], metavar='"NAME: VALUE"',
+                            help="Extra request header, e.g. a session cookie (repeatable)")
+        parser.add_argument('--concurrency', type=int, default=200, help="Concurrent keep-alive clients")
+        parser.add_argument('--duration', type=float, default=10.0, help="Seconds per target")
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['target']:
+            name, sep, url = target.partition('=')
+            if not sep or not url.startswith(('http://', 'https://')):
+                raise CommandError(f"Invalid target {target!r}; expected NAME=http://host:port")
+            targets.append((name, url))
+        headers = []
+        for header in options['header']:
+            name, sep, value = header.partition(':')
+            if not sep:
+                raise CommandError(f"Invalid header {header!r}")
+            headers.append((name.strip(), value.strip()))
+        paths = options['paths'] or list(DEFAULT_PATHS)
+
+        for name, url in targets:
+            results = asyncio.run(_run(url, paths, headers, options['concurrency'], options['duration']))
+            self.stdout.write(self.style.SUCCESS(f"{name} ({url})"))
+            for key, value in results.items():
+                self.stdout.write(f"  {key}: {value}")
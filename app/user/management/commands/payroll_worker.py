@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+
+from user import formulas, payroll, payroll_runs
+
+
+# Longest pause after repeated failures to recompute stale rows, in seconds
+MAX_BACKOFF = 300
+
+
+class Command(BaseCommand):
+    help = "Process queued payroll run chunks, then recompute stale impact rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--run', type=int, help="Only process this run")
+        parser.add_argument('--workers', type=int, default=1, help="Worker processes (default: 1)")
+        parser.add_argument('--once', action='store_true', help="Exit when the queue is empty")
+        parser.add_argument('--poll', type=float, default=2.0, help="Seconds between polls of an empty queue")
+
+    def handle(self, *args, **options):
+        failures = 0
+        while True:
+            processed = payroll_runs.execute(options['run'], workers=options['workers'])
+            if processed:
+                self.stdout.write(f"Processed {processed} chunk(s)")
+            elif options['run'] is None:
+                # Idle: catch up on impact rows marked stale by input changes
+                try:
+                    stale = payroll.recompute_stale(limit=settings.PAYROLL_RUN_CHUNK_SIZE)
+                except (formulas.FormulaError, DatabaseError) as exc:
+                    if options['once']:
+                        raise CommandError(f"Recomputing stale employees failed: {exc}")
+                    failures += 1
+                    delay = min(options['poll'] * 2 ** failures, MAX_BACKOFF)
+                    self.stderr.write(f"Recomputing stale employees failed, retrying in {delay:g}s: {exc}")
+                    close_old_connections()
+                    time.sleep(delay)
+                    continue
+                failures = 0
+                if stale['updated']:
+                    self.stdout.write(f"Recomputed {stale['updated']} stale employee(s)")
+                    if not options['once']:
+                        continue
+            if options['once']:
+                break
+            if not processed:
+                time.sleep(options['poll'])
@@ -0,0 +1,54 @@
+import csv
+import sys
+
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+
+from user import projections
+from user.models import Employee
+
+
+GROUP_FIELDS = {
+    'company': 'company_name_id',
+    'department': 'department_id',
+    'location': 'location_id',
+}
+
+
+class Command(BaseCommand):
+    help = "Project monthly gratuity and leave-encashment liability as CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years', type=int, default=10)
+        parser.add_argument('--start', type=parse_date, help="First month, as YYYY-MM-DD (default: today)")
+        parser.add_argument('--company', type=int, help="Company id")
+        parser.add_argument('--department', type=int, help="Department id")
+        parser.add_argument('--group-by', choices=sorted(GROUP_FIELDS))
+        parser.add_argument('--output', help="File to write (default: stdout)")
+
+    def handle(self, *args, **options):
+        employees = Employee.objects.all()
+        if options['company']:
+            employees = employees.filter(company_name_id=options['company'])
+        if options['department']:
+            employees = employees.filter(department_id=options['department'])
+
+        group_by = options['group_by']
+        report = projections.project(
+            employees, options['years'], options['start'], GROUP_FIELDS[group_by] if group_by else None,
+        )
+
+        output = open(options['output'], 'w', newline='') if options['output'] else sys.stdout
+        try:
+            writer = csv.writer(output)
+            columns = ['month']
+            for variable in projections.PROJECTED:
+                columns += [variable, f'{variable}_accrued']
+            writer.writerow([group_by, *columns] if group_by else columns)
+            for group in sorted(report, key=lambda group: (group is None, group)):
+                for row in report[group]:
+                    values = [row[column] for column in columns]
+                    writer.writerow([group, *values] if group_by else values)
+        finally:
+            if output is not sys.stdout:
+                output.close()
@@ -0,0 +1,87 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from user import instrumentation
+
+
+class Command(BaseCommand):
+    help = "Summarize the per-view query counts and latencies recorded by QueryInstrumentationMiddleware"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=float, help="Only requests of the last SINCE minutes")
+        parser.add_argument('--view', help="Only views whose name contains VIEW")
+        parser.add_argument(
+            '--sort', choices=['requests', 'p95_ms', 'queries_max', 'sql_ms_mean'], default='requests',
+        )
+        parser.add_argument('--histogram', action='store_true', help="Print latency histograms")
+        parser.add_argument('--duplicates', action='store_true', help="Print the repeated (N+1) statements")
+        parser.add_argument('--clear', action='store_true', help="Delete the recorded requests")
+
+    def handle(self, *args, **options):
+        sink = instrumentation.sink()
+        if sink is None:
+            raise CommandError("Set QUERY_INSTRUMENTATION_DB to the SQLite file the middleware writes to")
+        if options['clear']:
+            sink.clear()
+            return
+
+        since = time.time() - options['since'] * 60 if options['since'] else None
+        views = {}
+        for row in sink.read(since, options['view']):
+            views.setdefault((row['method'], row['view']), []).append(row)
+        if not views:
+            self.stdout.write("No requests recorded")
+            return
+
+        stats = []
+        for (method, view), rows in views.items():
+            latencies = sorted(row['latency_ms'] for row in rows)
+            queries = [row['queries'] for row in rows]
+            stats.append({
+                'view': f'{method} {view}',
+                'requests': len(rows),
+                'p50_ms': round(statistics.median(latencies), 1),
+                'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1),
+                'max_ms': round(latencies[-1], 1),
+                'queries_mean': round(statistics.fmean(queries), 1),
+                'queries_max': max(queries),
+                'sql_ms_mean': round(statistics.fmean(row['sql_ms'] for row in rows), 1),
+                'n_plus_1': sum(1 for row in rows if row['duplicates']),
+                'rows': rows,
+                'latencies': latencies,
+            })
+        stats.sort(key=lambda stat: -stat[options['sort']])
+
+        columns = ['requests', 'p50_ms', 'p95_ms', 'max_ms', 'queries_mean', 'queries_max', 'sql_ms_mean', 'n_plus_1']
+        width = max(len(stat['view']) for stat in stats)
+        self.stdout.write(f"{'view':<{width}}  " + '  '.join(f'{column:>12}' for column in columns))
+        for stat in stats:
+            self.stdout.write(f"{stat['view']:<{width}}  " + '  '.join(f'{stat[column]:>12}' for column in columns))
+
+        if options['histogram']:
+            labels = [f'<={bound}ms' for bound in instrumentation.LATENCY_BUCKETS_MS]
+            labels.append(f'>{instrumentation.LATENCY_BUCKETS_MS[-1]}ms')
+            for stat in stats:
+                self.stdout.write(self.style.SUCCESS(f"\n{stat['view']}"))
+                counts = instrumentation.histogram(stat['latencies'])
+                for label, count in zip(labels, counts):
+                    if count:
+                        bar = '#' * max(1, round(40 * count / stat['requests']))
+                        self.stdout.write(f"  {label:>10} {count:>8} {bar}")
+
+        if options['duplicates']:
+            for stat in stats:
+                repeated = {}
+                for row in stat['rows']:
+                    for sql, count, origin in row['duplicates']:
+                        entry = repeated.setdefault((sql, origin), [0, 0])
+                        entry[0] += 1
+                        entry[1] = max(entry[1], count)
+                if not repeated:
+                    continue
+                self.stdout.write(self.style.WARNING(f"\n{stat['view']}"))
+                for (sql, origin), (requests, count) in sorted(repeated.items(), key=lambda item: -item[1][0]):
+                    self.stdout.write(f"  {requests} requests, up to {count}x from {origin or 'unknown'}:")
+                    self.stdout.write(f"    {sql}")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from user import hierarchy
+
+
+class Command(BaseCommand):
+    help = "Recreate the reporting-line closure table from Employee.manager"
+
+    def handle(self, *args, **options):
+        try:
+            lines = hierarchy.rebuild()
+        except ValueError as exc:
+            raise CommandError(exc)
+        self.stdout.write(self.style.SUCCESS(f"Recreated {lines} reporting lines"))
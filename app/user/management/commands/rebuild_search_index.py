@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from user import search
+
+
+class Command(BaseCommand):
+    help = "Recreate the search entries of all employees and user accounts"
+
+    def handle(self, *args, **options):
+        entries = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {entries} employees and users"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from user import summaries
+
+
+class Command(BaseCommand):
+    help = "Rebuild PayrollSummary for every company x department x location"
+
+    def handle(self, *args, **options):
+        count = summaries.refresh()
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {count} payroll summary groups"))
@@ -0,0 +1,49 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from user import payroll, summaries
+from user.benchmarks import data
+from user.models import Company, Employee
+
+
+class Command(BaseCommand):
+    help = (
+        "Create reproducible synthetic companies, employees and packages. Lookup rows are created on every run, "
+        "so an empty database (or --flush) is required"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=1000)
+        parser.add_argument('--companies', type=int, default=5)
+        parser.add_argument('--departments', type=int, default=20)
+        parser.add_argument('--sections', type=int, default=10)
+        parser.add_argument('--designations', type=int, default=30)
+        parser.add_argument('--locations', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0, help="The same seed always produces the same data")
+        parser.add_argument('--no-packages', action='store_true', help="Employees only, without packages or impact rows")
+        parser.add_argument('--compute', action='store_true', help="Compute the impact rows and payroll summaries")
+        parser.add_argument('--flush', action='store_true', help="Delete all data first, users included")
+
+    def handle(self, *args, **options):
+        if options['flush']:
+            call_command('flush', interactive=False, verbosity=0)
+        elif Company.objects.exists() or Employee.objects.exists():
+            # Seeding again would add a second set of companies, departments, ... with the same names
+            raise CommandError("The database already has data; use --flush to replace it")
+
+        created = data.seed(
+            employees=options['employees'],
+            companies=options['companies'],
+            departments=options['departments'],
+            sections=options['sections'],
+            designations=options['designations'],
+            locations=options['locations'],
+            packages=not options['no_packages'],
+            seed=options['seed'],
+        )
+        self.stdout.write(self.style.SUCCESS(', '.join(f"{count} {name}" for name, count in created.items())))
+
+        if options['compute'] and not options['no_packages']:
+            result = payroll.compute_batch()
+            groups = summaries.refresh()
+            self.stdout.write(f"Computed {result['computed']} impact rows and {groups} payroll summaries")
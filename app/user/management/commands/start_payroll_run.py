@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from user import payroll_runs
+from user.models import Company, EmployeeStatus, PayrollRun
+
+
+class Command(BaseCommand):
+    help = "Queue a payroll run for a company and optionally process it with a process pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument('company', type=int, nargs='?', help="Company id")
+        parser.add_argument('--status', type=int, help="EmployeeStatus id for newly created impact rows")
+        parser.add_argument('--chunk-size', type=int)
+        parser.add_argument('--workers', type=int, help="Worker processes (default: PAYROLL_RUN_WORKERS or CPU count)")
+        parser.add_argument('--enqueue-only', action='store_true', help="Leave the run to payroll_worker")
+        parser.add_argument('--resume', type=int, metavar='RUN', help="Requeue the failed chunks of a run instead")
+
+    def handle(self, *args, **options):
+        if options['resume']:
+            run = PayrollRun.objects.filter(pk=options['resume']).first()
+            if run is None:
+                raise CommandError(f"Payroll run {options['resume']} does not exist")
+            payroll_runs.resume(run.pk)
+        else:
+            if options['company'] is None:
+                raise CommandError("A company id is required unless --resume is given")
+            try:
+                company = Company.objects.get(pk=options['company'])
+                emp_status = EmployeeStatus.objects.get(pk=options['status']) if options['status'] else None
+            except (Company.DoesNotExist, EmployeeStatus.DoesNotExist) as exc:
+                raise CommandError(exc)
+            run = payroll_runs.create_run(company, emp_status, chunk_size=options['chunk_size'])
+            self.stdout.write(f"Queued payroll run {run.pk} with {run.total_chunks} chunk(s)")
+
+        if options['enqueue_only']:
+            return
+        payroll_runs.execute(run.pk, workers=options['workers'])
+        run.refresh_from_db()
+        self.stdout.write(self.style.SUCCESS(
+            f"Payroll run {run.pk} {run.status}: {run.processed_employees}/{run.total_employees} employees"
+        ))
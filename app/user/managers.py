@@ -1,10 +1,36 @@
 from django.contrib.auth.base_user import BaseUserManager 
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Lower
 
-class CustomUserManager(BaseUserManager):
 
-    def create_user(self,full_name,email,designation,gender,contact,password=None,**extra_fields):
+class LookupQuerySet(models.QuerySet):
+    # with_cached_lookups() fills foreign keys to Company, Gender, ... from
+    # user.lookups instead of querying or joining them.
+
+    attach_lookups = False
+
+    def with_cached_lookups(self):
+        clone = self._chain()
+        clone.attach_lookups = True
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone.attach_lookups = self.attach_lookups
+        return clone
+
+    def _fetch_all(self):
+        fetched = self._result_cache is not None
+        super()._fetch_all()
+        if self.attach_lookups and not fetched and self._iterable_class is models.query.ModelIterable:
+            from . import lookups
+            lookups.attach(self._result_cache)
+
+
+class CustomUserManager(BaseUserManager.from_queryset(LookupQuerySet)):
+
+    def _build_user(self,full_name,email,gender,contact,**extra_fields):
 
-        # create and save user with email and password
         if not email:
             raise ValueError("The Email must be set for this field")
         if not full_name:
@@ -21,14 +47,117 @@ class CustomUserManager(BaseUserManager):
         
         email = self.normalize_email(email)
         # user = self.model(email=email , full_name=full_name , designation=designation , gender=gender , password=password , contact=contact ,**extra_fields)
-        user = self.model(email=email , full_name=full_name , gender=gender , password=password , contact=contact ,**extra_fields)
+        user = self.model(email=email , full_name=full_name , gender=gender , contact=contact ,**extra_fields)
         user.is_staff = True
         user.is_active = True
         user.is_superuser = False
+        return user
+
+    def create_user(self,full_name,email,designation,gender,contact,password=None,**extra_fields):
+
+        # create and save user with email and password
+        user = self._build_user(full_name, email, gender, contact, **extra_fields)
         user.set_password(password)
         user.save(using=self._db)
 
         return user 
+
+    def bulk_create_users(self, rows, groups=(), invite=False, workers=None, batch_size=1000):
+        """
+        Create staff users from ``rows``: dicts of ``create_user`` arguments,
+        optionally with ``groups``, a list of group names. ``gender`` may
+        be a Gender or its name. Every user is also added to ``groups``.
+
+        Passwords are hashed in a process pool; with ``invite`` every user
+        gets an unusable password instead (see ``provisioning.invite_token``).
+        Rows that fail validation or whose email (compared casefolded) or
+        contact is taken are skipped, including those registered by another
+        process while the passwords were hashed. Returns ``(users, errors)``
+        with ``(row index, message)`` errors.
+
+        Users are search indexed and their cached permissions dropped
+        here, as ``bulk_create`` sends no signals.
+        """
+        from . import lookups, permissions, provisioning, search
+        from .models import Gender
+
+        pending, errors = [], []
+        emails, contacts = set(), set()
+        for index, row in enumerate(rows):
+            row = dict(row)
+            names = set(groups).union(row.pop('groups', None) or ())
+            password = row.pop('password', None)
+            if isinstance(row.get('gender'), str) and row['gender'].strip():
+                name = row['gender']
+                row['gender'] = lookups.get(Gender, lookups.get_id(Gender, name))
+                if row['gender'] is None:
+                    errors.append((index, f"Unknown gender {name.strip()!r}"))
+                    continue
+            try:
+                user = self._build_user(**row)
+            except (TypeError, ValueError) as exc:
+                errors.append((index, str(exc)))
+                continue
+            if user.email.casefold() in emails or user.contact in contacts:
+                errors.append((index, "Duplicate email or contact in input"))
+                continue
+            emails.add(user.email.casefold())
+            contacts.add(user.contact)
+            pending.append((index, user, None if invite else password, names))
+
+        # One query per batch for accounts that already exist
+        taken_emails, taken_contacts = set(), set()
+        for start in range(0, len(pending), batch_size):
+            batch = [user for _, user, _, _ in pending[start:start + batch_size]]
+            taken = self.annotate(email_lower=Lower('email')).filter(
+                models.Q(email_lower__in={user.email.lower() for user in batch})
+                | models.Q(contact__in=[user.contact for user in batch])
+            )
+            for email, contact in taken.values_list('email', 'contact'):
+                taken_emails.add(email.casefold())
+                taken_contacts.add(contact)
+        accepted = []
+        for index, user, password, names in pending:
+            if user.email.casefold() in taken_emails or user.contact in taken_contacts:
+                errors.append((index, "Email or contact already registered"))
+            else:
+                accepted.append((index, user, password, names))
+
+        passwords = provisioning.hash_passwords([password for _, _, password, _ in accepted], workers)
+        for (_, user, _, _), password in zip(accepted, passwords):
+            user.password = password
+
+        group_map = provisioning.groups_by_name(set().union(*(names for _, _, _, names in accepted)))
+        Membership = self.model.groups.through
+        created = []
+        with transaction.atomic(using=self._db):
+            for start in range(0, len(accepted), batch_size):
+                batch = accepted[start:start + batch_size]
+                try:
+                    with transaction.atomic(using=self._db):
+                        self.bulk_create([user for _, user, _, _ in batch])
+                    created.extend(batch)
+                except IntegrityError:
+                    # Registered by another process since the check: find the rows one by one
+                    for index, user, password, names in batch:
+                        user.pk = None
+                        try:
+                            with transaction.atomic(using=self._db):
+                                self.bulk_create([user])
+                            created.append((index, user, password, names))
+                        except IntegrityError:
+                            errors.append((index, "Email or contact already registered"))
+            users = [user for _, user, _, _ in created]
+            Membership.objects.using(self._db).bulk_create(
+                (
+                    Membership(customuser_id=user.pk, group_id=group_map[name].pk)
+                    for _, user, _, names in created for name in names
+                ),
+                batch_size=batch_size,
+            )
+            search.index_users(users)
+            permissions.invalidate([user.pk for user in users])
+        return users, sorted(errors)
         
     def create_superuser(self,email,password=None):
 
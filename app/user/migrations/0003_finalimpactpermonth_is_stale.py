@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0002_finalimpactpermonth_amounts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='finalimpactpermonth',
+            name='is_stale',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
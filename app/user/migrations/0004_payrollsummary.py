@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0003_finalimpactpermonth_is_stale'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('headcount', models.PositiveIntegerField(default=0)),
+                ('total_gross_salary', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('total_revised_salary', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('total_impact', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='user.company')),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='user.department')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='user.location')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('company', 'department', 'location'), name='unique_payroll_summary_group')],
+            },
+        ),
+    ]
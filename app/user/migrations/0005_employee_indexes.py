@@ -0,0 +1,72 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:09
+
+from django.db import migrations, models
+
+from user import extensions
+
+
+# PostgreSQL only: trigram index for icontains on names (admin
+# search_fields compare UPPER(fullname)), when pg_trgm can be created (see
+# user.extensions). A btree on fullname would serve neither icontains nor
+# user.search (SearchEntry), so there is none.
+POSTGRES_INDEXES = (
+    ('employee_fullname_trgm_idx',
+     'CREATE INDEX IF NOT EXISTS employee_fullname_trgm_idx ON user_employee USING gin (UPPER(fullname) gin_trgm_ops)'),
+)
+
+
+def create_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    if extensions.create(schema_editor, extensions.TRIGRAM):
+        for _, sql in POSTGRES_INDEXES:
+            schema_editor.execute(sql)
+
+
+def drop_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in POSTGRES_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0004_payrollsummary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='company',
+            name='name',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='department',
+            name='name',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='location',
+            name='code',
+            field=models.CharField(db_index=True, max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['company_name', 'department'], name='employee_company_dept_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['company_name', 'location'], name='employee_company_loc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['date_of_joining'], name='employee_joining_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['company_name', 'date_of_joining'], name='employee_company_joining_idx'),
+        ),
+        migrations.RunPython(create_postgres_indexes, drop_postgres_indexes),
+    ]
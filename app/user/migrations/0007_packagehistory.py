@@ -0,0 +1,66 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:21
+
+import django.db.models.deletion
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# Existing packages get one full snapshot, effective from the migration date
+PACKAGE_MODELS = (
+    ('CurrentPackageDetails', 'current'),
+    ('ProposedPackageDetails', 'proposed'),
+)
+
+
+def record_existing_packages(apps, schema_editor):
+    PackageHistory = apps.get_model('user', 'PackageHistory')
+    today = timezone.localdate()
+    for model_name, kind in PACKAGE_MODELS:
+        model = apps.get_model('user', model_name)
+        names = [
+            field.attname for field in model._meta.concrete_fields
+            if not field.primary_key and field.attname != 'employee_id'
+        ]
+        rows = model.objects.values_list('employee_id', *names).iterator(chunk_size=2000)
+        batch = []
+        for employee_id, *values in rows:
+            batch.append(PackageHistory(
+                employee_id=employee_id,
+                kind=kind,
+                effective_date=today,
+                changes={
+                    name: str(value) if isinstance(value, Decimal) else value
+                    for name, value in zip(names, values)
+                },
+            ))
+            if len(batch) == 2000:
+                PackageHistory.objects.bulk_create(batch)
+                batch = []
+        PackageHistory.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0006_payrollrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackageHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('current', 'Current'), ('proposed', 'Proposed')], max_length=8)),
+                ('effective_date', models.DateField()),
+                ('changes', models.JSONField()),
+                ('recorded_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='package_history', to='user.employee')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['employee', 'kind', 'effective_date', 'id'], name='package_history_as_of_idx')],
+            },
+        ),
+        migrations.RunPython(record_existing_packages, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0007_packagehistory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportingLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField()),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='employee',
+            name='employee_company_dept_idx',
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='manager',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reports', to='user.employee'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['company_name', 'department', 'section'], name='employee_org_idx'),
+        ),
+        migrations.AddField(
+            model_name='reportingline',
+            name='ancestor',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='descendant_lines', to='user.employee'),
+        ),
+        migrations.AddField(
+            model_name='reportingline',
+            name='descendant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_lines', to='user.employee'),
+        ),
+        migrations.AddConstraint(
+            model_name='reportingline',
+            constraint=models.UniqueConstraint(fields=('ancestor', 'descendant'), name='unique_reporting_line'),
+        ),
+    ]
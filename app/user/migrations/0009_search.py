@@ -0,0 +1,91 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from user import extensions
+
+
+# PostgreSQL with pg_trgm only (created in migration 0005 when possible, see
+# user.extensions): user.search matches entries with these instead of
+# SearchTerm and SearchVariant.
+POSTGRES_INDEXES = (
+    ('search_entry_tsv_idx',
+     "CREATE INDEX IF NOT EXISTS search_entry_tsv_idx ON user_searchentry USING gin (to_tsvector('simple', text))"),
+    ('search_entry_trgm_idx',
+     'CREATE INDEX IF NOT EXISTS search_entry_trgm_idx ON user_searchentry USING gin (text gin_trgm_ops)'),
+)
+
+
+def create_postgres_indexes(apps, schema_editor):
+    if not extensions.installed(schema_editor.connection, extensions.TRIGRAM):
+        return
+    for _, sql in POSTGRES_INDEXES:
+        schema_editor.execute(sql)
+
+
+def drop_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in POSTGRES_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0008_reporting_lines'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('employee', 'Employee'), ('user', 'User')], max_length=8)),
+                ('object_id', models.BigIntegerField()),
+                ('name', models.CharField(max_length=255)),
+                ('email', models.CharField(blank=True, max_length=255)),
+                ('text', models.TextField()),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='user.company')),
+                ('department', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='user.department')),
+                ('designation', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='user.designation')),
+                ('location', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='user.location')),
+            ],
+            options={
+                'verbose_name_plural': 'search entries',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='user.searchentry')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('variant', models.CharField(max_length=64)),
+                ('term', models.CharField(max_length=64)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('variant', 'term'), name='unique_search_variant')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchentry',
+            index=models.Index(fields=['name'], name='search_entry_name_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='searchentry',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_entry'),
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['term', 'entry'], name='search_term_idx'),
+        ),
+        migrations.RunPython(create_postgres_indexes, drop_postgres_indexes),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0009_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IncrementCycle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('effective_date', models.DateField()),
+                ('status', models.CharField(choices=[('applying', 'Applying'), ('applied', 'Applied'), ('failed', 'Failed'), ('rolled_back', 'Rolled back')], default='applying', max_length=11)),
+                ('changed_employees', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('rolled_back_at', models.DateTimeField(blank=True, null=True)),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='user.company')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='IncrementChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('previous', models.JSONField()),
+                ('applied', models.JSONField()),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='user.employee')),
+                ('cycle', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='user.incrementcycle')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('cycle', 'employee'), name='unique_increment_change')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0010_increment_cycles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payrollrunchunk',
+            name='retry_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
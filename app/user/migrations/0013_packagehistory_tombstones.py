@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0012_payrollrunchunk_retry_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='packagehistory',
+            name='deleted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='packagehistory',
+            name='employee',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='package_history', to='user.employee'),
+        ),
+    ]
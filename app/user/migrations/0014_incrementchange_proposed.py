@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0013_packagehistory_tombstones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='incrementchange',
+            name='proposed',
+            field=models.JSONField(default=dict),
+        ),
+    ]
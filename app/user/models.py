@@ -4,11 +4,41 @@ from django.contrib.auth.models import (
     PermissionsMixin ,
     Group
 )
-from .managers import  CustomUserManager
+from django.core.exceptions import ValidationError
+from .managers import  CustomUserManager, LookupQuerySet
+from . import formulas
 
 # Create your models here.
 
 
+class TrackedFieldsMixin:
+    # Remembers the values loaded from the database so that signal handlers
+    # can tell which fields a save actually changed.
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def changed_fields(self):
+        # None means the instance was not loaded from the database
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        return {
+            name for name, value in loaded.items()
+            if value is not models.DEFERRED and getattr(self, name) != value
+        }
+
+    def reset_loaded_values(self):
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields if field.attname not in deferred
+        }
+
+
 class Gender(models.Model):
     gender = models.CharField(max_length=12)
 
@@ -55,7 +85,7 @@ class CustomUser(AbstractBaseUser , PermissionsMixin):
 
 
 class Company(models.Model):
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, db_index=True)
 
     def __str__(self):
         return self.name
@@ -69,7 +99,7 @@ class Designation(models.Model):
 
 
 class Department(models.Model):
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, db_index=True)
 
     def __str__(self):
         return self.name
@@ -88,16 +118,25 @@ class EmployeeStatus(models.Model):
     def __str__(self):
         return self.status
     
-class Formula(models.Model):
+class Formula(TrackedFieldsMixin, models.Model):
     formula_name = models.CharField(max_length=255)
     formula_expression = models.CharField(max_length=255)
 
     def __str__(self):
         return self.formula_name
+
+    def clean(self):
+        try:
+            formulas.compile_expression(self.formula_expression)
+        except formulas.FormulaError as exc:
+            raise ValidationError({'formula_expression': str(exc)})
+
+    def evaluate(self, **variables):
+        return formulas.evaluate(self, variables)
     
 class Location(models.Model):
     location = models.CharField(max_length=122)
-    code = models.CharField(max_length=50) 
+    code = models.CharField(max_length=50, db_index=True)
 
     
 
@@ -145,7 +184,7 @@ class Location(models.Model):
 
 
 
-class Employee (models.Model):
+class Employee (TrackedFieldsMixin, models.Model):
 
     emp_id = models.AutoField(primary_key=True)
     fullname = models.CharField(max_length=255)
@@ -161,16 +200,42 @@ class Employee (models.Model):
     date_of_joining = models.DateField()  # Date of Joining
     remarks = models.TextField(blank=True)
     image = models.FileField(upload_to='employee_images/', blank=True, null=True)
+    # Direct manager; every manager above is kept in ReportingLine
+    manager = models.ForeignKey('self', related_name='reports', on_delete=models.SET_NULL, null=True, blank=True)
 
     # current_package_detail = models.ForeignKey(CurrentPackageDetails , on_delete=models.CASCADE)
     # proposed_package_detail = models.ForeignKey(ProposedPackageDetails , on_delete=models.CASCADE)
     # final_impact_per_month = models.ForeignKey(FinalImpactPerMonth , on_delete=models.CASCADE)
 
+    objects = LookupQuerySet.as_manager()
+
+    class Meta:
+        # Admin name search (icontains) on PostgreSQL uses a trigram GIN
+        # index, created in migration 0005 when pg_trgm is available.
+        indexes = [
+            # Company -> department -> section: any prefix of the org is one range
+            models.Index(fields=['company_name', 'department', 'section'], name='employee_org_idx'),
+            models.Index(fields=['company_name', 'location'], name='employee_company_loc_idx'),
+            models.Index(fields=['date_of_joining'], name='employee_joining_idx'),
+            models.Index(fields=['company_name', 'date_of_joining'], name='employee_company_joining_idx'),
+        ]
+
     def __str__(self):
         return self.fullname
 
+    def manager_loops(self):
+        # Whether the manager is this employee or reports to them
+        return self.manager_id is not None and self.pk is not None and (
+            self.manager_id == self.pk
+            or ReportingLine.objects.filter(ancestor_id=self.pk, descendant_id=self.manager_id).exists()
+        )
 
-class CurrentPackageDetails(models.Model):
+    def clean(self):
+        if self.manager_loops():
+            raise ValidationError({'manager': "An employee cannot report to themselves or to someone below them."})
+
+
+class CurrentPackageDetails(TrackedFieldsMixin, models.Model):
     employee = models.OneToOneField(Employee, on_delete=models.CASCADE)
     gross_salary = models.DecimalField(max_digits=10, decimal_places=2)
     vehicle = models.DecimalField(max_digits=10, decimal_places=2)
@@ -181,7 +246,7 @@ class CurrentPackageDetails(models.Model):
         return f"Package for {self.employee.fullname}"
 
 
-class ProposedPackageDetails(models.Model):
+class ProposedPackageDetails(TrackedFieldsMixin, models.Model):
     employee = models.OneToOneField(Employee, on_delete=models.CASCADE)
     increment_percentage = models.DecimalField(max_digits=5, decimal_places=2)
     increased_amount = models.ForeignKey(Formula, related_name='increased_amount', on_delete=models.SET_NULL, null=True)
@@ -194,7 +259,7 @@ class ProposedPackageDetails(models.Model):
     def __str__(self):
         return f"Proposed Package for {self.employee.fullname}"
     
-class FinalImpactPerMonth(models.Model):
+class FinalImpactPerMonth(TrackedFieldsMixin, models.Model):
     employee = models.OneToOneField(Employee, on_delete=models.CASCADE)
     emp_status = models.ForeignKey(EmployeeStatus, on_delete=models.CASCADE)
     serving_years = models.IntegerField()
@@ -206,6 +271,18 @@ class FinalImpactPerMonth(models.Model):
     fuel = models.DecimalField(max_digits=10, decimal_places=2)
     total = models.ForeignKey(Formula, related_name='total', on_delete=models.SET_NULL, null=True)
 
+    # Values computed from the formulas above (see user.payroll)
+    gratuity_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    bonus_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    leave_encashment_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    mobile_allowance_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    # Set when an input of the values above changed (see user.dependencies)
+    is_stale = models.BooleanField(default=False, db_index=True)
+
+    objects = LookupQuerySet.as_manager()
+
     def __str__(self):
         return f"Final Impact for {self.employee.fullname}"
 
@@ -214,3 +291,249 @@ class FinalImpactPerMonth(models.Model):
 
 
 
+
+
+class PayrollSummary(models.Model):
+    # Totals per company x department x location, kept up to date by
+    # user.summaries whenever employees or their packages change.
+    company = models.ForeignKey(Company, on_delete=models.CASCADE)
+    department = models.ForeignKey(Department, on_delete=models.CASCADE)
+    location = models.ForeignKey(Location, on_delete=models.CASCADE)
+    headcount = models.PositiveIntegerField(default=0)
+    total_gross_salary = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    total_revised_salary = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    total_impact = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['company', 'department', 'location'], name='unique_payroll_summary_group'),
+        ]
+
+    def __str__(self):
+        return f"Payroll summary for {self.company_id}/{self.department_id}/{self.location_id}"
+
+
+class PayrollRun(models.Model):
+    # A payroll computation for one company, split into PayrollRunChunk
+    # rows that workers claim and process (see user.payroll_runs).
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    company = models.ForeignKey(Company, on_delete=models.CASCADE)
+    emp_status = models.ForeignKey(EmployeeStatus, on_delete=models.SET_NULL, null=True, blank=True)
+    as_of = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, db_index=True)
+    total_chunks = models.PositiveIntegerField(default=0)
+    completed_chunks = models.PositiveIntegerField(default=0)
+    total_employees = models.PositiveIntegerField(default=0)
+    processed_employees = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Payroll run {self.pk} for company {self.company_id}"
+
+    @property
+    def progress(self):
+        return round(100 * self.completed_chunks / self.total_chunks, 1) if self.total_chunks else 100.0
+
+
+class PayrollRunChunk(models.Model):
+    run = models.ForeignKey(PayrollRun, related_name='chunks', on_delete=models.CASCADE)
+    index = models.PositiveIntegerField()
+    first_emp_id = models.IntegerField()
+    last_emp_id = models.IntegerField()
+    employee_count = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=PayrollRun.STATUS_CHOICES, default=PayrollRun.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    worker = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # A failed chunk is retried no earlier than this
+    retry_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['run', 'index']
+        constraints = [
+            models.UniqueConstraint(fields=['run', 'index'], name='unique_payroll_run_chunk'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'run'], name='payroll_chunk_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Chunk {self.index} of payroll run {self.run_id}"
+
+
+class PackageHistory(models.Model):
+    # Append-only, effective-dated changes to current and proposed packages.
+    # Each row holds only the fields that changed, or marks the package
+    # deleted (see user.history). Rows outlive their employee.
+    CURRENT = 'current'
+    PROPOSED = 'proposed'
+    KIND_CHOICES = [
+        (CURRENT, 'Current'),
+        (PROPOSED, 'Proposed'),
+    ]
+
+    # Indexed through package_history_as_of_idx
+    employee = models.ForeignKey(
+        Employee, related_name='package_history', on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+    )
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES)
+    effective_date = models.DateField()
+    changes = models.JSONField()
+    deleted = models.BooleanField(default=False)
+    recorded_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['employee', 'kind', 'effective_date', 'id'], name='package_history_as_of_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} package change for {self.employee_id} from {self.effective_date}"
+
+
+class ReportingLine(models.Model):
+    # Closure table of Employee.manager: one row for every manager above an
+    # employee, at any depth, so a whole reporting tree is one indexed join
+    # (see user.hierarchy). Employees without a manager have no rows.
+    ancestor = models.ForeignKey(Employee, related_name='descendant_lines', on_delete=models.CASCADE, db_index=False)
+    descendant = models.ForeignKey(Employee, related_name='ancestor_lines', on_delete=models.CASCADE)
+    depth = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='unique_reporting_line'),
+        ]
+
+    def __str__(self):
+        return f"{self.descendant_id} reports to {self.ancestor_id} at depth {self.depth}"
+
+
+class SearchEntry(models.Model):
+    # What an employee or user account is found by (see user.search).
+    # Employees keep their org columns so that matches on company,
+    # department or designation names and the company and location filters
+    # need no join.
+    EMPLOYEE = 'employee'
+    USER = 'user'
+    KIND_CHOICES = [
+        (EMPLOYEE, 'Employee'),
+        (USER, 'User'),
+    ]
+
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    name = models.CharField(max_length=255)
+    email = models.CharField(max_length=255, blank=True)
+    # Normalized words of the name, email and contact
+    text = models.TextField()
+    company = models.ForeignKey(Company, related_name='+', on_delete=models.CASCADE, null=True, blank=True)
+    department = models.ForeignKey(Department, related_name='+', on_delete=models.CASCADE, null=True, blank=True, db_index=False)
+    designation = models.ForeignKey(Designation, related_name='+', on_delete=models.CASCADE, null=True, blank=True, db_index=False)
+    location = models.ForeignKey(Location, related_name='+', on_delete=models.CASCADE, null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'search entries'
+        indexes = [
+            # Walked in order when every word of a query matches too many entries to rank
+            models.Index(fields=['name'], name='search_entry_name_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_entry'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.object_id}: {self.name}"
+
+
+class SearchTerm(models.Model):
+    # Inverted index of the words of SearchEntry.text, used on databases
+    # without PostgreSQL's full-text and trigram indexes.
+    term = models.CharField(max_length=64)
+    entry = models.ForeignKey(SearchEntry, related_name='terms', on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'entry'], name='search_term_idx'),
+        ]
+
+    def __str__(self):
+        return self.term
+
+
+class SearchVariant(models.Model):
+    # Each indexed word, and the word with any one letter deleted, pointing
+    # at the word. Words within one typo of each other share a variant.
+    # Rows of words no longer in use are left behind; they match nothing.
+    variant = models.CharField(max_length=64)
+    term = models.CharField(max_length=64)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['variant', 'term'], name='unique_search_variant'),
+        ]
+
+    def __str__(self):
+        return f"{self.variant} -> {self.term}"
+
+
+class IncrementCycle(models.Model):
+    # One application of the proposed packages to the current ones, for one
+    # company or all, with an IncrementChange per employee whose package
+    # changed so that it can be rolled back (see user.increments).
+    APPLYING = 'applying'
+    APPLIED = 'applied'
+    FAILED = 'failed'
+    ROLLED_BACK = 'rolled_back'
+    STATUS_CHOICES = [
+        (APPLYING, 'Applying'),
+        (APPLIED, 'Applied'),
+        (FAILED, 'Failed'),
+        (ROLLED_BACK, 'Rolled back'),
+    ]
+
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, null=True, blank=True)
+    effective_date = models.DateField()
+    status = models.CharField(max_length=11, choices=STATUS_CHOICES, default=APPLYING)
+    changed_employees = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    rolled_back_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Increment cycle {self.pk} effective {self.effective_date}"
+
+
+class IncrementChange(models.Model):
+    # Package fields of one employee before and after a cycle, encoded
+    # like PackageHistory.changes.
+    cycle = models.ForeignKey(IncrementCycle, related_name='changes', on_delete=models.CASCADE, db_index=False)
+    employee = models.ForeignKey(Employee, related_name='+', on_delete=models.CASCADE)
+    previous = models.JSONField()
+    applied = models.JSONField()
+    # Proposed package inputs the cycle reset (see increments.CONSUMED_FIELDS)
+    proposed = models.JSONField(default=dict)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cycle', 'employee'], name='unique_increment_change'),
+        ]
+
+    def __str__(self):
+        return f"Increment of {self.employee_id} in cycle {self.cycle_id}"
@@ -0,0 +1,39 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination
+
+
+class EmployeeCursorPagination(CursorPagination):
+    # Keyset pagination: each page is "emp_id > last seen", so deep pages
+    # cost the same as the first one instead of an OFFSET scan.
+    ordering = 'emp_id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Admin paginator that uses PostgreSQL's planner estimate for the row
+    count of unfiltered large tables instead of a full COUNT(*).
+    """
+
+    # Below this many (estimated) rows an exact count is cheap enough
+    estimate_threshold = 100_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if (
+            isinstance(queryset, QuerySet)
+            and connections[queryset.db].vendor == 'postgresql'
+            and not queryset.query.where
+        ):
+            with connections[queryset.db].cursor() as cursor:
+                cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s', [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] >= self.estimate_threshold:
+                return int(row[0])
+        return super().count
@@ -0,0 +1,350 @@
+"""
+Payroll computation of ``FinalImpactPerMonth`` from an employee's current
+and proposed packages.
+
+Every employee is described by the variables in ``INPUTS`` plus
+``serving_years``. The formulas linked from ``ProposedPackageDetails`` and
+``FinalImpactPerMonth`` are then evaluated in ``STEPS`` order; each result
+is rounded to the cent and becomes a variable for the following steps.
+Steps without a linked formula use their fallback expression.
+
+``compute_employee`` is the per-row path. ``compute_batch`` produces the
+same numbers for a whole queryset of employees: it fetches all inputs in
+one query, evaluates each compiled formula column-wise over the fetched
+values and writes the results back with ``bulk_create``/``bulk.update``.
+"""
+
+import datetime
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+
+from . import bulk, formulas, summaries
+from .models import CurrentPackageDetails, Employee, FinalImpactPerMonth, ProposedPackageDetails
+
+
+# variable -> (package model, field)
+INPUTS = {
+    'gross_salary': (CurrentPackageDetails, 'gross_salary'),
+    'vehicle': (CurrentPackageDetails, 'vehicle'),
+    'fuel_limit': (CurrentPackageDetails, 'fuel_limit'),
+    'mobile_allowance': (CurrentPackageDetails, 'mobile_allowance'),
+    'increment_percentage': (ProposedPackageDetails, 'increment_percentage'),
+    'increased_fuel_amount': (ProposedPackageDetails, 'increased_fuel_amount'),
+    'proposed_mobile_allowance': (ProposedPackageDetails, 'mobile_allowance'),
+    'proposed_vehicle': (ProposedPackageDetails, 'vehicle'),
+}
+
+# (variable, model holding the formula FK, FK field, fallback expression)
+STEPS = (
+    ('increased_amount', ProposedPackageDetails, 'increased_amount', '0'),
+    ('revised_salary', ProposedPackageDetails, 'revised_salary', 'gross_salary + increased_amount'),
+    ('revised_fuel_allowance', ProposedPackageDetails, 'revised_fuel_allowance', 'fuel_limit + increased_fuel_amount'),
+    ('gratuity', FinalImpactPerMonth, 'gratuity', '0'),
+    ('bonus', FinalImpactPerMonth, 'bonus', '0'),
+    ('leave_encashment', FinalImpactPerMonth, 'leave_encashment', '0'),
+    ('mobile_allowance_amount', FinalImpactPerMonth, 'mobile_allowance', 'proposed_mobile_allowance'),
+    ('total', FinalImpactPerMonth, 'total',
+     'revised_salary + revised_fuel_allowance + mobile_allowance_amount + gratuity + bonus + leave_encashment'),
+)
+
+# FinalImpactPerMonth field -> computed variable
+RESULTS = {
+    'serving_years': 'serving_years',
+    'salary': 'revised_salary',
+    'fuel': 'revised_fuel_allowance',
+    'gratuity_amount': 'gratuity',
+    'bonus_amount': 'bonus',
+    'leave_encashment_amount': 'leave_encashment',
+    'mobile_allowance_amount': 'mobile_allowance_amount',
+    'total_amount': 'total',
+}
+
+_RELATED_NAME = {
+    CurrentPackageDetails: 'currentpackagedetails',
+    ProposedPackageDetails: 'proposedpackagedetails',
+    FinalImpactPerMonth: 'finalimpactpermonth',
+}
+
+_fallbacks = {}
+
+
+def fallback(variable):
+    compiled = _fallbacks.get(variable)
+    if compiled is None:
+        expression = next(step[3] for step in STEPS if step[0] == variable)
+        compiled = _fallbacks[variable] = formulas.compile_expression(expression)
+    return compiled
+
+
+def step_variables(variable):
+    """Names a formula of step ``variable`` can read: the inputs, ``serving_years`` and earlier steps."""
+    names = {'serving_years', *INPUTS}
+    for step, _, _, _ in STEPS:
+        if step == variable:
+            return names
+        names.add(step)
+    raise KeyError(variable)
+
+
+def _cents(value):
+    return value.quantize(formulas.CENT, rounding=ROUND_HALF_UP)
+
+
+def serving_years(date_of_joining, as_of):
+    if date_of_joining is None:
+        return 0
+    years = as_of.year - date_of_joining.year
+    if (as_of.month, as_of.day) < (date_of_joining.month, date_of_joining.day):
+        years -= 1
+    return max(years, 0)
+
+
+# Per-row path
+
+def employee_variables(employee, as_of=None):
+    as_of = as_of or datetime.date.today()
+    variables = {'serving_years': Decimal(serving_years(employee.date_of_joining, as_of))}
+    for variable, (model, field) in INPUTS.items():
+        package = getattr(employee, _RELATED_NAME[model], None)
+        variables[variable] = formulas.to_decimal(getattr(package, field, None))
+    return variables
+
+
+def compute_values(variables, formula_objects):
+    """
+    Run ``STEPS`` over ``variables`` for a single employee.
+
+    ``formula_objects`` maps step variables to ``Formula`` instances (or
+    ``None`` to use the fallback). Returns ``variables`` with the step
+    results added.
+    """
+    for variable, _, _, _ in STEPS:
+        formula = formula_objects.get(variable)
+        compiled = formulas.get_compiled(formula) if formula is not None else fallback(variable)
+        variables[variable] = _cents(compiled.evaluate(variables))
+    return variables
+
+
+def compute_employee(employee, as_of=None, emp_status=None):
+    """
+    Compute and save the ``FinalImpactPerMonth`` of a single employee.
+
+    A missing impact row is created with ``emp_status``; without one the
+    employee is skipped and ``None`` is returned. Employees without a
+    current package are skipped too, as by ``compute_batch``.
+    """
+    if getattr(employee, 'currentpackagedetails', None) is None:
+        return None
+    impact = getattr(employee, 'finalimpactpermonth', None)
+    if impact is None:
+        if emp_status is None:
+            return None
+        impact = FinalImpactPerMonth(employee=employee, emp_status=emp_status)
+
+    proposed = getattr(employee, 'proposedpackagedetails', None)
+    owners = {ProposedPackageDetails: proposed, FinalImpactPerMonth: impact}
+    formula_objects = {
+        variable: getattr(owners[model], field, None)
+        for variable, model, field, _ in STEPS
+    }
+    values = compute_values(employee_variables(employee, as_of), formula_objects)
+    for field, variable in RESULTS.items():
+        setattr(impact, field, int(values[variable]) if field == 'serving_years' else values[variable])
+    impact.is_stale = False
+    # Written by the engine itself: not an input change (see dependencies.instance_changed)
+    impact._computed = True
+    try:
+        impact.save()
+    finally:
+        del impact._computed
+    return impact
+
+
+# Batch path
+
+def _lookup(model, field):
+    return f"{_RELATED_NAME[model]}__{field}"
+
+
+def formula_lookups():
+    # Employee lookups of the formula id used by each step
+    return {variable: _lookup(model, field) for variable, model, field, _ in STEPS}
+
+
+def fetch_columns(employees, extra=()):
+    """
+    Fetch the payroll inputs of ``employees`` (an Employee queryset) as
+    columns in a single query.
+
+    Returns ``(columns, size)`` where ``columns`` maps names to lists:
+    ``emp_id``, ``impact_id``, ``date_of_joining``, every variable in
+    ``INPUTS``, ``<step>_formula`` ids for every step in ``STEPS`` and the
+    Employee fields named in ``extra``.
+    """
+    lookups = {
+        'emp_id': 'emp_id',
+        'impact_id': _lookup(FinalImpactPerMonth, 'id'),
+        'date_of_joining': 'date_of_joining',
+    }
+    lookups.update((variable, _lookup(model, field)) for variable, (model, field) in INPUTS.items())
+    lookups.update((f'{variable}_formula', lookup) for variable, lookup in formula_lookups().items())
+    lookups.update((name, name) for name in extra)
+
+    rows = list(
+        employees.filter(currentpackagedetails__isnull=False)
+        .order_by('emp_id')
+        .values_list(*lookups.values())
+    )
+    columns = dict(zip(lookups, map(list, zip(*rows)))) if rows else {name: [] for name in lookups}
+    for variable in INPUTS:
+        columns[variable] = [Decimal(0) if value is None else value for value in columns[variable]]
+    return columns, len(rows)
+
+
+def compile_steps(columns, formula_ids=()):
+    """
+    ``{formula_id: CompiledFormula}`` of the step formulas in ``columns``
+    and of ``formula_ids``, read in one query, for the ``compiled``
+    argument of the functions below.
+    """
+    formula_ids = set(formula_ids)
+    for variable, _, _, _ in STEPS:
+        formula_ids.update(columns[f'{variable}_formula'])
+    return formulas.get_compiled_many(formula_ids)
+
+
+def evaluate_column(variable, formula_ids, columns, size, compiled=None):
+    compiled_by_id = formulas.get_compiled_many(formula_ids) if compiled is None else compiled
+    groups = defaultdict(list)
+    for index, formula_id in enumerate(formula_ids):
+        groups[formula_id if formula_id in compiled_by_id else None].append(index)
+
+    result = [None] * size
+    for formula_id, indexes in groups.items():
+        compiled = compiled_by_id[formula_id] if formula_id is not None else fallback(variable)
+        try:
+            arguments = [columns[name] for name in compiled.names]
+        except KeyError as exc:
+            raise formulas.FormulaError(f"Missing value for {exc.args[0]!r} in {compiled.expression!r}") from None
+        if len(indexes) != size:
+            arguments = [[column[index] for index in indexes] for column in arguments]
+        if arguments:
+            values = map(compiled, *arguments)
+        else:
+            values = [compiled()] * len(indexes)
+        for index, value in zip(indexes, values):
+            result[index] = _cents(value)
+    return result
+
+
+def step_formulas(columns, variable, compiled=None):
+    """The formulas ``variable`` is computed with for any employee in ``columns``."""
+    formula_ids = set(columns[f'{variable}_formula'])
+    compiled_by_id = formulas.get_compiled_many(formula_ids) if compiled is None else compiled
+    result = [compiled_by_id[formula_id] for formula_id in formula_ids if formula_id in compiled_by_id]
+    if len(result) < len(formula_ids):
+        result.append(fallback(variable))
+    return result
+
+
+def needed_steps(columns, targets):
+    """
+    ``[(variable, formulas)]`` of the steps in ``targets`` and the steps
+    they read for any employee in ``columns``, in evaluation order.
+    """
+    compiled = {variable: step_formulas(columns, variable) for variable, _, _, _ in STEPS}
+    needed = set(targets)
+    for variable, _, _, _ in reversed(STEPS):
+        if variable in needed:
+            needed.update(name for formula in compiled[variable] for name in formula.names)
+    return [
+        (variable, compiled[variable])
+        for variable, _, _, _ in STEPS if variable in needed
+    ]
+
+
+def dependent_steps(steps, changed):
+    """Variables of ``steps`` that read ``changed``, directly or through an earlier step."""
+    changed = set(changed)
+    dependent = []
+    for variable, compiled in steps:
+        if any(changed.intersection(formula.names) for formula in compiled):
+            dependent.append(variable)
+            changed.add(variable)
+    return dependent
+
+
+def compute_columns(columns, size, as_of=None, compiled=None):
+    """Evaluate ``STEPS`` column-wise, adding one column per step."""
+    as_of = as_of or datetime.date.today()
+    if compiled is None:
+        compiled = compile_steps(columns)
+    columns['serving_years'] = [Decimal(serving_years(date, as_of)) for date in columns['date_of_joining']]
+    for variable, _, _, _ in STEPS:
+        columns[variable] = evaluate_column(variable, columns[f'{variable}_formula'], columns, size, compiled)
+    return columns
+
+
+def compute_batch(employees=None, as_of=None, emp_status=None, batch_size=1000):
+    """
+    Compute ``FinalImpactPerMonth`` for every employee in ``employees``
+    (default: all) that has a current package.
+
+    Existing impact rows are updated with ``bulk.update``; missing ones are
+    created with ``bulk_create`` when ``emp_status`` is given and skipped
+    otherwise. Returns a summary of the run.
+    """
+    if employees is None:
+        employees = Employee.objects.all()
+    columns, size = fetch_columns(employees)
+    compute_columns(columns, size, as_of)
+
+    to_update, to_create = [], []
+    for index in range(size):
+        impact_id = columns['impact_id'][index]
+        if impact_id is None:
+            if emp_status is None:
+                continue
+            impact = FinalImpactPerMonth(employee_id=columns['emp_id'][index], emp_status=emp_status)
+            to_create.append(impact)
+        else:
+            impact = FinalImpactPerMonth(id=impact_id, employee_id=columns['emp_id'][index])
+            to_update.append(impact)
+        for field, variable in RESULTS.items():
+            value = columns[variable][index]
+            setattr(impact, field, int(value) if field == 'serving_years' else value)
+        impact.is_stale = False
+
+    with transaction.atomic():
+        bulk.update(to_update, [*RESULTS, 'is_stale'])
+        FinalImpactPerMonth.objects.bulk_create(to_create, batch_size=batch_size)
+        # bulk writes send no signals
+        summaries.mark_employees([impact.employee_id for impact in to_update + to_create])
+
+    return {
+        'computed': size,
+        'updated': len(to_update),
+        'created': len(to_create),
+        'skipped': size - len(to_update) - len(to_create),
+    }
+
+
+def recompute_stale(employee_ids=None, batch_size=1000, limit=None):
+    """
+    Recompute the impact rows flagged ``is_stale``, optionally limited to
+    ``employee_ids``, or to the first ``limit`` stale employees that
+    can be computed (have a current package).
+    """
+    employees = Employee.objects.filter(finalimpactpermonth__is_stale=True)
+    if employee_ids is not None:
+        employees = employees.filter(emp_id__in=employee_ids)
+    if limit is not None:
+        employees = Employee.objects.filter(
+            emp_id__in=list(
+                employees.filter(currentpackagedetails__isnull=False)
+                .order_by('emp_id').values_list('emp_id', flat=True)[:limit]
+            )
+        )
+    return compute_batch(employees, batch_size=batch_size)
@@ -0,0 +1,219 @@
+"""
+Payroll runs as a database-backed job queue.
+
+``create_run`` splits a company's employees into emp_id ranges and stores
+one ``PayrollRunChunk`` per range. Workers claim pending chunks with a
+conditional UPDATE, so any number of ``manage.py payroll_worker``
+processes (or the process pool in ``execute``) can share a run without a
+broker. Each chunk is computed with ``payroll.compute_batch``, which
+overwrites its results, so retrying or resuming a chunk is harmless.
+
+A chunk that fails is retried until ``PAYROLL_RUN_MAX_ATTEMPTS``, after
+``PAYROLL_RUN_RETRY_DELAY`` seconds doubling per attempt; a chunk left
+running longer than ``PAYROLL_RUN_LEASE_SECONDS`` (worker died) can be
+claimed again. A claim is identified by its worker and start time: a
+worker whose chunk was claimed again records nothing, so the run counters
+count every chunk once.
+"""
+
+import datetime
+import multiprocessing
+import os
+import socket
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import payroll
+from .models import Employee, PayrollRun, PayrollRunChunk
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+@transaction.atomic
+def create_run(company, emp_status=None, as_of=None, chunk_size=None):
+    """Create a pending run for ``company`` with its chunks."""
+    chunk_size = chunk_size or _setting('PAYROLL_RUN_CHUNK_SIZE', 1000)
+    run = PayrollRun.objects.create(
+        company=company,
+        emp_status=emp_status,
+        as_of=as_of or datetime.date.today(),
+    )
+    emp_ids = list(
+        Employee.objects.filter(company_name=company).order_by('emp_id').values_list('emp_id', flat=True)
+    )
+    PayrollRunChunk.objects.bulk_create(
+        PayrollRunChunk(
+            run=run,
+            index=index,
+            first_emp_id=emp_ids[start],
+            last_emp_id=emp_ids[min(start + chunk_size, len(emp_ids)) - 1],
+            employee_count=len(emp_ids[start:start + chunk_size]),
+        )
+        for index, start in enumerate(range(0, len(emp_ids), chunk_size))
+    )
+    run.total_chunks = -(-len(emp_ids) // chunk_size)
+    run.total_employees = len(emp_ids)
+    if not emp_ids:
+        run.status = PayrollRun.DONE
+        run.finished_at = timezone.now()
+    run.save(update_fields=['total_chunks', 'total_employees', 'status', 'finished_at'])
+    return run
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim_chunk(run_id=None, worker=None):
+    """
+    Claim the next chunk that is pending, or running past its lease.
+    Returns the claimed chunk or None when there is nothing to do.
+    """
+    lease = datetime.timedelta(seconds=_setting('PAYROLL_RUN_LEASE_SECONDS', 600))
+    now = timezone.now()
+    candidates = PayrollRunChunk.objects.filter(
+        Q(status=PayrollRun.PENDING, retry_at__isnull=True)
+        | Q(status=PayrollRun.PENDING, retry_at__lte=now)
+        | Q(status=PayrollRun.RUNNING, started_at__lt=now - lease)
+    )
+    if run_id is not None:
+        candidates = candidates.filter(run_id=run_id)
+
+    for chunk in candidates.order_by('run_id', 'index').only('id', 'status', 'started_at')[:20]:
+        claimed = PayrollRunChunk.objects.filter(
+            pk=chunk.pk, status=chunk.status, started_at=chunk.started_at,
+        ).update(
+            status=PayrollRun.RUNNING,
+            started_at=now,
+            attempts=F('attempts') + 1,
+            worker=worker or worker_name(),
+            retry_at=None,
+        )
+        if claimed:
+            return PayrollRunChunk.objects.select_related('run').get(pk=chunk.pk)
+    return None
+
+
+class LeaseLost(Exception):
+    """The chunk was claimed again by another worker while this one computed it."""
+
+
+def _claimed(chunk):
+    # The chunk as long as it is still held by the claim that returned ``chunk``
+    return PayrollRunChunk.objects.filter(
+        pk=chunk.pk, status=PayrollRun.RUNNING, worker=chunk.worker, started_at=chunk.started_at,
+    )
+
+
+def retry_delay(attempts):
+    return datetime.timedelta(seconds=_setting('PAYROLL_RUN_RETRY_DELAY', 30) * 2 ** (attempts - 1))
+
+
+def process_chunk(chunk):
+    """Compute one claimed chunk and record the outcome, unless the claim was lost."""
+    run = chunk.run
+    PayrollRun.objects.filter(pk=run.pk, status=PayrollRun.PENDING).update(
+        status=PayrollRun.RUNNING, started_at=timezone.now(),
+    )
+    employees = Employee.objects.filter(
+        company_name_id=run.company_id,
+        emp_id__gte=chunk.first_emp_id,
+        emp_id__lte=chunk.last_emp_id,
+    )
+    try:
+        with transaction.atomic():
+            summary = payroll.compute_batch(employees, as_of=run.as_of, emp_status=run.emp_status)
+            if not _claimed(chunk).update(status=PayrollRun.DONE, finished_at=timezone.now(), error=''):
+                raise LeaseLost
+            PayrollRun.objects.filter(pk=run.pk).update(
+                completed_chunks=F('completed_chunks') + 1,
+                processed_employees=F('processed_employees') + summary['computed'],
+            )
+    except LeaseLost:
+        # The worker holding the chunk now records it
+        return
+    except Exception:
+        retry = chunk.attempts < _setting('PAYROLL_RUN_MAX_ATTEMPTS', 3)
+        updated = _claimed(chunk).update(
+            status=PayrollRun.PENDING if retry else PayrollRun.FAILED,
+            error=traceback.format_exc(),
+            started_at=None,
+            retry_at=timezone.now() + retry_delay(chunk.attempts) if retry else None,
+        )
+        if not updated:
+            return
+    finish_run(run.pk)
+
+
+def finish_run(run_id):
+    """Mark the run done or failed once no chunk is pending or running."""
+    chunks = PayrollRunChunk.objects.filter(run_id=run_id)
+    if chunks.filter(status__in=[PayrollRun.PENDING, PayrollRun.RUNNING]).exists():
+        return
+    failed = chunks.filter(status=PayrollRun.FAILED).count()
+    PayrollRun.objects.filter(pk=run_id).exclude(status__in=[PayrollRun.DONE, PayrollRun.FAILED]).update(
+        status=PayrollRun.FAILED if failed else PayrollRun.DONE,
+        error=f"{failed} chunk(s) failed" if failed else '',
+        finished_at=timezone.now(),
+    )
+
+
+def work(run_id=None, limit=None):
+    """Claim and process chunks until none are left. Returns the number processed."""
+    worker = worker_name()
+    processed = 0
+    while limit is None or processed < limit:
+        chunk = claim_chunk(run_id, worker)
+        if chunk is None:
+            break
+        process_chunk(chunk)
+        processed += 1
+    return processed
+
+
+def _work_in_child(run_id):
+    # The parent closed its connections before forking, so each child
+    # opens its own
+    try:
+        return work(run_id)
+    finally:
+        connections.close_all()
+
+
+def execute(run_id, workers=None):
+    """
+    Process every chunk of ``run_id`` with ``workers`` processes (default:
+    ``PAYROLL_RUN_WORKERS`` or the CPU count); ``workers=1`` runs inline.
+
+    Child processes are forked so they inherit the configured Django
+    setup. Where fork is unavailable, or on SQLite which allows a single
+    writer, the run is processed inline.
+    """
+    workers = workers or _setting('PAYROLL_RUN_WORKERS', None) or os.cpu_count() or 1
+    if (
+        workers <= 1
+        or 'fork' not in multiprocessing.get_all_start_methods()
+        or connections['default'].vendor == 'sqlite'
+    ):
+        return work(run_id)
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        return sum(pool.map(_work_in_child, [run_id] * workers))
+
+
+def resume(run_id):
+    """Put failed chunks of a run back in the queue."""
+    PayrollRunChunk.objects.filter(run_id=run_id, status=PayrollRun.FAILED).update(
+        status=PayrollRun.PENDING, attempts=0, started_at=None, retry_at=None,
+    )
+    PayrollRun.objects.filter(pk=run_id, status=PayrollRun.FAILED).update(
+        status=PayrollRun.RUNNING, finished_at=None, error='',
+    )
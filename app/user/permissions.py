@@ -0,0 +1,188 @@
+"""
+Cached permission and group resolution.
+
+Django's ModelBackend loads a user's permissions with two queries the
+first time each user instance is checked, i.e. on every request.
+``CachedModelBackend`` reads them from a snapshot of the user's
+permission strings and group names, kept in the
+``PERMISSION_CACHE_ALIAS`` cache for ``PERMISSION_CACHE_TIMEOUT``
+seconds, so checks cost no queries once it is cached.
+
+Snapshots carry a generation number. Changes to permissions or to a
+group's permissions, and deleted groups, bump the generation, which
+drops every snapshot; changes to one user's groups, permissions or flags
+drop only theirs (see ``user.signals``). Without a cache shared by all
+processes, other processes see a change after the timeout.
+
+``snapshots`` and ``has_perms`` resolve many users at once, with two
+queries for all those not cached. ``ModelPermission`` is the DRF
+permission class of the employee and payroll endpoints.
+"""
+
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.permissions import BasePermission
+
+
+GENERATION_KEY = 'perms:generation'
+
+# Users loaded per pair of queries
+BATCH_SIZE = 1000
+
+Snapshot = namedtuple('Snapshot', 'generation user_permissions group_permissions groups')
+
+
+def _cache():
+    return caches[getattr(settings, 'PERMISSION_CACHE_ALIAS', 'default')]
+
+
+def _key(pk):
+    return f'perms:user:{pk}'
+
+
+def _load(users, generation):
+    pks = [user.pk for user in users]
+    user_perms = {pk: set() for pk in pks}
+    group_perms = {pk: set() for pk in pks}
+    groups = {pk: set() for pk in pks}
+    for pk, app_label, codename in (
+        Permission.objects.filter(user__in=pks)
+        .values_list('user', 'content_type__app_label', 'codename').order_by()
+    ):
+        user_perms[pk].add(f'{app_label}.{codename}')
+    for pk, name, app_label, codename in (
+        Group.objects.filter(user__in=pks)
+        .values_list('user', 'name', 'permissions__content_type__app_label', 'permissions__codename')
+    ):
+        groups[pk].add(name)
+        if codename is not None:
+            group_perms[pk].add(f'{app_label}.{codename}')
+
+    superusers = [user.pk for user in users if user.is_superuser]
+    if superusers:
+        # Like ModelBackend, superusers hold every permission from both sources
+        everything = {
+            f'{app_label}.{codename}'
+            for app_label, codename in Permission.objects.order_by().values_list('content_type__app_label', 'codename')
+        }
+        for pk in superusers:
+            user_perms[pk] = group_perms[pk] = everything
+    return {
+        pk: Snapshot(generation, frozenset(user_perms[pk]), frozenset(group_perms[pk]), frozenset(groups[pk]))
+        for pk in pks
+    }
+
+
+def snapshots(users):
+    """Map the pk of each of ``users`` to its ``Snapshot``, loading the uncached ones together."""
+    users = list(users)
+    timeout = getattr(settings, 'PERMISSION_CACHE_TIMEOUT', 300)
+    cache = _cache()
+    found, generation = {}, None
+    if timeout:
+        cached = cache.get_many([GENERATION_KEY, *(_key(user.pk) for user in users)])
+        generation = cached.get(GENERATION_KEY)
+        if generation is None:
+            cache.add(GENERATION_KEY, time.time_ns(), None)
+            generation = cache.get(GENERATION_KEY)
+        for user in users:
+            snapshot = cached.get(_key(user.pk))
+            if snapshot is not None and snapshot.generation == generation:
+                found[user.pk] = snapshot
+
+    missing = [user for user in users if user.pk not in found]
+    for start in range(0, len(missing), BATCH_SIZE):
+        loaded = _load(missing[start:start + BATCH_SIZE], generation)
+        found.update(loaded)
+        if timeout:
+            cache.set_many({_key(pk): snapshot for pk, snapshot in loaded.items()}, timeout)
+    return found
+
+
+def attach(users):
+    """Fill ModelBackend's per-instance permission caches of ``users`` from their snapshots."""
+    users = [user for user in users if not hasattr(user, '_user_perm_cache')]
+    if not users:
+        return
+    loaded = snapshots(users)
+    for user in users:
+        snapshot = loaded[user.pk]
+        user._user_perm_cache = set(snapshot.user_permissions)
+        user._group_perm_cache = set(snapshot.group_permissions)
+        user._perm_cache = snapshot.user_permissions | snapshot.group_permissions
+
+
+def has_perms(users, perms):
+    """Map the pk of each of ``users`` to whether they hold all of ``perms``, like ``has_perms``."""
+    users = list(users)
+    perms = set(perms)
+    loaded = snapshots(user for user in users if user.is_active and not user.is_superuser)
+    result = {}
+    for user in users:
+        if not user.is_active:
+            result[user.pk] = False
+        elif user.is_superuser:
+            result[user.pk] = True
+        else:
+            snapshot = loaded[user.pk]
+            result[user.pk] = perms <= snapshot.user_permissions | snapshot.group_permissions
+    return result
+
+
+def in_group(user, name):
+    return user.is_authenticated and name in snapshots([user])[user.pk].groups
+
+
+def invalidate(user_pks=None):
+    """Drop the snapshots of ``user_pks``, or of every user; again once the transaction commits."""
+    def drop():
+        if user_pks is None:
+            _cache().set(GENERATION_KEY, time.time_ns(), None)
+        else:
+            _cache().delete_many([_key(pk) for pk in user_pks])
+
+    drop()
+    transaction.on_commit(drop)
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend that loads permissions from the cached snapshot."""
+
+    def _get_permissions(self, user_obj, obj, from_name):
+        if user_obj.is_active and not user_obj.is_anonymous and obj is None:
+            attach([user_obj])
+        return super()._get_permissions(user_obj, obj, from_name)
+
+
+class ModelPermission(BasePermission):
+    """
+    With ``API_MODEL_PERMISSIONS``, require the permission on the view's
+    ``permission_model`` for the request method: ``view`` to read, ``add``,
+    ``change`` or ``delete`` to write. A view's ``permission_actions``
+    overrides the action of some methods, e.g. ``{'POST': 'view'}`` for a
+    POST that only reads. Listed after IsAuthenticated or IsAdminUser,
+    which still apply.
+    """
+
+    actions = {
+        'GET': 'view',
+        'HEAD': 'view',
+        'OPTIONS': 'view',
+        'POST': 'add',
+        'PUT': 'change',
+        'PATCH': 'change',
+        'DELETE': 'delete',
+    }
+
+    def has_permission(self, request, view):
+        if not getattr(settings, 'API_MODEL_PERMISSIONS', False):
+            return True
+        action = getattr(view, 'permission_actions', {}).get(request.method, self.actions.get(request.method))
+        opts = view.permission_model._meta
+        return action is not None and request.user.has_perm(f'{opts.app_label}.{action}_{opts.model_name}')
@@ -0,0 +1,131 @@
+"""
+Month-by-month projection of gratuity and leave-encashment liability.
+
+For every month-end in the horizon an employee's serving years follow
+from ``Employee.date_of_joining``. Only serving years change over the
+projection; packages are held at their current and proposed values. So an
+employee takes at most ``years + 1`` distinct serving-year values, and the
+payroll steps are evaluated column-wise once per value for the whole
+workforce (see ``payroll.evaluate_column``), not once per month. Only the
+steps the projected amounts need are evaluated, and only those reading
+``serving_years`` are re-evaluated per value. The monthly amounts
+are then spread over the months each value holds with difference arrays,
+so the cost grows with employees x years, not employees x months.
+"""
+
+import calendar
+import datetime
+from decimal import Decimal
+
+from . import payroll
+from .models import Employee
+
+
+PROJECTED = ('gratuity', 'leave_encashment')
+
+
+def month_ends(start, months):
+    """The last day of ``months`` consecutive months starting with ``start``'s."""
+    dates = []
+    year, month = start.year, start.month
+    for _ in range(months):
+        dates.append(datetime.date(year, month, calendar.monthrange(year, month)[1]))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return dates
+
+
+def _segments(month_day, dates):
+    # [(first month index, anniversary year)] for a joining (month, day):
+    # serving years on dates[i] are the anniversary year minus the joining
+    # year (see payroll.serving_years)
+    segments = []
+    for index, date in enumerate(dates):
+        value = date.year - ((date.month, date.day) < month_day)
+        if not segments or segments[-1][1] != value:
+            segments.append((index, value))
+    return segments
+
+
+def project(employees=None, years=10, start=None, group_by=None):
+    """
+    Project the monthly gratuity and leave-encashment amounts of
+    ``employees`` (default: all with a current package) over ``years``
+    years of month-ends, starting with the month of ``start`` (default:
+    today).
+
+    Returns ``{group: [row, ...]}`` with one row per month holding
+    ``month``, the summed monthly ``gratuity`` and ``leave_encashment``
+    and their running totals ``gratuity_accrued`` and
+    ``leave_encashment_accrued``. Rows are grouped by the Employee field
+    ``group_by`` (e.g. ``'company_name_id'``), or under ``None``.
+    """
+    if employees is None:
+        employees = Employee.objects.all()
+    dates = month_ends(start or datetime.date.today(), years * 12)
+    months = len(dates)
+
+    columns, size = payroll.fetch_columns(employees, extra=[group_by] if group_by else ())
+    base = [payroll.serving_years(date, dates[0]) for date in columns['date_of_joining']]
+    columns['serving_years'] = [Decimal(first) for first in base]
+    steps = payroll.needed_steps(columns, PROJECTED)
+    for variable, _ in steps:
+        columns[variable] = payroll.evaluate_column(variable, columns[f'{variable}_formula'], columns, size)
+
+    # Serving years of each employee over the horizon, as month ranges
+    # with the offset from their serving years in the first month
+    segment_cache, span_cache = {}, {}
+    spans = []
+    for date_of_joining, first in zip(columns['date_of_joining'], base):
+        employee_spans = span_cache.get(date_of_joining)
+        if employee_spans is None:
+            if date_of_joining is None:
+                employee_spans = [(0, months, 0)]
+            else:
+                key = (date_of_joining.month, date_of_joining.day)
+                segments = segment_cache.get(key)
+                if segments is None:
+                    segments = segment_cache[key] = _segments(key, dates)
+                employee_spans = [
+                    (index, segments[position + 1][0] if position + 1 < len(segments) else months,
+                     max(value - date_of_joining.year, 0) - first)
+                    for position, (index, value) in enumerate(segments)
+                ]
+            span_cache[date_of_joining] = employee_spans
+        spans.append(employee_spans)
+
+    # Results for each serving-years offset, evaluated only for offsets in use
+    levels = {0: {variable: columns[variable] for variable in PROJECTED}}
+    dependent = payroll.dependent_steps(steps, {'serving_years'})
+    for offset in range(1, max((span[-1][2] for span in spans), default=0) + 1):
+        columns['serving_years'] = [Decimal(first + offset) for first in base]
+        for variable in dependent:
+            columns[variable] = payroll.evaluate_column(variable, columns[f'{variable}_formula'], columns, size)
+        levels[offset] = {variable: columns[variable] for variable in PROJECTED}
+
+    groups = columns[group_by] if group_by else [None] * size
+    deltas = {}
+    for index, (group, employee_spans) in enumerate(zip(groups, spans)):
+        delta = deltas.get(group)
+        if delta is None:
+            delta = deltas[group] = {variable: [Decimal(0)] * (months + 1) for variable in PROJECTED}
+        for first_month, end_month, offset in employee_spans:
+            for variable in PROJECTED:
+                amount = levels[offset][variable][index]
+                delta[variable][first_month] += amount
+                delta[variable][end_month] -= amount
+
+    report = {}
+    for group, delta in deltas.items():
+        rows = []
+        running = dict.fromkeys(PROJECTED, Decimal(0))
+        accrued = dict.fromkeys(PROJECTED, Decimal(0))
+        for month, date in enumerate(dates):
+            row = {'month': date}
+            for variable in PROJECTED:
+                running[variable] += delta[variable][month]
+                accrued[variable] += running[variable]
+                row[variable] = running[variable]
+                row[f'{variable}_accrued'] = accrued[variable]
+            rows.append(row)
+        report[group] = rows
+    return report
@@ -0,0 +1,74 @@
+"""
+Bulk creation of staff accounts.
+
+``CustomUserManager.bulk_create_users`` validates the rows, resolves every
+group name with one query, hashes passwords in a process pool and inserts
+users and their group memberships with ``bulk_create``.
+
+With ``invite=True`` accounts get unusable passwords instead, and
+``invite_token`` issues a password-reset style token per user, which the
+invite accept endpoint (``InviteAcceptView``) takes with the first
+password. The token stops working once the user has set a password, so
+nothing is stored.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.contrib.auth.tokens import default_token_generator
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    Hash ``passwords`` with the default hasher, across ``workers``
+    processes (default: ``PASSWORD_HASH_WORKERS`` or the CPU count).
+    None gives an unusable password.
+    """
+    hashed = [make_password(None) if password is None else None for password in passwords]
+    pending = [index for index, password in enumerate(passwords) if password is not None]
+    workers = workers or getattr(settings, 'PASSWORD_HASH_WORKERS', None) or os.cpu_count() or 1
+    workers = min(workers, len(pending))
+    if workers <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        results = [make_password(passwords[index]) for index in pending]
+    else:
+        # Forked children inherit the configured hashers; hashing needs no database
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            chunksize = max(1, len(pending) // (workers * 4))
+            results = list(pool.map(make_password, [passwords[index] for index in pending], chunksize=chunksize))
+    for index, result in zip(pending, results):
+        hashed[index] = result
+    return hashed
+
+
+def groups_by_name(names):
+    """Map each of ``names`` to its Group, creating missing groups in one insert."""
+    names = set(names)
+    groups = {group.name: group for group in Group.objects.filter(name__in=names)}
+    missing = names.difference(groups)
+    if missing:
+        Group.objects.bulk_create([Group(name=name) for name in missing], ignore_conflicts=True)
+        groups.update((group.name, group) for group in Group.objects.filter(name__in=missing))
+    return groups
+
+
+def invite_token(user):
+    """Return ``(uidb64, token)`` for ``user`` to set their first password."""
+    return urlsafe_base64_encode(force_bytes(user.pk)), default_token_generator.make_token(user)
+
+
+def check_invite(uidb64, token):
+    """Return the user the invite was issued to, or None when it is invalid or used."""
+    from .models import CustomUser
+
+    try:
+        user = CustomUser.objects.get(pk=urlsafe_base64_decode(uidb64).decode())
+    except (ValueError, CustomUser.DoesNotExist):
+        return None
+    return user if default_token_generator.check_token(user, token) else None
@@ -0,0 +1,62 @@
+"""
+Read-replica routing.
+
+Reads go to the ``replica`` database, when one is configured, only inside
+``on_replica()``. The list, report and export views enter it with
+``@reads_from_replica``; they can tolerate replication lag. Everything
+else uses ``default``, including authentication and any read that
+follows a write.
+"""
+
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+REPLICA = 'replica'
+
+_on_replica = ContextVar('on_replica', default=False)
+
+
+@contextmanager
+def on_replica():
+    token = _on_replica.set(True)
+    try:
+        yield
+    finally:
+        _on_replica.reset(token)
+
+
+def reads_from_replica(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with on_replica():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def stream_from_replica(iterable):
+    """Iterate ``iterable``, e.g. a streamed response body, with reads on the replica."""
+    with on_replica():
+        yield from iterable
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if _on_replica.get() and REPLICA in settings.DATABASES:
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as default
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema by replication
+        return db != REPLICA
@@ -0,0 +1,155 @@
+"""
+What-if increment scenarios, evaluated in memory.
+
+A ``Snapshot`` loads the payroll inputs of a set of employees once and
+computes the baseline from them. A ``Scenario`` overrides
+``increment_percentage``, flat or banded by e.g. designation, and the
+formulas of chosen steps. It is applied as an overlay: a shallow copy of
+the snapshot's columns where only the overridden columns, and the steps
+that read them, are replaced. Every other column is shared. Nothing is
+written to the database, so any number of scenarios share one load.
+"""
+
+import datetime
+from decimal import Decimal
+
+from . import formulas, payroll
+from .models import Employee
+
+
+# Name -> Employee field, for bands and grouping
+FIELDS = {
+    'company': 'company_name_id',
+    'designation': 'designation_id',
+    'department': 'department_id',
+    'section': 'section_id',
+    'location': 'location_id',
+}
+
+# Step results summed per group
+METRICS = ('increased_amount', 'revised_salary', 'total')
+
+STEP_VARIABLES = {variable for variable, _, _, _ in payroll.STEPS}
+
+
+class Scenario:
+    """
+    ``increment_percentage`` applies to every employee. ``bands`` maps ids
+    of the ``band_by`` field (see ``FIELDS``) to percentages and wins
+    over it. Employees covered by neither keep their proposed percentage.
+    ``formulas`` maps step variables (see ``payroll.STEPS``) to the Formula,
+    or Formula id, used for every employee.
+    """
+
+    def __init__(self, name, increment_percentage=None, bands=None, band_by='designation', formulas=None):
+        if band_by not in FIELDS:
+            raise ValueError(f"Cannot band by {band_by!r}")
+        unknown = set(formulas or ()) - STEP_VARIABLES
+        if unknown:
+            raise ValueError(f"Unknown steps: {', '.join(sorted(unknown))}")
+        self.name = name
+        self.increment_percentage = None if increment_percentage is None else Decimal(increment_percentage)
+        self.bands = {int(key): Decimal(value) for key, value in (bands or {}).items()}
+        self.band_by = band_by
+        self.formulas = {variable: getattr(formula, 'pk', formula) for variable, formula in (formulas or {}).items()}
+
+    def __repr__(self):
+        return f"<Scenario {self.name!r}>"
+
+    def overrides(self, snapshot):
+        """Replacement columns of this scenario over ``snapshot``."""
+        columns = {}
+        if self.increment_percentage is not None or self.bands:
+            percentages = (
+                [self.increment_percentage] * snapshot.size if self.increment_percentage is not None
+                else snapshot.columns['increment_percentage']
+            )
+            if self.bands:
+                percentages = [
+                    self.bands.get(key, percentage)
+                    for key, percentage in zip(snapshot.columns[FIELDS[self.band_by]], percentages)
+                ]
+            columns['increment_percentage'] = percentages
+        for variable, formula_id in self.formulas.items():
+            columns[f'{variable}_formula'] = [formula_id] * snapshot.size
+        return columns
+
+
+class Snapshot:
+    """
+    Payroll inputs and baseline results of ``employees``, loaded once.
+    The step formulas, and those of ``formula_ids`` (the scenarios'
+    overrides), are compiled once for every scenario applied.
+    """
+
+    def __init__(self, employees=None, as_of=None, group_by=('company', 'department'), formula_ids=()):
+        if employees is None:
+            employees = Employee.objects.all()
+        self.group_by = [FIELDS[name] for name in group_by]
+        self.group_names = list(group_by)
+        self.as_of = as_of or datetime.date.today()
+        self.columns, self.size = payroll.fetch_columns(employees, extra=list(FIELDS.values()))
+        self.compiled = payroll.compile_steps(self.columns, formula_ids)
+        self.resolved = set(formula_ids)
+        payroll.compute_columns(self.columns, self.size, self.as_of, self.compiled)
+        self.baseline = self.aggregate(self.columns)
+
+    def apply(self, scenario):
+        """Return the columns of ``scenario``; the snapshot's own are left untouched."""
+        missing = set(scenario.formulas.values()) - self.resolved
+        if missing:
+            self.compiled.update(formulas.get_compiled_many(missing))
+            self.resolved.update(missing)
+        columns = dict(self.columns)
+        overrides = scenario.overrides(self)
+        columns.update(overrides)
+
+        changed = set(overrides)
+        for variable, _, _, _ in payroll.STEPS:
+            formula_column = f'{variable}_formula'
+            if formula_column in changed or any(
+                changed.intersection(formula.names) for formula in payroll.step_formulas(columns, variable, self.compiled)
+            ):
+                columns[variable] = payroll.evaluate_column(
+                    variable, columns[formula_column], columns, self.size, self.compiled,
+                )
+                changed.add(variable)
+        return columns
+
+    def aggregate(self, columns):
+        """``{group: {'headcount', *METRICS}}`` summed over ``columns``."""
+        totals = {}
+        keys = zip(*(columns[field] for field in self.group_by)) if self.group_by else [()] * self.size
+        metrics = [columns[metric] for metric in METRICS]
+        for index, key in enumerate(keys):
+            group = totals.get(key)
+            if group is None:
+                group = totals[key] = {'headcount': 0, **dict.fromkeys(METRICS, Decimal(0))}
+            group['headcount'] += 1
+            for metric, values in zip(METRICS, metrics):
+                group[metric] += values[index]
+        return totals
+
+    def compare(self, scenario):
+        """Per-group totals of ``scenario`` with their deltas from the baseline, plus the overall total."""
+        totals = self.aggregate(self.apply(scenario))
+        groups = []
+        overall = {'headcount': 0, **{key: Decimal(0) for metric in METRICS for key in (metric, f'{metric}_delta')}}
+        for key in sorted(totals, key=lambda key: tuple((value is None, value) for value in key)):
+            row = dict(zip(self.group_names, key), headcount=totals[key]['headcount'])
+            overall['headcount'] += row['headcount']
+            for metric in METRICS:
+                value = totals[key][metric]
+                delta = value - self.baseline[key][metric]
+                row[metric], row[f'{metric}_delta'] = value, delta
+                overall[metric] += value
+                overall[f'{metric}_delta'] += delta
+            groups.append(row)
+        return {'scenario': scenario.name, 'total': overall, 'groups': groups}
+
+
+def compare(scenarios, employees=None, as_of=None, group_by=('company', 'department')):
+    """Evaluate every scenario against one snapshot of ``employees``."""
+    formula_ids = {formula_id for scenario in scenarios for formula_id in scenario.formulas.values()}
+    snapshot = Snapshot(employees, as_of, group_by, formula_ids)
+    return [snapshot.compare(scenario) for scenario in scenarios]
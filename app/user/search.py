@@ -0,0 +1,295 @@
+"""
+Employee and user account search.
+
+Every employee and user account has a ``SearchEntry`` with the words it
+is found by: the employee's name, or the account's name, email and
+contact. Saves and deletes keep entries in step (see ``user.signals``)
+and employee imports index their rows; run ``rebuild`` (``manage.py
+rebuild_search_index``) after other bulk changes, which send no signals.
+
+``search`` requires each word of the query to match a word of the entry
+exactly, as a prefix ("kha" finds Khan) or, for alphabetic words of
+``FUZZY_MIN_LENGTH`` letters or more, with one typo; or to start a word
+of the entry's company, department or designation name, matched in the
+lookup cache. Each word scores 3 for an exact match, 2 for a prefix and
+1 for a typo or org name; the best total comes first.
+
+On PostgreSQL with pg_trgm words are matched with expression GIN indexes
+on ``SearchEntry.text`` (migration 0009): a 'simple' tsvector for exact
+and prefix matches, pg_trgm word similarity for typos.
+
+Elsewhere, PostgreSQL without pg_trgm included (see ``user.extensions``),
+``SearchTerm`` is an inverted index of the words, where a
+prefix is one index range, and ``SearchVariant`` finds the words within
+one typo. Words matching at most ``RANK_LIMIT`` entries are looked up
+first and the other words checked against those candidates only, which
+are then ranked in Python. When every word matches more entries than
+that (type-ahead after one or two letters), the first matches by name
+are returned unranked instead.
+"""
+
+import operator
+import re
+from functools import reduce
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import BooleanField, Case, Exists, OuterRef, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from . import extensions, lookups
+from .models import Company, Department, Designation, Employee, SearchEntry, SearchTerm, SearchVariant
+
+
+WORD = re.compile(r'\w+')
+
+MAX_WORD_LENGTH = SearchTerm._meta.get_field('term').max_length
+
+# Shorter words, and words with digits, match exactly or as a prefix only
+FUZZY_MIN_LENGTH = 4
+
+# Words of a query beyond this are ignored
+MAX_QUERY_WORDS = 6
+
+# Most matches of a word that are ranked; see the module docstring
+RANK_LIMIT = 2000
+
+# Sorts after any word character, closing a prefix range
+PREFIX_END = '\U0010ffff'
+
+# Lookup models matched by name -> SearchEntry field
+ORG_FIELDS = {
+    Company: 'company_id',
+    Department: 'department_id',
+    Designation: 'designation_id',
+}
+
+# Entries written per batch
+BATCH_SIZE = 2000
+
+
+def words(text):
+    return [word[:MAX_WORD_LENGTH] for word in WORD.findall(str(text).casefold())]
+
+
+def fuzzy(word):
+    return len(word) >= FUZZY_MIN_LENGTH and word.isalpha()
+
+
+def variants(word):
+    """``word`` and each spelling of it with one letter deleted."""
+    return {word, *(word[:index] + word[index + 1:] for index in range(len(word)))}
+
+
+def _uses_terms():
+    return not extensions.installed(connection, extensions.TRIGRAM)
+
+
+def employee_entry(employee):
+    return SearchEntry(
+        kind=SearchEntry.EMPLOYEE,
+        object_id=employee.pk,
+        name=employee.fullname,
+        text=' '.join(words(employee.fullname)),
+        company_id=employee.company_name_id,
+        department_id=employee.department_id,
+        designation_id=employee.designation_id,
+        location_id=employee.location_id,
+    )
+
+
+def user_entry(user):
+    return SearchEntry(
+        kind=SearchEntry.USER,
+        object_id=user.pk,
+        name=user.full_name,
+        email=user.email,
+        text=' '.join(words(f'{user.full_name} {user.email} {user.contact or ""}')),
+    )
+
+
+@transaction.atomic
+def store(kind, entries):
+    """Replace the entries of kind ``kind`` for the objects of ``entries`` (unsaved SearchEntry rows)."""
+    SearchEntry.objects.filter(kind=kind, object_id__in=[entry.object_id for entry in entries]).delete()
+    SearchEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+    if not _uses_terms():
+        return
+    if any(entry.pk is None for entry in entries):
+        # Backends that return no ids from bulk inserts
+        ids = dict(
+            SearchEntry.objects.filter(kind=kind, object_id__in=[entry.object_id for entry in entries])
+            .values_list('object_id', 'pk')
+        )
+        for entry in entries:
+            entry.pk = ids[entry.object_id]
+    SearchTerm.objects.bulk_create(
+        (SearchTerm(term=term, entry_id=entry.pk) for entry in entries for term in set(entry.text.split())),
+        batch_size=BATCH_SIZE * 5,
+    )
+    new_words = {term for entry in entries for term in entry.text.split() if fuzzy(term)}
+    if new_words:
+        SearchVariant.objects.bulk_create(
+            (SearchVariant(variant=variant, term=term) for term in new_words for variant in variants(term)),
+            batch_size=BATCH_SIZE * 5,
+            ignore_conflicts=True,
+        )
+
+
+def index_employees(employees):
+    store(SearchEntry.EMPLOYEE, [employee_entry(employee) for employee in employees])
+
+
+def index_users(users):
+    store(SearchEntry.USER, [user_entry(user) for user in users])
+
+
+def remove(kind, object_ids):
+    SearchEntry.objects.filter(kind=kind, object_id__in=object_ids).delete()
+
+
+def instance_changed(employee, created):
+    changed = None if created else employee.changed_fields()
+    if changed is None or changed.intersection(
+        {'fullname', 'company_name_id', 'department_id', 'designation_id', 'location_id'}
+    ):
+        index_employees([employee])
+
+
+def rebuild():
+    """Recreate every entry. Returns the number of entries."""
+    count = 0
+    with transaction.atomic():
+        SearchTerm.objects.all().delete()
+        SearchVariant.objects.all().delete()
+        SearchEntry.objects.all().delete()
+        for model, index in ((Employee, index_employees), (get_user_model(), index_users)):
+            last = 0
+            while batch := list(model.objects.filter(pk__gt=last).order_by('pk')[:BATCH_SIZE]):
+                index(batch)
+                count += len(batch)
+                last = batch[-1].pk
+    return count
+
+
+def _org_match(word):
+    """Condition for entries whose company, department or designation has a word starting with ``word``."""
+    conditions = []
+    for model, field in ORG_FIELDS.items():
+        name_field = lookups.LOOKUP_MODELS[model]
+        ids = [
+            obj.pk for obj in lookups.get_cache(model).all()
+            if any(name_word.startswith(word) for name_word in words(getattr(obj, name_field)))
+        ]
+        if ids:
+            conditions.append(Q(**{f'{field}__in': ids}))
+    return reduce(operator.or_, conditions) if conditions else None
+
+
+def _term_match(word):
+    condition = Q(term__gte=word, term__lt=word + PREFIX_END)
+    if fuzzy(word):
+        similar = SearchVariant.objects.filter(variant__in=variants(word)).values('term')
+        condition |= Q(term__in=similar)
+    return condition
+
+
+def _word_scores(word, entry_ids=None, limit=None):
+    """
+    Map the ids of the entries with a word matching ``word`` to its best
+    score, among ``entry_ids`` if given. None when more than ``limit`` match.
+    """
+    rows = SearchTerm.objects.filter(_term_match(word))
+    if entry_ids is not None:
+        rows = rows.filter(entry_id__in=entry_ids)
+    rows = rows.values_list('entry_id', 'term')
+    if limit is not None:
+        rows = rows[:limit + 1]
+    scores = {}
+    for entry_id, term in rows:
+        points = 3 if term == word else 2 if term.startswith(word) else 1
+        if points > scores.get(entry_id, 0):
+            scores[entry_id] = points
+    if limit is not None and len(rows) > limit:
+        return None
+    return scores
+
+
+def _word_and_org_scores(word, org, entries, entry_ids):
+    scores = _word_scores(word, entry_ids=entry_ids)
+    if org is not None:
+        for pk in entries.filter(org, pk__in=entry_ids).values_list('pk', flat=True):
+            scores.setdefault(pk, 1)
+    return scores
+
+
+def _search_terms(query_words, entries, limit):
+    ranked, unranked = [], []
+    for word in query_words:
+        org = _org_match(word)
+        scores = None if org is not None else _word_scores(word, limit=RANK_LIMIT)
+        if scores is None:
+            unranked.append((word, org))
+        else:
+            ranked.append(scores)
+
+    if ranked:
+        totals = dict(ranked[0])
+        for scores in ranked[1:]:
+            totals = {pk: points + scores[pk] for pk, points in totals.items() if pk in scores}
+        for word, org in unranked:
+            scores = _word_and_org_scores(word, org, entries, list(totals))
+            totals = {pk: points + scores[pk] for pk, points in totals.items() if pk in scores}
+        results = list(entries.filter(pk__in=list(totals)))
+        results.sort(key=lambda entry: (-totals[entry.pk], entry.name, entry.pk))
+        results = results[:limit]
+    else:
+        for word, org in unranked:
+            condition = Exists(SearchTerm.objects.filter(_term_match(word), entry=OuterRef('pk')))
+            entries = entries.filter(condition | org if org is not None else condition)
+        results = list(entries.order_by('name', 'pk')[:limit])
+        totals = dict.fromkeys((entry.pk for entry in results), 0)
+        for word, org in unranked:
+            scores = _word_and_org_scores(word, org, entries, list(totals))
+            totals = {pk: points + scores[pk] for pk, points in totals.items()}
+
+    for entry in results:
+        entry.score = totals[entry.pk]
+    return results
+
+
+def _search_indexes(query_words, entries, limit):
+    # Words hold only \w characters, so they need no quoting inside a tsquery
+    text = f'"{SearchEntry._meta.db_table}"."text"'
+    score = Value(0)
+    for word in query_words:
+        matches = [
+            (3, RawSQL(f"to_tsvector('simple', {text}) @@ to_tsquery('simple', %s)", [f"'{word}'"], BooleanField())),
+            (2, RawSQL(f"to_tsvector('simple', {text}) @@ to_tsquery('simple', %s)", [f"'{word}':*"], BooleanField())),
+        ]
+        if fuzzy(word):
+            matches.append((1, RawSQL(f"%s <%% {text}", [word], BooleanField())))
+        org = _org_match(word)
+        if org is not None:
+            matches.append((1, org))
+        entries = entries.filter(reduce(operator.or_, (condition for _, condition in matches)))
+        score = score + Case(*(When(condition, then=Value(points)) for points, condition in matches), default=Value(0))
+    return list(entries.annotate(score=score).order_by('-score', 'name', 'pk')[:limit])
+
+
+def search(query, company=None, location=None, kind=None, limit=20):
+    """The ``limit`` best entries matching every word of ``query``, each with a ``score``."""
+    query_words = list(dict.fromkeys(words(query)))[:MAX_QUERY_WORDS]
+    if not query_words:
+        return []
+
+    entries = SearchEntry.objects.all()
+    if kind:
+        entries = entries.filter(kind=kind)
+    if company:
+        entries = entries.filter(company_id=company)
+    if location:
+        entries = entries.filter(location_id=location)
+    if _uses_terms():
+        return _search_terms(query_words, entries, limit)
+    return _search_indexes(query_words, entries, limit)
@@ -0,0 +1,244 @@
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.urls import reverse
+from rest_framework import serializers
+
+from . import formulas, images, lookups, payroll, payroll_runs, provisioning
+from .models import (
+    Company, Department, Designation, EmployeeStatus, Formula, Location, PayrollRun, PayrollRunChunk, PayrollSummary,
+    SearchEntry,
+)
+from .scenarios import FIELDS as SCENARIO_FIELDS, STEP_VARIABLES
+
+
+class LookupField(serializers.Field):
+    """
+    Foreign key to a lookup model, resolved through ``user.lookups``.
+
+    Represented as ``{"id": ..., "name": ...}``; accepts an id or a name.
+    Use with ``source='<fk>_id'`` so reading never touches the related row.
+    """
+
+    default_error_messages = {
+        'does_not_exist': "Unknown {model} {value!r}.",
+    }
+
+    def __init__(self, model, **kwargs):
+        self.model = model
+        super().__init__(**kwargs)
+
+    def to_representation(self, pk):
+        obj = lookups.get(self.model, pk)
+        name = getattr(obj, lookups.LOOKUP_MODELS[self.model]) if obj is not None else None
+        return {'id': pk, 'name': name}
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict):
+            data = data.get('id', data.get('name'))
+        if isinstance(data, int) or (isinstance(data, str) and data.isdigit()):
+            obj = lookups.get(self.model, int(data))
+            pk = obj.pk if obj is not None else None
+        else:
+            pk = lookups.get_id(self.model, data)
+        if pk is None:
+            self.fail('does_not_exist', model=self.model._meta.verbose_name, value=data)
+        return pk
+
+
+def _decimal(value):
+    return None if value is None else str(value)
+
+
+def _name(obj, field):
+    return {'id': obj.pk, 'name': getattr(obj, field)}
+
+
+class EmployeeReadSerializer(serializers.BaseSerializer):
+    """
+    Read-only representation of an Employee with its lookups and packages.
+
+    Builds the dict directly instead of going through one serializer field
+    per attribute. Expects the lookups to be loaded (``select_related`` or
+    ``with_cached_lookups``) and the three packages prefetched.
+    """
+
+    def to_representation(self, employee):
+        current = getattr(employee, 'currentpackagedetails', None)
+        proposed = getattr(employee, 'proposedpackagedetails', None)
+        impact = getattr(employee, 'finalimpactpermonth', None)
+        return {
+            'emp_id': employee.emp_id,
+            'fullname': employee.fullname,
+            'company': _name(employee.company_name, 'name'),
+            'designation': _name(employee.designation, 'title'),
+            'department': _name(employee.department, 'name'),
+            'section': _name(employee.section, 'name'),
+            'location': _name(employee.location, 'location'),
+            'date_of_joining': employee.date_of_joining.isoformat(),
+            'manager': employee.manager_id,
+            'remarks': employee.remarks,
+            'image': employee.image.name or None,
+            # Smallest thumbnail, for lists; see EmployeeImageView
+            'thumbnail': (
+                f"{reverse('employee-image', args=[employee.pk])}?size={min(images.thumbnail_sizes())}"
+                if employee.image else None
+            ),
+            'current_package': current and {
+                'gross_salary': _decimal(current.gross_salary),
+                'vehicle': _decimal(current.vehicle),
+                'fuel_limit': _decimal(current.fuel_limit),
+                'mobile_allowance': _decimal(current.mobile_allowance),
+            },
+            'proposed_package': proposed and {
+                'increment_percentage': _decimal(proposed.increment_percentage),
+                'increased_fuel_amount': _decimal(proposed.increased_fuel_amount),
+                'mobile_allowance': _decimal(proposed.mobile_allowance),
+                'vehicle': _decimal(proposed.vehicle),
+            },
+            'final_impact': impact and {
+                'emp_status_id': impact.emp_status_id,
+                'serving_years': impact.serving_years,
+                'salary': _decimal(impact.salary),
+                'fuel': _decimal(impact.fuel),
+                'gratuity': _decimal(impact.gratuity_amount),
+                'bonus': _decimal(impact.bonus_amount),
+                'leave_encashment': _decimal(impact.leave_encashment_amount),
+                'mobile_allowance': _decimal(impact.mobile_allowance_amount),
+                'total': _decimal(impact.total_amount),
+                'is_stale': impact.is_stale,
+            },
+        }
+
+
+class PayrollSummarySerializer(serializers.ModelSerializer):
+    company = LookupField(Company, source='company_id', read_only=True)
+    department = LookupField(Department, source='department_id', read_only=True)
+    location = LookupField(Location, source='location_id', read_only=True)
+
+    class Meta:
+        model = PayrollSummary
+        fields = (
+            'company', 'department', 'location', 'headcount', 'total_gross_salary',
+            'total_revised_salary', 'total_impact', 'updated_at',
+        )
+
+
+class SearchResultSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='object_id', read_only=True)
+    company = LookupField(Company, source='company_id', read_only=True)
+    department = LookupField(Department, source='department_id', read_only=True)
+    designation = LookupField(Designation, source='designation_id', read_only=True)
+    location = LookupField(Location, source='location_id', read_only=True)
+    score = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = SearchEntry
+        fields = ('kind', 'id', 'name', 'email', 'company', 'department', 'designation', 'location', 'score')
+
+
+class PayrollRunChunkSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = PayrollRunChunk
+        fields = (
+            'index', 'first_emp_id', 'last_emp_id', 'employee_count', 'status',
+            'attempts', 'worker', 'error', 'started_at', 'finished_at', 'retry_at',
+        )
+
+
+class PayrollRunSerializer(serializers.ModelSerializer):
+    company = LookupField(Company, source='company_id')
+    emp_status = LookupField(EmployeeStatus, source='emp_status_id', required=False, allow_null=True)
+    chunk_size = serializers.IntegerField(write_only=True, required=False, min_value=1, max_value=50_000)
+
+    class Meta:
+        model = PayrollRun
+        fields = (
+            'id', 'company', 'emp_status', 'as_of', 'chunk_size', 'status', 'progress',
+            'total_chunks', 'completed_chunks', 'total_employees', 'processed_employees',
+            'error', 'created_at', 'started_at', 'finished_at',
+        )
+        read_only_fields = (
+            'status', 'progress', 'total_chunks', 'completed_chunks', 'total_employees',
+            'processed_employees', 'error', 'created_at', 'started_at', 'finished_at',
+        )
+        extra_kwargs = {'as_of': {'required': False}}
+
+    def create(self, validated_data):
+        return payroll_runs.create_run(
+            company=lookups.get(Company, validated_data['company_id']),
+            emp_status=lookups.get(EmployeeStatus, validated_data.get('emp_status_id')),
+            as_of=validated_data.get('as_of'),
+            chunk_size=validated_data.get('chunk_size'),
+        )
+
+
+class PayrollRunDetailSerializer(PayrollRunSerializer):
+    chunks = PayrollRunChunkSerializer(many=True, read_only=True)
+
+    class Meta(PayrollRunSerializer.Meta):
+        fields = PayrollRunSerializer.Meta.fields + ('chunks',)
+
+
+class ScenarioSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=100)
+    increment_percentage = serializers.DecimalField(max_digits=5, decimal_places=2, required=False, allow_null=True)
+    band_by = serializers.ChoiceField(choices=sorted(SCENARIO_FIELDS), default='designation')
+    bands = serializers.DictField(child=serializers.DecimalField(max_digits=5, decimal_places=2), required=False)
+    formulas = serializers.DictField(
+        child=serializers.PrimaryKeyRelatedField(queryset=Formula.objects.all()), required=False,
+    )
+
+    def validate_bands(self, bands):
+        if not all(key.isdigit() for key in bands):
+            raise serializers.ValidationError("Keys must be ids.")
+        return bands
+
+    def validate_formulas(self, value):
+        unknown = set(value) - STEP_VARIABLES
+        if unknown:
+            raise serializers.ValidationError(f"Unknown steps: {', '.join(sorted(unknown))}.")
+        for variable, formula in value.items():
+            try:
+                names = formulas.get_compiled(formula).names
+            except formulas.FormulaError as exc:
+                raise serializers.ValidationError({variable: str(exc)})
+            missing = set(names) - payroll.step_variables(variable)
+            if missing:
+                raise serializers.ValidationError(
+                    {variable: f"{formula.formula_name!r} reads unknown variables: {', '.join(sorted(missing))}."}
+                )
+        return value
+
+
+class ScenarioComparisonSerializer(serializers.Serializer):
+    scenarios = ScenarioSerializer(many=True, allow_empty=False, max_length=20)
+    group_by = serializers.ListField(
+        child=serializers.ChoiceField(choices=sorted(SCENARIO_FIELDS)), default=['company', 'department'],
+    )
+    company = LookupField(Company, required=False)
+    department = LookupField(Department, required=False)
+    as_of = serializers.DateField(required=False)
+
+    def validate_scenarios(self, value):
+        names = [scenario['name'] for scenario in value]
+        if len(set(names)) != len(names):
+            raise serializers.ValidationError("Scenario names must be unique.")
+        return value
+
+
+class InviteAcceptSerializer(serializers.Serializer):
+    uid = serializers.CharField()
+    token = serializers.CharField()
+    password = serializers.CharField(write_only=True, trim_whitespace=False)
+
+    def validate(self, data):
+        user = provisioning.check_invite(data['uid'], data['token'])
+        if user is None:
+            raise serializers.ValidationError("The invite is invalid or has already been used.")
+        try:
+            validate_password(data['password'], user)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError({'password': list(exc.messages)})
+        data['user'] = user
+        return data
@@ -0,0 +1,125 @@
+from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import dependencies, formulas, hierarchy, history, images, lookups, permissions, search, summaries
+from .models import CustomUser, Employee, Formula, ProposedPackageDetails, SearchEntry
+
+
+@receiver(post_save, sender=Formula)
+@receiver(post_delete, sender=Formula)
+def drop_compiled_formula(sender, instance, **kwargs):
+    formulas.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Formula)
+def formula_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        dependencies.formula_changed(instance, created)
+        instance.reset_loaded_values()
+
+
+@receiver(pre_delete, sender=Formula)
+def formula_deleted(sender, instance, **kwargs):
+    # Foreign keys are set to NULL before post_delete, so collect users now
+    dependencies.mark_stale(dependencies.formula_users(instance.pk))
+
+
+def payroll_input_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        dependencies.instance_changed(instance, created)
+        if sender in summaries.SUMMARY_FIELDS:
+            summaries.instance_changed(instance, created)
+        if sender in history.HISTORY_MODELS:
+            history.instance_changed(instance, created)
+        if sender is Employee:
+            images.instance_changed(instance, created)
+            hierarchy.instance_changed(instance, created)
+            search.instance_changed(instance, created)
+        instance.reset_loaded_values()
+
+
+for model in dependencies.TRACKED_MODELS:
+    post_save.connect(payroll_input_saved, sender=model, dispatch_uid=f'payroll_input_saved_{model.__name__}')
+
+
+@receiver(pre_save, sender=Employee)
+def employee_saving(sender, instance, raw=False, **kwargs):
+    if not raw:
+        changed = instance.changed_fields()
+        if changed is None or 'manager_id' in changed:
+            hierarchy.check_manager(instance)
+
+
+@receiver(pre_delete, sender=Employee)
+def employee_deleted(sender, instance, **kwargs):
+    hierarchy.employee_deleted(instance)
+    search.remove(SearchEntry.EMPLOYEE, [instance.pk])
+
+
+def summary_input_deleted(sender, instance, **kwargs):
+    summaries.instance_deleted(instance)
+
+
+for model in summaries.SUMMARY_FIELDS:
+    post_delete.connect(summary_input_deleted, sender=model, dispatch_uid=f'summary_input_deleted_{model.__name__}')
+
+
+@receiver(post_delete, sender=ProposedPackageDetails)
+def proposed_package_deleted(sender, instance, **kwargs):
+    dependencies.mark_stale([instance.employee_id])
+
+
+def package_deleted(sender, instance, **kwargs):
+    history.instance_deleted(instance)
+
+
+for model in history.HISTORY_MODELS:
+    post_delete.connect(package_deleted, sender=model, dispatch_uid=f'package_deleted_{model.__name__}')
+
+
+def lookup_changed(sender, **kwargs):
+    lookups.invalidate(sender)
+
+
+for model in lookups.LOOKUP_MODELS:
+    post_save.connect(lookup_changed, sender=model, dispatch_uid=f'lookup_saved_{model.__name__}')
+    post_delete.connect(lookup_changed, sender=model, dispatch_uid=f'lookup_deleted_{model.__name__}')
+
+
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+@receiver(post_delete, sender=Group)
+def permissions_changed(sender, **kwargs):
+    permissions.invalidate()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, action, **kwargs):
+    if action.startswith('post_'):
+        permissions.invalidate()
+
+
+def user_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action.startswith('post_'):
+        # From the group or permission side pk_set holds users, or is None on clear()
+        permissions.invalidate(pk_set if reverse else [instance.pk])
+
+
+for through in (CustomUser.groups.through, CustomUser.user_permissions.through):
+    m2m_changed.connect(user_permissions_changed, sender=through, dispatch_uid=f'user_permissions_changed_{through.__name__}')
+
+
+@receiver(post_save, sender=CustomUser)
+def user_saved(sender, instance, update_fields=None, raw=False, **kwargs):
+    # is_active and is_superuser are part of the snapshot; logins only touch last_login
+    if update_fields != frozenset({'last_login'}):
+        permissions.invalidate([instance.pk])
+        if not raw:
+            search.index_users([instance])
+
+
+@receiver(post_delete, sender=CustomUser)
+def user_deleted(sender, instance, **kwargs):
+    permissions.invalidate([instance.pk])
+    search.remove(SearchEntry.USER, [instance.pk])
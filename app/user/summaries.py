@@ -0,0 +1,151 @@
+"""
+Maintenance of ``PayrollSummary``, the per company x department x
+location totals used by dashboards and budget approvals.
+
+``refresh`` recomputes the given groups with one aggregate query and
+upserts the rows; groups that lost all employees are deleted. Saves of
+employees and packages call ``mark_employees`` (see ``user.signals``),
+which refreshes only the groups of those employees once the transaction
+commits.
+"""
+
+from decimal import Decimal
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import CurrentPackageDetails, Employee, FinalImpactPerMonth, PayrollSummary
+
+
+GROUP_FIELDS = ('company_name_id', 'department_id', 'location_id')
+
+# Groups refreshed per aggregate query
+CHUNK_SIZE = 200
+
+
+def _total(lookup):
+    return Coalesce(Sum(lookup), Value(Decimal(0)), output_field=DecimalField(max_digits=16, decimal_places=2))
+
+
+def totals():
+    """Aggregates of the summary columns over an Employee queryset."""
+    return {
+        'headcount': Count('emp_id'),
+        'total_gross_salary': _total('currentpackagedetails__gross_salary'),
+        'total_revised_salary': _total('finalimpactpermonth__salary'),
+        'total_impact': _total('finalimpactpermonth__total_amount'),
+    }
+
+
+def aggregate(employees):
+    return employees.order_by().values(*GROUP_FIELDS).annotate(**totals())
+
+
+def _upsert(rows):
+    summaries = [
+        PayrollSummary(
+            company_id=row['company_name_id'],
+            department_id=row['department_id'],
+            location_id=row['location_id'],
+            headcount=row['headcount'],
+            total_gross_salary=row['total_gross_salary'],
+            total_revised_salary=row['total_revised_salary'],
+            total_impact=row['total_impact'],
+        )
+        for row in rows
+    ]
+    PayrollSummary.objects.bulk_create(
+        summaries,
+        update_conflicts=True,
+        unique_fields=['company', 'department', 'location'],
+        update_fields=['headcount', 'total_gross_salary', 'total_revised_salary', 'total_impact', 'updated_at'],
+    )
+
+
+def _group_filter(groups, fields):
+    query = Q()
+    for group in groups:
+        query |= Q(**dict(zip(fields, group)))
+    return query
+
+
+@transaction.atomic
+def refresh(groups=None):
+    """
+    Recompute the summaries of ``groups`` (an iterable of
+    ``(company_id, department_id, location_id)``), or of every group when
+    ``groups`` is None. Returns the number of groups refreshed.
+    """
+    if groups is None:
+        rows = list(aggregate(Employee.objects.all()))
+        _upsert(rows)
+        present = {tuple(row[field] for field in GROUP_FIELDS) for row in rows}
+        stale = [
+            summary.pk for summary in PayrollSummary.objects.only('company_id', 'department_id', 'location_id')
+            if (summary.company_id, summary.department_id, summary.location_id) not in present
+        ]
+        PayrollSummary.objects.filter(pk__in=stale).delete()
+        return len(rows)
+
+    groups = list(set(groups))
+    for start in range(0, len(groups), CHUNK_SIZE):
+        chunk = groups[start:start + CHUNK_SIZE]
+        rows = list(aggregate(Employee.objects.filter(_group_filter(chunk, GROUP_FIELDS))))
+        _upsert(rows)
+        empty = set(chunk).difference(tuple(row[field] for field in GROUP_FIELDS) for row in rows)
+        if empty:
+            PayrollSummary.objects.filter(_group_filter(empty, ('company_id', 'department_id', 'location_id'))).delete()
+    return len(groups)
+
+
+def employee_groups(employees):
+    """Distinct groups of ``employees`` (ids or an Employee queryset)."""
+    return set(
+        Employee.objects.filter(pk__in=employees).order_by().values_list(*GROUP_FIELDS).distinct()
+    )
+
+
+def mark_groups(groups):
+    groups = set(groups)
+    if groups:
+        transaction.on_commit(partial(refresh, groups))
+
+
+def mark_employees(employees):
+    mark_groups(employee_groups(employees))
+
+
+# model -> attnames whose change affects the summary
+SUMMARY_FIELDS = {
+    Employee: set(GROUP_FIELDS),
+    CurrentPackageDetails: {'gross_salary', 'employee_id'},
+    FinalImpactPerMonth: {'salary', 'total_amount', 'employee_id'},
+}
+
+
+def instance_changed(instance, created):
+    model = type(instance)
+    changed = None if created else instance.changed_fields()
+    if changed is not None and not changed & SUMMARY_FIELDS[model]:
+        return
+
+    if model is Employee:
+        groups = {tuple(getattr(instance, field) for field in GROUP_FIELDS)}
+        loaded = getattr(instance, '_loaded_values', None)
+        if changed and loaded:
+            groups.add(tuple(loaded.get(field) for field in GROUP_FIELDS))
+        mark_groups(groups)
+    else:
+        employees = {instance.employee_id}
+        if changed and 'employee_id' in changed:
+            employees.add(instance._loaded_values['employee_id'])
+        mark_employees(employees)
+
+
+def instance_deleted(instance):
+    if isinstance(instance, Employee):
+        mark_groups([tuple(getattr(instance, field) for field in GROUP_FIELDS)])
+    else:
+        mark_employees([instance.employee_id])
@@ -1,3 +1,1345 @@
-from django.test import TestCase
+import base64
+import csv
+import datetime
+import io
+import tempfile
+import threading
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, identify_hasher
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import (
+    checks, exporters, formulas, hierarchy, history, images, importers, increments, instrumentation, lookups, payroll,
+    payroll_runs, permissions, projections, provisioning, routers, scenarios, search,
+)
+from .benchmarks import data
+from .models import (
+    Company, CurrentPackageDetails, CustomUser, Department, Employee, FinalImpactPerMonth, Formula, Gender,
+    IncrementChange, IncrementCycle, PackageHistory, PayrollRun, PayrollRunChunk, ProposedPackageDetails, ReportingLine,
+    SearchEntry, SearchTerm,
+)
 
 # Create your tests here.
+
+
+class EmployeeAPITests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        data.seed(employees=30, companies=2, departments=3, locations=2)
+        cls.user = CustomUser.objects.create(email='hr@example.com', full_name='HR', is_staff=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_query_count_is_constant(self):
+        # employees with lookups + the three prefetched packages
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('employee-list'), {'page_size': 5})
+        self.assertEqual(len(response.data['results']), 5)
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('employee-list'), {'page_size': 30})
+        self.assertEqual(len(response.data['results']), 30)
+
+    def test_cursor_walks_all_employees_in_order(self):
+        seen = []
+        url = reverse('employee-list') + '?page_size=7'
+        while url:
+            response = self.client.get(url)
+            seen.extend(row['emp_id'] for row in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, list(Employee.objects.order_by('emp_id').values_list('emp_id', flat=True)))
+
+    def test_filter_by_company(self):
+        company_id = Employee.objects.values_list('company_name_id', flat=True).first()
+        response = self.client.get(reverse('employee-list'), {'company': company_id, 'page_size': 100})
+        self.assertEqual(
+            len(response.data['results']),
+            Employee.objects.filter(company_name_id=company_id).count(),
+        )
+        self.assertEqual(self.client.get(reverse('employee-list'), {'company': 'x'}).status_code, 400)
+
+    def test_detail(self):
+        employee = Employee.objects.first()
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('employee-detail', args=[employee.pk]))
+        self.assertEqual(response.data['fullname'], employee.fullname)
+        self.assertEqual(
+            response.data['current_package']['gross_salary'],
+            str(employee.currentpackagedetails.gross_salary),
+        )
+
+    def test_requires_authentication(self):
+        self.assertIn(APIClient().get(reverse('employee-list')).status_code, (401, 403))
+
+
+class AdminChangelistQueryTests(TestCase):
+
+    changelists = (
+        'admin:user_employee_changelist',
+        'admin:user_currentpackagedetails_changelist',
+        'admin:user_proposedpackagedetails_changelist',
+        'admin:user_finalimpactpermonth_changelist',
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_superuser('admin@example.com', 'secret')
+
+    def query_counts(self):
+        counts = {}
+        for name in self.changelists:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            counts[name] = len(queries)
+        return counts
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.client.force_login(self.admin)
+        data.seed(employees=3, seed=1)
+        few = self.query_counts()
+        data.seed(employees=40, seed=2)
+        self.assertEqual(self.query_counts(), few)
+
+
+@override_settings(QUERY_INSTRUMENTATION='full', QUERY_INSTRUMENTATION_DUPLICATES=3, QUERY_INSTRUMENTATION_DB='')
+class QueryInstrumentationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        data.seed(employees=5, companies=1, departments=1, locations=1)
+
+    def test_reports_n_plus_1_with_origin(self):
+        def view(request):
+            # CurrentPackageDetails.__str__ loads the employee
+            return HttpResponse(', '.join(str(package) for package in CurrentPackageDetails.objects.all()))
+
+        instrumentation.QueryInstrumentationMiddleware(view)(RequestFactory().get('/'))
+        entry = instrumentation.recent()[-1]
+        self.assertEqual(entry['queries'], 6)
+        [(sql, count, origin)] = entry['duplicates']
+        self.assertEqual(count, 5)
+        self.assertTrue(origin.startswith('user/models.py:'))
+        self.assertTrue(origin.endswith('in __str__'))
+
+    def test_records_view_without_duplicates(self):
+        client = APIClient()
+        client.force_authenticate(CustomUser.objects.create(email='hr@example.com', full_name='HR', is_staff=True))
+        client.get(reverse('employee-list'))
+        entry = instrumentation.recent()[-1]
+        self.assertEqual((entry['method'], entry['view'], entry['status']), ('GET', 'employee-list', 200))
+        self.assertEqual(entry['queries'], 4)
+        self.assertEqual(entry['duplicates'], [])
+
+    def test_counts_only_the_queries_of_the_request(self):
+        def view(request):
+            Employee.objects.count()
+            # Another thread has its own context: not counted for this request
+            thread = threading.Thread(target=lambda: list(Company.objects.all()))
+            thread.start()
+            thread.join()
+            return HttpResponse()
+
+        instrumentation.QueryInstrumentationMiddleware(view)(RequestFactory().get('/'))
+        self.assertEqual(instrumentation.recent()[-1]['queries'], 1)
+        Employee.objects.count()
+        self.assertEqual(instrumentation.recent()[-1]['queries'], 1)
+
+    async def test_async_view_is_counted(self):
+        # The ORM runs on the connection of the sync thread, opened before any middleware:
+        # connection_created never fires for it, as it does for connections opened while serving
+        await sync_to_async(instrumentation.install)(connection)
+
+        async def view(request):
+            return HttpResponse()
+
+        # Wraps an async handler without a thread adapter
+        self.assertTrue(iscoroutinefunction(instrumentation.QueryInstrumentationMiddleware(view)))
+        user = await CustomUser.objects.acreate(email='hr@example.com', full_name='HR', is_staff=True)
+        await self.async_client.aforce_login(user)
+        employee = await Employee.objects.order_by('pk').afirst()
+        response = await self.async_client.get(reverse('async-employee', args=[employee.pk]))
+        self.assertEqual(response.status_code, 200)
+        entry = instrumentation.recent()[-1]
+        self.assertEqual((entry['view'], entry['status']), ('async-employee', 200))
+        self.assertGreater(entry['queries'], 0)
+
+    def test_sink_is_written_off_the_request_thread(self):
+        path = Path(self.enterContext(tempfile.TemporaryDirectory())) / 'queries.sqlite3'
+        self.addCleanup(setattr, instrumentation, '_writer', None)
+        writers = []
+        write = instrumentation.SQLiteSink.write
+
+        def recording_write(sink, records):
+            writers.append(threading.current_thread().name)
+            return write(sink, records)
+
+        with override_settings(QUERY_INSTRUMENTATION_DB=str(path), QUERY_INSTRUMENTATION_BATCH=1), \
+                mock.patch.object(instrumentation.SQLiteSink, 'write', recording_write):
+            instrumentation.QueryInstrumentationMiddleware(lambda request: HttpResponse())(RequestFactory().get('/'))
+            instrumentation._writer.shutdown(wait=True)
+            self.assertEqual(len(instrumentation.sink().read()), 1)
+        self.assertEqual(len(writers), 1)
+        self.assertTrue(writers[0].startswith('query-instrumentation'))
+
+
+class ReportingLineTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        data.seed(employees=8, companies=1, departments=2, locations=1)
+        cls.vp, cls.head, cls.lead, cls.dev, cls.other, *_ = Employee.objects.order_by('pk')
+
+    def set_manager(self, employee, manager):
+        employee.refresh_from_db()
+        employee.manager = manager
+        employee.save()
+
+    def lines(self):
+        return set(ReportingLine.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+
+    def test_moves_keep_closure_in_step(self):
+        self.set_manager(self.lead, self.head)
+        self.set_manager(self.dev, self.lead)
+        self.set_manager(self.head, self.vp)
+        vp, head, lead, dev = self.vp.pk, self.head.pk, self.lead.pk, self.dev.pk
+        self.assertEqual(self.lines(), {
+            (head, lead, 1), (lead, dev, 1), (head, dev, 2), (vp, head, 1), (vp, lead, 2), (vp, dev, 3),
+        })
+        self.assertEqual(set(hierarchy.under(self.vp).values_list('pk', flat=True)), {head, lead, dev})
+
+        # The lead and their report move to another manager
+        self.set_manager(self.lead, self.other)
+        self.assertEqual(self.lines(), {(vp, head, 1), (self.other.pk, lead, 1), (lead, dev, 1), (self.other.pk, dev, 2)})
+        self.assertEqual(hierarchy.rebuild(), 4)
+        self.assertEqual(self.lines(), {(vp, head, 1), (self.other.pk, lead, 1), (lead, dev, 1), (self.other.pk, dev, 2)})
+
+    def test_rejects_loops_and_detaches_on_delete(self):
+        self.set_manager(self.head, self.vp)
+        self.set_manager(self.lead, self.head)
+        with self.assertRaises(ValueError):
+            self.set_manager(self.vp, self.lead)
+
+        self.head.delete()
+        self.lead.refresh_from_db()
+        self.assertIsNone(self.lead.manager_id)
+        self.assertEqual(self.lines(), set())
+
+    def test_cost_under_manager_is_one_query(self):
+        for employee in (self.head, self.lead, self.dev):
+            self.set_manager(employee, self.vp)
+        client = APIClient()
+        client.force_authenticate(CustomUser.objects.create(email='hr@example.com', full_name='HR', is_staff=True))
+        with self.assertNumQueries(1):
+            response = client.get(reverse('org-cost'), {'under': self.vp.pk, 'group_by': 'department'})
+        self.assertEqual(sum(row['headcount'] for row in response.data), 3)
+        expected = sum(
+            CurrentPackageDetails.objects.filter(employee__in=[self.head, self.lead, self.dev])
+            .values_list('gross_salary', flat=True)
+        )
+        self.assertEqual(sum(Decimal(row['total_gross_salary']) for row in response.data), expected)
+
+
+class ReplicaRouterTests(TestCase):
+
+    def test_reads_use_replica_only_when_configured_and_requested(self):
+        router = routers.ReplicaRouter()
+        with mock.patch.dict(settings.DATABASES, {routers.REPLICA: {}}):
+            self.assertIsNone(router.db_for_read(Employee))
+            with routers.on_replica():
+                self.assertEqual(router.db_for_read(Employee), routers.REPLICA)
+                self.assertIsNone(router.db_for_write(Employee))
+            self.assertIsNone(router.db_for_read(Employee))
+        with routers.on_replica():
+            self.assertIsNone(router.db_for_read(Employee))
+        self.assertFalse(router.allow_migrate(routers.REPLICA, 'user'))
+
+
+class PermissionSnapshotTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        data.seed(employees=5, companies=1, departments=1, locations=1)
+        cls.group = Group.objects.create(name='HR')
+        cls.view_employee = Permission.objects.get(codename='view_employee')
+        cls.users = [
+            CustomUser.objects.create(email=f'user{index}@example.com', full_name='User', contact=str(index))
+            for index in range(3)
+        ]
+        for user in cls.users[:2]:
+            user.groups.add(cls.group)
+
+    def setUp(self):
+        # Snapshots cached by earlier tests outlive their rolled back transactions
+        permissions.invalidate()
+
+    def fresh(self, user):
+        # A new instance, as each request loads
+        return CustomUser.objects.get(pk=user.pk)
+
+    def test_checks_cost_no_queries_once_cached(self):
+        self.assertFalse(self.fresh(self.users[0]).has_perm('user.view_employee'))
+        user = self.fresh(self.users[0])
+        with self.assertNumQueries(0):
+            self.assertFalse(user.has_perm('user.view_employee'))
+        self.assertTrue(permissions.in_group(self.users[0], 'HR'))
+
+        self.group.permissions.add(self.view_employee)
+        user = self.fresh(self.users[0])
+        with self.assertNumQueries(2):
+            self.assertTrue(user.has_perm('user.view_employee'))
+        self.users[0].groups.remove(self.group)
+        self.assertFalse(self.fresh(self.users[0]).has_perm('user.view_employee'))
+
+    def test_batched_check(self):
+        self.group.permissions.add(self.view_employee)
+        superuser = CustomUser.objects.create(email='root@example.com', full_name='Root', is_superuser=True)
+        inactive = CustomUser.objects.create(email='gone@example.com', full_name='Gone', is_active=False)
+        users = [*self.users, superuser, inactive]
+        expected = {self.users[0].pk: True, self.users[1].pk: True, self.users[2].pk: False, superuser.pk: True, inactive.pk: False}
+        with self.assertNumQueries(2):
+            self.assertEqual(permissions.has_perms(users, ['user.view_employee']), expected)
+        with self.assertNumQueries(0):
+            self.assertEqual(permissions.has_perms(users, ['user.view_employee']), expected)
+
+    @override_settings(API_MODEL_PERMISSIONS=True)
+    def test_api_requires_model_permission(self):
+        client = APIClient()
+        client.force_authenticate(self.fresh(self.users[0]))
+        self.assertEqual(client.get(reverse('employee-list')).status_code, 403)
+
+        self.group.permissions.add(self.view_employee)
+        for queries in (6, 4):
+            # A new user instance per request, as a session or token login loads
+            client.force_authenticate(self.fresh(self.users[0]))
+            # Once cached, only the employee queries, as without permission checks
+            with self.assertNumQueries(queries):
+                self.assertEqual(client.get(reverse('employee-list')).status_code, 200)
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        data.seed(employees=20, companies=2, departments=2, locations=2)
+        search.rebuild()
+        cls.khan = Employee.objects.first()
+        cls.khan.fullname = 'Imran Khan'
+        cls.khan.save()
+        cls.user = CustomUser.objects.create(
+            email='sara.malik@example.com', full_name='Sara Malik', contact='03001234567', is_staff=True,
+        )
+
+    def names(self, query, **filters):
+        return [entry.name for entry in search.search(query, **filters)]
+
+    def test_prefix_typo_and_org_matches(self):
+        self.assertEqual(self.names('kha'), ['Imran Khan'])
+        self.assertEqual(self.names('imran kahn'), ['Imran Khan'])
+        self.assertEqual(self.names('malik@exam'), ['Sara Malik'])
+        self.assertEqual(self.names('0300'), ['Sara Malik'])
+
+        department = Department.objects.get(pk=self.khan.department_id)
+        self.assertIn('Imran Khan', self.names(f'khan {department.name}'))
+        other = Company.objects.exclude(pk=self.khan.company_name_id).first()
+        self.assertEqual(self.names('khan', company=other.pk), [])
+        self.assertEqual(self.names('khan', company=self.khan.company_name_id), ['Imran Khan'])
+
+    def test_exact_words_rank_first_and_changes_are_indexed(self):
+        other = Employee.objects.exclude(pk=self.khan.pk).first()
+        other.fullname = 'Khanum Ali'
+        other.save()
+        self.assertEqual(self.names('khan'), ['Imran Khan', 'Khanum Ali'])
+        with mock.patch.object(search, 'RANK_LIMIT', 1):
+            # Too many matches to rank: the first by name
+            results = search.search('kha', limit=1)
+        self.assertEqual([(entry.name, entry.score) for entry in results], [('Imran Khan', 2)])
+
+        self.khan.fullname = 'Imran Qureshi'
+        self.khan.save()
+        self.assertEqual(self.names('khan'), ['Khanum Ali'])
+        self.khan.delete()
+        self.user.delete()
+        self.assertFalse(SearchEntry.objects.filter(name__in=['Imran Qureshi', 'Sara Malik']).exists())
+
+    def test_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(reverse('search'), {'q': 'kha', 'kind': 'employee'})
+        [result] = response.data
+        self.assertEqual((result['kind'], result['id'], result['score']), ('employee', self.khan.pk, 2))
+        self.assertEqual(result['company']['id'], self.khan.company_name_id)
+        self.assertEqual(client.get(reverse('search'), {'q': 'kha', 'kind': 'x'}).status_code, 400)
+
+    def test_user_accounts_need_staff_or_permission(self):
+        viewer = CustomUser.objects.create(email='viewer@example.com', full_name='Viewer')
+        client = APIClient()
+        client.force_authenticate(viewer)
+        self.assertEqual(client.get(reverse('search'), {'q': 'sara', 'kind': 'user'}).status_code, 403)
+        # Without a kind, only employees
+        self.assertEqual(client.get(reverse('search'), {'q': 'sara'}).data, [])
+
+        viewer.user_permissions.add(Permission.objects.get(codename='view_customuser'))
+        client.force_authenticate(CustomUser.objects.get(pk=viewer.pk))
+        [result] = client.get(reverse('search'), {'q': 'sara', 'kind': 'user'}).data
+        self.assertEqual((result['kind'], result['id']), ('user', self.user.pk))
+
+    def test_terms_are_used_without_pg_trgm(self):
+        with mock.patch.object(search.extensions, 'installed', return_value=False) as installed:
+            self.assertTrue(search._uses_terms())
+            installed.return_value = True
+            self.assertFalse(search._uses_terms())
+        installed.assert_called_with(connection, search.extensions.TRIGRAM)
+        # SQLite, or PostgreSQL without pg_trgm: the portable index is written and searched
+        self.assertEqual(SearchTerm.objects.exists(), search._uses_terms())
+        self.assertEqual(self.names('imran kahn'), ['Imran Khan'])
+
+
+class IncrementCycleTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        data.seed(employees=7, companies=1, departments=1, locations=1)
+
+    def packages(self):
+        return {
+            row[0]: row[1:] for row in CurrentPackageDetails.objects.values_list(
+                'employee_id', *increments.APPLIED_FIELDS,
+            )
+        }
+
+    def test_dry_run_then_apply_in_chunks(self):
+        before = self.packages()
+        effective = datetime.date(2026, 7, 1)
+        preview = increments.apply_cycle(effective_date=effective, dry_run=True)
+        self.assertEqual(self.packages(), before)
+        self.assertFalse(IncrementCycle.objects.exists())
+        self.assertEqual((preview['employees'], preview['changed']), (7, 7))
+        expected = {row['employee_id']: row['changes'] for row in preview['diff']}
+        self.assertGreater(preview['totals']['gross_salary'], 0)
+
+        result = increments.apply_cycle(effective_date=effective, chunk_size=3)
+        after = self.packages()
+        for employee_id, changes in expected.items():
+            package = dict(zip(increments.APPLIED_FIELDS, after[employee_id]))
+            for field, (_, new) in changes.items():
+                self.assertEqual(package[field], new)
+            self.assertEqual(history.package_as_of(employee_id, effective).gross_salary, package['gross_salary'])
+        cycle = IncrementCycle.objects.get(pk=result['cycle'])
+        self.assertEqual((cycle.status, cycle.changed_employees), (IncrementCycle.APPLIED, 7))
+        self.assertEqual(IncrementChange.objects.filter(cycle=cycle).count(), 7)
+
+        self.assertEqual(FinalImpactPerMonth.objects.filter(is_stale=True).count(), 7)
+        payroll.recompute_stale()
+        impact = FinalImpactPerMonth.objects.get(is_stale=False, employee_id=next(iter(expected)))
+        employee = Employee.objects.select_related(
+            'currentpackagedetails', 'proposedpackagedetails', 'finalimpactpermonth',
+        ).get(pk=impact.employee_id)
+        self.assertEqual(payroll.compute_employee(employee).salary, impact.salary)
+
+    def test_rollback_leaves_later_changes_alone(self):
+        before = self.packages()
+        history_rows = PackageHistory.objects.count()
+        cycle = IncrementCycle.objects.get(pk=increments.apply_cycle(chunk_size=4)['cycle'])
+        edited = CurrentPackageDetails.objects.order_by('employee_id').first()
+        edited.gross_salary = Decimal('1.00')
+        edited.save()
+
+        self.assertEqual(increments.rollback_cycle(cycle, chunk_size=4), {'restored': 6, 'skipped': 1})
+        after = self.packages()
+        self.assertEqual(after.pop(edited.employee_id)[0], Decimal('1.00'))
+        self.assertEqual(after, {pk: values for pk, values in before.items() if pk != edited.employee_id})
+        self.assertEqual(PackageHistory.objects.count(), history_rows + 7 + 1 + 6)
+        cycle.refresh_from_db()
+        self.assertEqual(cycle.status, IncrementCycle.ROLLED_BACK)
+        with self.assertRaises(ValueError):
+            increments.rollback_cycle(cycle)
+
+    def proposals(self):
+        return {
+            row[0]: row[1:] for row in ProposedPackageDetails.objects.values_list(
+                'employee_id', *increments.CONSUMED_FIELDS,
+            )
+        }
+
+    def test_second_apply_does_not_reapply_proposals(self):
+        company = Company.objects.get()
+        proposals = self.proposals()
+        first = IncrementCycle.objects.get(pk=increments.apply_cycle(company=company)['cycle'])
+        self.assertEqual(first.changed_employees, 7)
+        applied = self.packages()
+        self.assertEqual(set(self.proposals().values()), {tuple(increments.CONSUMED_FIELDS.values())})
+
+        second = increments.apply_cycle()
+        self.assertEqual(second['changed'], 0)
+        self.assertEqual(self.packages(), applied)
+        self.assertEqual(IncrementCycle.objects.get(pk=second['cycle']).status, IncrementCycle.APPLIED)
+
+        increments.rollback_cycle(first)
+        self.assertEqual(self.proposals(), proposals)
+        self.assertEqual(increments.apply_cycle(company=company)['changed'], 7)
+        self.assertEqual(self.packages(), applied)
+
+    def test_failed_cycle_blocks_until_rolled_back(self):
+        company = Company.objects.get()
+        first = IncrementCycle.objects.get(pk=increments.apply_cycle(company=company)['cycle'])
+        IncrementCycle.objects.filter(pk=first.pk).update(status=IncrementCycle.FAILED)
+        for other in (company, None):
+            with self.assertRaisesMessage(ValueError, f'Increment cycle {first.pk} is failed'):
+                increments.apply_cycle(company=other)
+        with self.assertRaisesMessage(CommandError, 'roll it back first'):
+            call_command('apply_increments', stdout=io.StringIO())
+        self.assertEqual(IncrementCycle.objects.count(), 1)
+        # A dry run writes nothing, so it is allowed
+        self.assertEqual(increments.apply_cycle(dry_run=True)['employees'], 7)
+
+        increments.rollback_cycle(first)
+        self.assertEqual(increments.apply_cycle()['changed'], 7)
+
+    def test_stale_applying_cycle_needs_force_to_roll_back(self):
+        before, proposals = self.packages(), self.proposals()
+        apply_chunk = increments._apply_chunk
+        calls = []
+
+        def killed_on_third_chunk(*args):
+            calls.append(args)
+            if len(calls) == 3:
+                raise SystemExit
+            return apply_chunk(*args)
+
+        with mock.patch.object(increments, '_apply_chunk', side_effect=killed_on_third_chunk):
+            with self.assertRaises(SystemExit):
+                increments.apply_cycle(chunk_size=3)
+        cycle = IncrementCycle.objects.get()
+        self.assertEqual((cycle.status, cycle.changes.count()), (IncrementCycle.APPLYING, 6))
+        with self.assertRaises(ValueError):
+            increments.apply_cycle()
+        with self.assertRaises(ValueError):
+            increments.rollback_cycle(cycle)
+
+        call_command('apply_increments', rollback=cycle.pk, force=True, stdout=io.StringIO())
+        cycle.refresh_from_db()
+        self.assertEqual(cycle.status, IncrementCycle.ROLLED_BACK)
+        self.assertEqual(self.packages(), before)
+        self.assertEqual(self.proposals(), proposals)
+
+
+class FormulaTests(TestCase):
+
+    def setUp(self):
+        formulas.clear_cache()
+
+    def test_evaluates_in_decimal(self):
+        compiled = formulas.compile_expression('max(gross_salary * 0.1, 5000) + round(fuel / 3, 2)')
+        self.assertEqual(compiled.names, ('fuel', 'gross_salary'))
+        self.assertEqual(compiled.evaluate({'gross_salary': Decimal('100000.10'), 'fuel': 10}), Decimal('10003.340'))
+        self.assertEqual(formulas.compile_expression('2 ** 10').evaluate({}), 1024)
+        with self.assertRaises(formulas.FormulaError):
+            compiled.evaluate({'gross_salary': 1})
+        with self.assertRaises(formulas.FormulaError):
+            formulas.compile_expression('salary / 0').evaluate({'salary': 1})
+        with self.assertRaises(formulas.FormulaError):
+            formulas.compile_expression('2 ** exponent').evaluate({'exponent': 10 ** 6})
+
+    def test_rejects_anything_but_arithmetic(self):
+        for expression in (
+            '', 'salary.__class__', '__import__("os")', 'open("x")', '[salary]', 'salary if True else 1',
+            '"text"', 'max(salary, key=1)', '_c0 + 1', 'lambda: 1',
+        ):
+            with self.subTest(expression=expression), self.assertRaises(formulas.FormulaError):
+                formulas.compile_expression(expression)
+
+    def test_changes_from_other_processes_are_picked_up(self):
+        formula = Formula.objects.create(formula_name='bonus', formula_expression='gross_salary * 0.1')
+        self.assertEqual(formulas.get_compiled_many([formula.pk])[formula.pk].expression, 'gross_salary * 0.1')
+        # An update() sends no signal, like a save in another process
+        Formula.objects.filter(pk=formula.pk).update(formula_expression='gross_salary * 0.2')
+        self.assertEqual(formulas.get_compiled_many([formula.pk])[formula.pk].expression, 'gross_salary * 0.2')
+        formula.refresh_from_db()
+        self.assertEqual(formulas.evaluate(formula, {'gross_salary': 10}), 2)
+
+
+class PayrollBatchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        data.seed(employees=40, companies=2, departments=2, locations=2, seed=3)
+
+    def impacts(self):
+        return {
+            row[0]: row[1:] for row in FinalImpactPerMonth.objects.values_list('employee_id', *payroll.RESULTS)
+        }
+
+    def test_batch_matches_per_row_path_to_the_cent(self):
+        as_of = datetime.date(2026, 1, 1)
+        # One employee without a current package is skipped by both paths
+        CurrentPackageDetails.objects.filter(employee_id=Employee.objects.order_by('pk').first().pk).delete()
+        FinalImpactPerMonth.objects.update(salary=1, total_amount=1)
+        payroll.compute_batch(as_of=as_of)
+        batch = self.impacts()
+        FinalImpactPerMonth.objects.update(salary=1, total_amount=1)
+
+        employees = Employee.objects.select_related(
+            'currentpackagedetails', 'proposedpackagedetails', 'finalimpactpermonth',
+        )
+        skipped = [employee.pk for employee in employees if payroll.compute_employee(employee, as_of) is None]
+        self.assertEqual(len(skipped), 1)
+        self.assertEqual(self.impacts(), batch)
+        self.assertEqual(FinalImpactPerMonth.objects.get(employee_id=skipped[0]).salary, 1)
+
+
+class StaleImpactTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        data.seed(employees=20, companies=1, departments=2, locations=2, seed=5)
+        payroll.compute_batch()
+
+    def stale(self):
+        return set(FinalImpactPerMonth.objects.filter(is_stale=True).values_list('employee_id', flat=True))
+
+    def raise_salary(self, employee_id):
+        package = CurrentPackageDetails.objects.get(employee_id=employee_id)
+        package.gross_salary += 1000
+        with self.captureOnCommitCallbacks(execute=True):
+            package.save()
+
+    def test_created_impact_row_is_not_marked_stale(self):
+        employee = Employee.objects.order_by('pk').first()
+        impact = FinalImpactPerMonth.objects.get(employee=employee)
+        emp_status = impact.emp_status
+        impact.delete()
+        employee = Employee.objects.select_related('currentpackagedetails', 'proposedpackagedetails').get(pk=employee.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            payroll.compute_employee(employee, emp_status=emp_status)
+        self.assertFalse(FinalImpactPerMonth.objects.get(employee=employee).is_stale)
+
+    def test_input_change_is_deferred_by_default(self):
+        employee_id = Employee.objects.order_by('pk').values_list('pk', flat=True).first()
+        self.raise_salary(employee_id)
+        self.assertEqual(self.stale(), {employee_id})
+
+        call_command('payroll_worker', once=True, stdout=io.StringIO())
+        self.assertEqual(self.stale(), set())
+
+    @override_settings(PAYROLL_RECOMPUTE_ON_SAVE=True)
+    def test_input_change_recomputes_on_commit_when_enabled(self):
+        employee_id = Employee.objects.order_by('pk').values_list('pk', flat=True).first()
+        self.raise_salary(employee_id)
+        self.assertEqual(self.stale(), set())
+
+    @override_settings(PAYROLL_RUN_CHUNK_SIZE=5)
+    def test_worker_once_exits_with_stale_rows_left(self):
+        FinalImpactPerMonth.objects.update(is_stale=True)
+        call_command('payroll_worker', once=True, stdout=io.StringIO())
+        self.assertEqual(len(self.stale()), 15)
+
+    def test_worker_backs_off_and_keeps_polling_after_errors(self):
+        class Stop(Exception):
+            pass
+
+        idle = {'computed': 0, 'updated': 0, 'created': 0, 'skipped': 0}
+        stderr = io.StringIO()
+        # close_old_connections() would close the test's connection, which is not in autocommit mode
+        with mock.patch.object(payroll, 'recompute_stale', side_effect=[DatabaseError('gone'), idle]) as recompute, \
+                mock.patch('time.sleep', side_effect=[None, Stop]) as sleep, \
+                mock.patch('user.management.commands.payroll_worker.close_old_connections'):
+            with self.assertRaises(Stop):
+                call_command('payroll_worker', poll=1, stdout=io.StringIO(), stderr=stderr)
+        self.assertEqual(recompute.call_count, 2)
+        self.assertEqual([call.args for call in sleep.call_args_list], [(2,), (1,)])
+        self.assertIn('retrying in 2s: gone', stderr.getvalue())
+
+        with mock.patch.object(payroll, 'recompute_stale', side_effect=formulas.FormulaError('bad')):
+            with self.assertRaisesMessage(CommandError, 'bad'):
+                call_command('payroll_worker', once=True, stdout=io.StringIO())
+
+    def test_recompute_stale_limit(self):
+        FinalImpactPerMonth.objects.update(is_stale=True)
+        self.assertEqual(payroll.recompute_stale(limit=5)['updated'], 5)
+        self.assertEqual(len(self.stale()), 15)
+
+
+class ImporterTests(TestCase):
+
+    header = 'fullname,date_of_joining,company,designation,department,section,location,gross_salary\n'
+
+    def csv(self, *lines, encoding='utf-8'):
+        return io.BytesIO((self.header + ''.join(f'{line}\n' for line in lines)).encode(encoding))
+
+    def row(self, name='Ali Raza', company='Acme', salary='50000'):
+        return f'{name},01/02/2020,{company},Engineer,IT,Backend,Lahore,{salary}'
+
+    def test_non_utf8_file_is_a_file_level_error(self):
+        file = self.csv(self.row(), self.row(name='José'), encoding='cp1252')
+        result = importers.import_file(file, 'employees.csv', chunk_size=1)
+        self.assertEqual(result.created, 1)
+        self.assertEqual(len(result.errors), 1)
+        self.assertIsNone(result.errors[0]['row'])
+        self.assertIn('UTF-8', result.errors[0]['error'])
+
+    def test_values_are_checked_against_the_model_fields(self):
+        file = self.csv(
+            self.row(salary='123456789.00'),
+            self.row(salary='1.234'),
+            self.row(name='x' * 256),
+            self.row(company='c' * 256),
+            self.row(),
+        )
+        result = importers.import_file(file, 'employees.csv')
+        self.assertEqual(result.created, 1)
+        self.assertEqual([error['row'] for error in result.errors], [2, 3, 4, 5])
+        self.assertTrue(result.errors[0]['error'].startswith('gross_salary:'))
+        self.assertTrue(result.errors[2]['error'].startswith('fullname:'))
+
+    def test_row_numbers_count_blank_lines(self):
+        result = importers.import_file(self.csv('', ',,,', self.row(salary='lots')), 'employees.csv')
+        self.assertEqual(result.errors, [{'row': 4, 'error': "gross_salary: 'lots' is not a number"}])
+
+    def test_lookups_created_by_a_rolled_back_chunk_are_forgotten(self):
+        bulk_create = Employee.objects.bulk_create
+        calls = []
+
+        def fail_once(objs, *args, **kwargs):
+            calls.append(objs)
+            if len(calls) == 1:
+                raise DatabaseError('boom')
+            return bulk_create(objs, *args, **kwargs)
+
+        file = self.csv(self.row(company='New Co'), self.row(company='New Co'))
+        with mock.patch.object(Employee.objects, 'bulk_create', side_effect=fail_once):
+            result = importers.import_file(file, 'employees.csv', chunk_size=1)
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors, [{'row': 2, 'error': 'Chunk rolled back: boom'}])
+        self.assertEqual(Employee.objects.get().company_name, Company.objects.get(name='New Co'))
+
+    def test_lookups_are_created_in_the_chunk_transaction(self):
+        with mock.patch.object(Employee.objects, 'bulk_create', side_effect=DatabaseError('boom')):
+            result = importers.import_file(self.csv(self.row(company='New Co')), 'employees.csv')
+        self.assertEqual(result.created, 0)
+        self.assertFalse(Company.objects.filter(name='New Co').exists())
+
+
+class ExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        data.seed(employees=3, companies=1, departments=1, locations=1, seed=7)
+        cls.employee = Employee.objects.order_by('pk').first()
+        cls.employee.fullname = '=HYPERLINK("http://example.com","x")'
+        cls.employee.save()
+
+    def test_csv_neutralizes_formulas(self):
+        content = b''.join(exporters.stream_export('csv')).decode()
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][1], "'" + self.employee.fullname)
+        # Numbers, negative or not, are not text
+        self.assertEqual(exporters._csv_cell(Decimal('-5')), Decimal('-5'))
+        for value in ('+1', '-1', '@SUM(A1)', '\tx'):
+            self.assertEqual(exporters._csv_cell(value), "'" + value)
+
+    def test_xlsx_dates_are_date_cells(self):
+        from openpyxl import load_workbook
+
+        content = b''.join(exporters.stream_export('xlsx'))
+        sheet = load_workbook(io.BytesIO(content)).worksheets[0]
+        rows = list(sheet.iter_rows(min_row=2))
+        self.assertEqual(len(rows), 3)
+        column = [header for header, _ in exporters.COLUMNS].index('Date of Joining')
+        cell = rows[0][column]
+        self.assertTrue(cell.is_date)
+        self.assertEqual(cell.value.date(), self.employee.date_of_joining)
+        # Inline strings are not evaluated, so the name is kept as is
+        self.assertEqual(rows[0][1].value, self.employee.fullname)
+
+
+class LookupCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        data.seed(employees=10, companies=2, departments=2, locations=2, seed=9)
+
+    def setUp(self):
+        for model in lookups.LOOKUP_MODELS:
+            lookups.get_cache(model).invalidate()
+
+    def test_attached_lookups_run_no_queries_once_warm(self):
+        list(Employee.objects.with_cached_lookups())
+        with self.assertNumQueries(1):
+            employees = list(Employee.objects.with_cached_lookups())
+        with self.assertNumQueries(0):
+            for employee in employees:
+                employee.company_name.name, employee.department.name, employee.location.location
+                employee.designation.title, employee.section.name
+            lookups.get_id(Company, employees[0].company_name.name)
+
+    def test_save_invalidates(self):
+        company = Company.objects.order_by('pk').first()
+        self.assertEqual(lookups.get(Company, company.pk).name, company.name)
+        with self.captureOnCommitCallbacks(execute=True):
+            company.name = 'Renamed Ltd'
+            company.save()
+        self.assertEqual(lookups.get(Company, company.pk).name, 'Renamed Ltd')
+        self.assertEqual(lookups.get_id(Company, 'renamed  LTD'), company.pk)
+
+    def test_invalidate_keeps_the_maps_readers_hold(self):
+        cache = lookups.get_cache(Company)
+        cache.ensure_loaded()
+        objects = cache.objects
+        cache.invalidate()
+        # Only marked stale: a reader between the two lines still has maps
+        self.assertIs(cache.objects, objects)
+        self.assertFalse(cache.is_fresh())
+        cache.ensure_loaded()
+        self.assertIsNot(cache.objects, objects)
+
+    def test_load_racing_with_invalidate_is_not_trusted(self):
+        cache = lookups.get_cache(Company)
+        load = cache.load
+
+        def load_then_invalidate():
+            load()
+            cache.invalidate()
+
+        with mock.patch.object(cache, 'load', side_effect=load_then_invalidate):
+            cache.ensure_loaded()
+        self.assertFalse(cache.is_fresh())
+
+
+class PayrollRunTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        data.seed(employees=12, companies=1, departments=1, locations=1, seed=11)
+        cls.company = Company.objects.get()
+
+    def create_run(self):
+        return payroll_runs.create_run(self.company, chunk_size=5)
+
+    def test_reclaimed_chunk_is_recorded_once(self):
+        run = self.create_run()
+        stalled = payroll_runs.claim_chunk(run.pk, worker='a')
+        # Past the lease, another worker takes it over
+        PayrollRunChunk.objects.filter(pk=stalled.pk).update(
+            started_at=timezone.now() - datetime.timedelta(seconds=settings.PAYROLL_RUN_LEASE_SECONDS + 1),
+        )
+        stalled.refresh_from_db()
+        reclaimed = payroll_runs.claim_chunk(run.pk, worker='b')
+        self.assertEqual(reclaimed.pk, stalled.pk)
+        self.assertEqual(reclaimed.attempts, 2)
+
+        payroll_runs.process_chunk(stalled)
+        reclaimed.refresh_from_db()
+        self.assertEqual((reclaimed.status, reclaimed.worker), (PayrollRun.RUNNING, 'b'))
+        payroll_runs.process_chunk(reclaimed)
+        payroll_runs.work(run.pk)
+
+        run.refresh_from_db()
+        self.assertEqual(run.status, PayrollRun.DONE)
+        self.assertEqual((run.completed_chunks, run.processed_employees), (3, 12))
+
+    @override_settings(PAYROLL_RUN_MAX_ATTEMPTS=2, PAYROLL_RUN_RETRY_DELAY=60)
+    def test_failed_chunks_back_off_and_resume(self):
+        run = self.create_run()
+        with mock.patch.object(payroll, 'compute_batch', side_effect=RuntimeError('boom')):
+            self.assertEqual(payroll_runs.work(run.pk), 3)
+            chunk = PayrollRunChunk.objects.get(run=run, index=0)
+            self.assertEqual((chunk.status, chunk.attempts), (PayrollRun.PENDING, 1))
+            self.assertGreater(chunk.retry_at, timezone.now() + datetime.timedelta(seconds=50))
+            # Nothing is due yet
+            self.assertEqual(payroll_runs.work(run.pk), 0)
+
+            PayrollRunChunk.objects.update(retry_at=timezone.now())
+            self.assertEqual(payroll_runs.work(run.pk), 3)
+        run.refresh_from_db()
+        self.assertEqual(run.status, PayrollRun.FAILED)
+        self.assertEqual(set(run.chunks.values_list('status', flat=True)), {PayrollRun.FAILED})
+        self.assertIn('RuntimeError: boom', run.chunks.first().error)
+
+        payroll_runs.resume(run.pk)
+        self.assertEqual(payroll_runs.work(run.pk), 3)
+        run.refresh_from_db()
+        self.assertEqual(run.status, PayrollRun.DONE)
+        self.assertEqual((run.completed_chunks, run.processed_employees), (3, 12))
+
+
+@override_settings(API_MODEL_PERMISSIONS=True)
+class AsyncViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        data.seed(employees=3, companies=1, departments=1, locations=1, seed=13)
+        cls.user = CustomUser.objects.create(email='viewer@example.com', full_name='Viewer')
+        cls.employee = Employee.objects.order_by('pk').first()
+
+    def urls(self):
+        return {
+            reverse('async-employee', args=[self.employee.pk]): 'view_employee',
+            reverse('async-employee-package', args=[self.employee.pk]): 'view_employee',
+            reverse('async-payroll-summary'): 'view_payrollsummary',
+        }
+
+    def test_anonymous_is_rejected(self):
+        for url in self.urls():
+            self.assertEqual(self.client.get(url).status_code, 401, url)
+
+    def test_model_permission_is_required(self):
+        self.client.force_login(self.user)
+        for url, codename in self.urls().items():
+            self.assertEqual(self.client.get(url).status_code, 403, url)
+            self.user.user_permissions.add(Permission.objects.get(codename=codename))
+            self.assertEqual(self.client.get(url).status_code, 200, url)
+            self.user.user_permissions.clear()
+
+
+class ProvisioningTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.gender = Gender.objects.create(gender='Female')
+        CustomUser.objects.create(email='taken@example.com', full_name='Taken', contact='0300')
+
+    def row(self, index, **values):
+        return {
+            'full_name': f'User {index}', 'email': f'user{index}@example.com', 'gender': 'female',
+            'contact': f'0311{index:04}', **values,
+        }
+
+    def test_bulk_create_users(self):
+        rows = [
+            self.row(0, groups=['HR']),
+            self.row(1, gender='Other'),
+            self.row(2, gender=''),
+            self.row(3, email='taken@example.com'),
+            self.row(4, email='USER0@example.com'),
+            self.row(5, password='s3cret-Passw0rd'),
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            users, errors = CustomUser.objects.bulk_create_users(rows, groups=['Staff'], workers=1)
+        self.assertEqual(errors, [
+            (1, "Unknown gender 'Other'"),
+            (2, "Please Provide Gender"),
+            (3, "Email or contact already registered"),
+            (4, "Duplicate email or contact in input"),
+        ])
+        self.assertEqual([user.email for user in users], ['user0@example.com', 'user5@example.com'])
+        first, second = (CustomUser.objects.get(pk=user.pk) for user in users)
+        self.assertEqual(first.gender, self.gender)
+        self.assertFalse(first.has_usable_password())
+        self.assertTrue(second.check_password('s3cret-Passw0rd'))
+        self.assertEqual(sorted(first.groups.values_list('name', flat=True)), ['HR', 'Staff'])
+        # Done by hand, as bulk_create sends no post_save
+        indexed = SearchEntry.objects.filter(kind=SearchEntry.USER).values_list('object_id', flat=True)
+        self.assertLessEqual({user.pk for user in users}, set(indexed))
+        self.assertTrue(permissions.in_group(first, 'HR'))
+
+    def test_emails_are_compared_casefolded_and_races_are_reported(self):
+        hash_passwords = provisioning.hash_passwords
+
+        def registered_meanwhile(*args):
+            # Another upload inserts user1 between the existence check and the insert
+            CustomUser.objects.create(email='user1@example.com', full_name='Other', contact='0399')
+            return hash_passwords(*args)
+
+        rows = [self.row(0, email='TAKEN@Example.com'), self.row(1), self.row(2)]
+        with mock.patch.object(provisioning, 'hash_passwords', side_effect=registered_meanwhile):
+            users, errors = CustomUser.objects.bulk_create_users(rows, invite=True, workers=1)
+        self.assertEqual(errors, [(0, "Email or contact already registered"), (1, "Email or contact already registered")])
+        self.assertEqual([user.email for user in users], ['user2@example.com'])
+        self.assertEqual(CustomUser.objects.get(email='user1@example.com').full_name, 'Other')
+        self.assertTrue(SearchEntry.objects.filter(kind=SearchEntry.USER, object_id=users[0].pk).exists())
+
+    def test_invite_is_accepted_once(self):
+        (user,), _ = CustomUser.objects.bulk_create_users([self.row(0)], invite=True, workers=1)
+        uid, token = provisioning.invite_token(user)
+        client = APIClient()
+        url = reverse('invite-accept')
+
+        response = client.post(url, {'uid': uid, 'token': token, 'password': 'short'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.data)
+        response = client.post(url, {'uid': uid, 'token': token, 'password': 'a-Long-enough-passw0rd'})
+        self.assertEqual(response.status_code, 204)
+        self.assertTrue(CustomUser.objects.get(pk=user.pk).check_password('a-Long-enough-passw0rd'))
+        response = client.post(url, {'uid': uid, 'token': token, 'password': 'another-Long-passw0rd'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(client.post(url, {'uid': 'x', 'token': token, 'password': 'p'}).status_code, 400)
+
+
+class AuthenticationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(email='api@example.com', full_name='API', is_staff=True)
+        cls.user.set_password('first-Passw0rd')
+        cls.user.save()
+
+    def setUp(self):
+        caches[settings.AUTH_CREDENTIALS_CACHE_ALIAS].clear()
+
+    def get(self, password):
+        credentials = base64.b64encode(f'api@example.com:{password}'.encode()).decode()
+        return APIClient().get(reverse('employee-list'), HTTP_AUTHORIZATION=f'Basic {credentials}')
+
+    def test_verified_credentials_are_cached_until_the_password_changes(self):
+        with mock.patch('django.contrib.auth.base_user.check_password', wraps=check_password) as check:
+            self.assertEqual(self.get('first-Passw0rd').status_code, 200)
+            self.assertEqual(self.get('first-Passw0rd').status_code, 200)
+            self.assertEqual(check.call_count, 1)
+
+            user = CustomUser.objects.get(pk=self.user.pk)
+            user.set_password('second-Passw0rd')
+            user.save()
+            # 403, not 401: SessionAuthentication, listed first, sends no challenge
+            self.assertEqual(self.get('first-Passw0rd').status_code, 403)
+            self.assertEqual(self.get('second-Passw0rd').status_code, 200)
+
+            CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+            self.assertEqual(self.get('second-Passw0rd').status_code, 403)
+
+    @override_settings(
+        PASSWORD_HASHERS=['user.hashers.ScryptPasswordHasher', 'user.hashers.PBKDF2PasswordHasher'],
+        PASSWORD_SCRYPT_WORK_FACTOR=2 ** 10,
+    )
+    def test_password_is_rehashed_with_the_chosen_hasher_on_login(self):
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+        self.assertEqual(self.get('first-Passw0rd').status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('scrypt$'))
+        self.assertEqual(identify_hasher(self.user.password).work_factor, 2 ** 10)
+
+    def test_hasher_check(self):
+        with override_settings(PASSWORD_HASHER='pbkdf2'):
+            self.assertEqual(checks.check_password_hasher(None), [])
+        with override_settings(PASSWORD_HASHER='argon2'), mock.patch.dict('sys.modules', {'argon2': None}):
+            self.assertEqual([error.id for error in checks.check_password_hasher(None)], ['user.E001'])
+
+
+class PackageHistoryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        data.seed(employees=2, companies=1, departments=1, locations=1, seed=17)
+        cls.employee = Employee.objects.order_by('pk').first()
+
+    def salary_on(self, date):
+        package = history.package_as_of(self.employee, date)
+        return package and package.gross_salary
+
+    def set_salary(self, salary, effective):
+        package = CurrentPackageDetails.objects.get(employee=self.employee)
+        package.gross_salary = salary
+        with history.effective(effective):
+            package.save()
+
+    def test_as_of_applies_rows_in_effective_order(self):
+        # Seeded packages have no history yet; record the starting point
+        PackageHistory.objects.all().delete()
+        history.record_many(CurrentPackageDetails.objects.filter(employee=self.employee))
+        PackageHistory.objects.update(effective_date=datetime.date(2025, 1, 1))
+
+        self.set_salary(Decimal('120000.00'), datetime.date(2026, 3, 1))
+        # Backdated correction recorded after the March raise
+        self.set_salary(Decimal('110000.00'), datetime.date(2026, 2, 1))
+
+        self.assertIsNone(self.salary_on(datetime.date(2024, 12, 31)))
+        start = self.salary_on(datetime.date(2025, 1, 1))
+        self.assertIsNotNone(start)
+        self.assertEqual(self.salary_on(datetime.date(2026, 1, 31)), start)
+        self.assertEqual(self.salary_on(datetime.date(2026, 2, 15)), Decimal('110000.00'))
+        self.assertEqual(self.salary_on(datetime.date(2026, 3, 1)), Decimal('120000.00'))
+        self.assertEqual(
+            history.salary_changes([self.employee.pk], datetime.date(2026, 2, 1), datetime.date(2026, 3, 1)),
+            {self.employee.pk: (Decimal('110000.00'), Decimal('120000.00'))},
+        )
+
+    def test_deleted_package_is_not_in_force_afterwards(self):
+        self.set_salary(Decimal('90000.00'), datetime.date(2026, 1, 1))
+        with history.effective(datetime.date(2026, 6, 1)):
+            CurrentPackageDetails.objects.filter(employee=self.employee).delete()
+        self.assertEqual(self.salary_on(datetime.date(2026, 5, 31)), Decimal('90000.00'))
+        self.assertIsNone(self.salary_on(datetime.date(2026, 6, 1)))
+
+        # A new package starts from scratch
+        CurrentPackageDetails.objects.create(
+            employee=self.employee, gross_salary=Decimal('95000.00'), vehicle=0, fuel_limit=0, mobile_allowance=0,
+        )
+        self.assertEqual(self.salary_on(timezone.localdate()), Decimal('95000.00'))
+
+    def test_history_outlives_the_employee(self):
+        self.set_salary(Decimal('90000.00'), datetime.date(2026, 1, 1))
+        employee_id = self.employee.pk
+        self.employee.delete()
+        self.assertTrue(PackageHistory.objects.filter(employee_id=employee_id, deleted=True).exists())
+        self.assertIsNone(history.package_as_of(employee_id, timezone.localdate()))
+        self.assertEqual(history.package_as_of(employee_id, datetime.date(2026, 1, 1)).gross_salary, Decimal('90000.00'))
+
+
+class ProjectionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        data.seed(employees=15, companies=2, departments=1, locations=1, seed=19)
+
+    def test_matches_per_employee_per_month_evaluation(self):
+        start, years = datetime.date(2026, 1, 15), 2
+        report = projections.project(years=years, start=start)
+        by_company = projections.project(years=years, start=start, group_by='company_name_id')
+
+        employees = Employee.objects.filter(currentpackagedetails__isnull=False).select_related(
+            'currentpackagedetails', 'proposedpackagedetails', 'finalimpactpermonth',
+        )
+        expected = []
+        for date in projections.month_ends(start, years * 12):
+            row = dict.fromkeys(projections.PROJECTED, Decimal(0))
+            for employee in employees:
+                owners = {
+                    ProposedPackageDetails: getattr(employee, 'proposedpackagedetails', None),
+                    FinalImpactPerMonth: getattr(employee, 'finalimpactpermonth', None),
+                }
+                formula_objects = {
+                    variable: getattr(owners[model], field, None) for variable, model, field, _ in payroll.STEPS
+                }
+                values = payroll.compute_values(payroll.employee_variables(employee, date), formula_objects)
+                for variable in projections.PROJECTED:
+                    row[variable] += values[variable]
+            expected.append(row)
+
+        rows = report[None]
+        self.assertEqual(len(rows), 24)
+        accrued = dict.fromkeys(projections.PROJECTED, Decimal(0))
+        for month, (row, want) in enumerate(zip(rows, expected)):
+            for variable in projections.PROJECTED:
+                accrued[variable] += want[variable]
+                self.assertEqual(row[variable], want[variable], (month, variable))
+                self.assertEqual(row[f'{variable}_accrued'], accrued[variable], (month, variable))
+                self.assertEqual(sum(group[month][variable] for group in by_company.values()), want[variable])
+        # The horizon crosses joining anniversaries, so amounts do change
+        self.assertNotEqual(rows[0]['gratuity'], rows[-1]['gratuity'])
+
+
+class ScenarioTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        data.seed(employees=12, companies=2, departments=2, locations=1, seed=21)
+        payroll.compute_batch()
+        cls.user = CustomUser.objects.create(email='hr@example.com', full_name='HR', is_staff=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, *scenarios, **extra):
+        return self.client.post(
+            reverse('payroll-scenarios'), {'scenarios': list(scenarios), **extra}, format='json',
+        )
+
+    def test_baseline_and_flat_increment(self):
+        response = self.post({'name': 'same'}, {'name': 'flat', 'increment_percentage': '10'}, group_by=[])
+        self.assertEqual(response.status_code, 200)
+        same, flat = response.json()
+        self.assertEqual(Decimal(same['total']['total_delta']), 0)
+        self.assertEqual(same['total']['headcount'], Employee.objects.filter(currentpackagedetails__isnull=False).count())
+        self.assertEqual(len(flat['groups']), 1)
+        self.assertEqual(flat['groups'][0]['headcount'], flat['total']['headcount'])
+
+    def test_override_formula(self):
+        formula = Formula.objects.create(formula_name='double', formula_expression='revised_salary * 2')
+        response = self.post({'name': 'double', 'formulas': {'bonus': formula.pk}}, group_by=['company'])
+        self.assertEqual(response.status_code, 200)
+        [result] = response.json()
+        self.assertGreater(Decimal(result['total']['total_delta']), 0)
+        self.assertEqual(len(result['groups']), 2)
+
+    def test_formulas_are_read_once_per_comparison(self):
+        formula = Formula.objects.create(formula_name='double', formula_expression='revised_salary * 2')
+
+        def formula_queries(count):
+            runs = [
+                scenarios.Scenario(f'run {index}', increment_percentage=index, formulas={'bonus': formula})
+                for index in range(count)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                scenarios.compare(runs)
+            return [query for query in queries if Formula._meta.db_table in query['sql']]
+
+        self.assertEqual(len(formula_queries(1)), 1)
+        self.assertEqual(len(formula_queries(4)), 1)
+
+    def test_unknown_variable_in_override_is_rejected(self):
+        formula = Formula.objects.create(formula_name='typo', formula_expression='gross_salry * 2')
+        response = self.post({'name': 'typo', 'formulas': {'bonus': formula.pk}})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('gross_salry', str(response.json()))
+        # A later step is not available to an earlier one either
+        formula = Formula.objects.create(formula_name='early', formula_expression='total')
+        response = self.post({'name': 'early', 'formulas': {'gratuity': formula.pk}})
+        self.assertEqual(response.status_code, 400)
+
+    def test_evaluation_error_is_a_bad_request(self):
+        formula = Formula.objects.create(formula_name='zero', formula_expression='gross_salary / 0')
+        response = self.post({'name': 'zero', 'formulas': {'bonus': formula.pk}})
+        self.assertEqual(response.status_code, 400)
+
+    def test_requires_staff(self):
+        self.client.force_authenticate(CustomUser.objects.create(email='emp@example.com', full_name='Emp'))
+        self.assertEqual(self.post({'name': 'flat'}).status_code, 403)
+
+    @override_settings(API_MODEL_PERMISSIONS=True)
+    def test_requires_view_permission_on_impacts(self):
+        self.assertEqual(self.post({'name': 'flat'}).status_code, 403)
+        self.user.user_permissions.add(Permission.objects.get(codename='view_finalimpactpermonth'))
+        self.client.force_authenticate(CustomUser.objects.get(pk=self.user.pk))
+        self.assertEqual(self.post({'name': 'flat'}).status_code, 200)
+
+
+@override_settings(EMPLOYEE_THUMBNAIL_SIZES=(16,), EMPLOYEE_THUMBNAILS_IN_BACKGROUND=False)
+class EmployeeImageTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        data.seed(employees=2, companies=1, departments=1, locations=1, seed=23)
+        cls.user = CustomUser.objects.create(email='hr@example.com', full_name='HR', is_staff=True)
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.employee = Employee.objects.order_by('pk').first()
+        self.url = reverse('employee-image', args=[self.employee.pk])
+
+    def png(self, size=(40, 30)):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, 'PNG')
+        return SimpleUploadedFile('photo.png', buffer.getvalue(), content_type='image/png')
+
+    def upload(self, file):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, {'image': file}, format='multipart')
+
+    def test_upload_makes_thumbnails_and_answers_304(self):
+        response = self.upload(self.png())
+        self.assertEqual(response.status_code, 201)
+        name = response.json()['image']
+        self.assertTrue(default_storage.exists(images.thumbnail_name(name, 16)))
+
+        response = self.client.get(self.url, {'size': 16})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        etag = response['ETag']
+        self.assertTrue(etag.endswith('-16"'))
+        response = self.client.get(self.url, {'size': 16}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # The original has its own ETag
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_pending_thumbnail_serves_the_original(self):
+        with mock.patch.object(images, 'schedule_thumbnails') as schedule:
+            name = self.upload(self.png()).json()['image']
+            response = self.client.get(self.url, {'size': 16})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['ETag'], f'"{images.etag(name)}"')
+        self.assertIn('no-cache', response['Cache-Control'])
+        schedule.assert_called_with(name)
+        self.assertFalse(default_storage.exists(images.thumbnail_name(name, 16)))
+
+    @override_settings(EMPLOYEE_THUMBNAILS_IN_BACKGROUND=True)
+    def test_background_failures_are_logged(self):
+        self.addCleanup(setattr, images, '_executor', None)
+        with self.assertLogs('user.images', 'ERROR') as logs:
+            images.schedule_thumbnails('employee_images/missing.png')
+            images._executor.shutdown(wait=True)
+        self.assertIn('employee_images/missing.png', logs.output[0])
+        self.assertEqual(images._pending, set())
+
+    def test_generate_thumbnails_continues_past_unreadable_images(self):
+        from PIL import Image
+
+        name = self.upload(self.png()).json()['image']
+        broken = default_storage.save('employee_images/broken.png', ContentFile(b'not an image'))
+        Employee.objects.exclude(pk=self.employee.pk).update(image=broken)
+
+        stderr = io.StringIO()
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 100):
+            call_command('generate_thumbnails', force=True, stdout=io.StringIO(), stderr=stderr)
+        self.assertIn(f'{name}: DecompressionBombError', stderr.getvalue())
+        self.assertIn(f'{broken}: UnidentifiedImageError', stderr.getvalue())
+
+        stdout = io.StringIO()
+        call_command('generate_thumbnails', force=True, stdout=stdout, stderr=io.StringIO())
+        self.assertEqual(stdout.getvalue().strip(), "Made 1 thumbnails (1 images unreadable)")
+
+    @override_settings(EMPLOYEE_IMAGE_MAX_BYTES=1000)
+    def test_rejects_files_over_the_size_limit(self):
+        file = self.png((100, 100))
+        file.file.seek(0, io.SEEK_END)
+        file.file.write(b'\0' * 1000)
+        file.file.seek(0)
+        response = self.upload(file)
+        self.assertEqual(response.status_code, 413)
+        self.employee.refresh_from_db()
+        self.assertFalse(self.employee.image)
+
+    @override_settings(EMPLOYEE_IMAGE_MAX_PIXELS=1000)
+    def test_rejects_images_over_the_pixel_limit(self):
+        response = self.upload(self.png((40, 30)))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('1000 pixels', response.json()['detail'])
+
+    @override_settings(API_MODEL_PERMISSIONS=True)
+    def test_requires_model_permissions(self):
+        self.assertEqual(self.upload(self.png()).status_code, 403)
+        self.user.user_permissions.add(Permission.objects.get(codename='change_employee'))
+        self.client.force_authenticate(CustomUser.objects.get(pk=self.user.pk))
+        self.assertEqual(self.upload(self.png()).status_code, 201)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.user.user_permissions.add(Permission.objects.get(codename='view_employee'))
+        self.client.force_authenticate(CustomUser.objects.get(pk=self.user.pk))
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_rejects_decompression_bombs(self):
+        from PIL import Image
+
+        # Pillow refuses to open images over twice MAX_IMAGE_PIXELS
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 100):
+            response = self.upload(self.png((40, 30)))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['detail'], "Not a valid image")
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class SeedDataTests(TestCase):
+
+    def test_refuses_to_seed_twice_without_flush(self):
+        call_command('seed_data', employees=3, companies=1, departments=1, sections=1, designations=1, locations=1,
+                     stdout=io.StringIO())
+        with self.assertRaisesMessage(CommandError, '--flush'):
+            call_command('seed_data', employees=3, stdout=io.StringIO())
+        self.assertEqual(Company.objects.count(), 1)
+        self.assertEqual(Employee.objects.count(), 3)
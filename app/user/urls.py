@@ -1,4 +1,3 @@
-
 from django.urls import path
 from . import views
 
@@ -6,4 +5,19 @@ urlpatterns = [
     # path('login/', views.login_view, name='login'),
     # path('signup/', views.signup_view, name='signup'),
     # add any other user-related URLs
-]
\ No newline at end of file
+    path('employees/', views.EmployeeListView.as_view(), name='employee-list'),
+    path('employees/<int:pk>/', views.EmployeeDetailView.as_view(), name='employee-detail'),
+    path('employees/<int:pk>/image/', views.EmployeeImageView.as_view(), name='employee-image'),
+    path('employees/import/', views.EmployeeImportView.as_view(), name='employee-import'),
+    path('search/', views.SearchView.as_view(), name='search'),
+    path('users/invite/accept/', views.InviteAcceptView.as_view(), name='invite-accept'),
+    path('org/cost/', views.OrgCostView.as_view(), name='org-cost'),
+    path('payroll/summary/', views.PayrollSummaryView.as_view(), name='payroll-summary'),
+    path('payroll/runs/', views.PayrollRunListView.as_view(), name='payroll-run-list'),
+    path('payroll/runs/<int:pk>/', views.PayrollRunDetailView.as_view(), name='payroll-run-detail'),
+    path('payroll/scenarios/', views.ScenarioCompareView.as_view(), name='payroll-scenarios'),
+    path('payroll/export.<str:file_format>', views.PayrollExportView.as_view(), name='payroll-export'),
+    path('async/employees/<int:pk>/', views.async_employee, name='async-employee'),
+    path('async/employees/<int:pk>/package/', views.async_employee_package, name='async-employee-package'),
+    path('async/payroll/summary/', views.async_payroll_summary, name='async-payroll-summary'),
+]
@@ -1,3 +1,478 @@
-from django.shortcuts import render
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from rest_framework import generics, status
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import exporters, formulas, hierarchy, images, importers, lookups, scenarios, search
+from .models import (
+    Company, CurrentPackageDetails, Department, Employee, FinalImpactPerMonth, Location, PayrollRun, PayrollSummary,
+    SearchEntry,
+)
+from .pagination import EmployeeCursorPagination
+from .permissions import ModelPermission
+from .routers import reads_from_replica, stream_from_replica
+from .serializers import (
+    EmployeeReadSerializer, InviteAcceptSerializer, PayrollRunDetailSerializer, PayrollRunSerializer,
+    PayrollSummarySerializer, ScenarioComparisonSerializer, SearchResultSerializer,
+)
 
 # Create your views here.
+
+
+class EmployeeQuerysetMixin:
+    # ?company=, ?department=, ... filter on the lookup ids
+    filters = {
+        'company': 'company_name_id',
+        'designation': 'designation_id',
+        'department': 'department_id',
+        'section': 'section_id',
+        'location': 'location_id',
+    }
+
+    def get_queryset(self):
+        return self.filter_employees(
+            Employee.objects
+            .select_related('company_name', 'designation', 'department', 'section', 'location')
+            .prefetch_related('currentpackagedetails', 'proposedpackagedetails', 'finalimpactpermonth')
+        )
+
+    def filter_employees(self, employees):
+        for param, field in self.filters.items():
+            value = self.request.query_params.get(param)
+            if value:
+                if not value.isdigit():
+                    raise ValidationError({param: "Must be an id."})
+                employees = employees.filter(**{field: value})
+        # ?under= everyone reporting to that employee, at any depth
+        manager = self.request.query_params.get('under')
+        if manager:
+            if not manager.isdigit():
+                raise ValidationError({'under': "Must be an id."})
+            employees = hierarchy.under(manager, employees)
+        return employees
+
+
+class EmployeeListView(EmployeeQuerysetMixin, generics.ListAPIView):
+    serializer_class = EmployeeReadSerializer
+    pagination_class = EmployeeCursorPagination
+    permission_classes = [IsAuthenticated, ModelPermission]
+    permission_model = Employee
+
+    @reads_from_replica
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+class EmployeeDetailView(EmployeeQuerysetMixin, generics.RetrieveAPIView):
+    serializer_class = EmployeeReadSerializer
+    permission_classes = [IsAuthenticated, ModelPermission]
+    permission_model = Employee
+
+
+class OrgCostView(EmployeeQuerysetMixin, APIView):
+    """
+    Headcount and payroll totals of the employees matching the employee
+    list filters, e.g. a department of a company or everyone ``?under=`` a
+    manager, in one query. ``?group_by=`` company, department, section or
+    location splits them.
+    """
+
+    permission_classes = [IsAdminUser, ModelPermission]
+    permission_model = CurrentPackageDetails
+
+    @reads_from_replica
+    def get(self, request):
+        group_by = [name for name in request.query_params.get('group_by', '').split(',') if name]
+        unknown = set(group_by).difference(hierarchy.ORG_FIELDS)
+        if unknown:
+            raise ValidationError({'group_by': f"Unknown: {', '.join(sorted(unknown))}."})
+
+        fields = [hierarchy.ORG_FIELDS[name] for name in group_by]
+        result = hierarchy.cost(self.filter_employees(Employee.objects.all()), fields)
+        rows = result if group_by else [result]
+        for row in rows:
+            for name, field in zip(group_by, fields):
+                row[name] = row.pop(field)
+            # Amounts as strings, like the DecimalFields of the other endpoints
+            row.update((key, str(value)) for key, value in row.items() if isinstance(value, Decimal))
+        return Response(result)
+
+
+class SearchView(APIView):
+    """
+    Ranked type-ahead search of employees and user accounts by name, email,
+    contact or company, department and designation names: ``?q=`` words,
+    optionally ``?kind=`` employee or user, ``?company=``/``?location=`` ids
+    and ``?limit=`` (at most 50). User accounts are only searched for staff
+    and users with the view_customuser permission. See ``user.search``.
+    """
+
+    permission_classes = [IsAuthenticated, ModelPermission]
+    permission_model = Employee
+    max_limit = 50
+
+    @reads_from_replica
+    def get(self, request):
+        params = request.query_params
+        for param in ('company', 'location', 'limit'):
+            if params.get(param) and not params[param].isdigit():
+                raise ValidationError({param: "Must be a number."})
+        kind = params.get('kind')
+        if kind and kind not in dict(SearchEntry.KIND_CHOICES):
+            raise ValidationError({'kind': f"Must be one of {', '.join(dict(SearchEntry.KIND_CHOICES))}."})
+        limit = min(int(params.get('limit') or 20), self.max_limit)
+        user = request.user
+        if kind != SearchEntry.EMPLOYEE and not (user.is_staff or user.has_perm('user.view_customuser')):
+            if kind == SearchEntry.USER:
+                raise PermissionDenied("You may not search user accounts.")
+            kind = SearchEntry.EMPLOYEE
+
+        results = search.search(
+            params.get('q', ''), params.get('company'), params.get('location'), kind, limit,
+        )
+        return Response(SearchResultSerializer(results, many=True).data)
+
+
+class EmployeeImageView(APIView):
+    """
+    GET an employee's image, or with ``?size=`` one of its thumbnails
+    (``EMPLOYEE_THUMBNAIL_SIZES``); answers 304 to a matching
+    If-None-Match. A thumbnail not made yet is queued and the original is
+    served, uncached, meanwhile. POST a multipart ``image`` to replace it.
+    See ``user.images``.
+    """
+
+    parser_classes = [MultiPartParser]
+
+    permission_model = Employee
+    # Replacing the image changes the employee
+    permission_actions = {'POST': 'change'}
+
+    def get_permissions(self):
+        return [IsAdminUser() if self.request.method == 'POST' else IsAuthenticated(), ModelPermission()]
+
+    def initialize_request(self, request, *args, **kwargs):
+        # Before anything reads the body, so uploads stream to disk with a size limit
+        if request.method == 'POST':
+            self.upload_handler = images.LimitedUploadHandler(request)
+            request.upload_handlers = [self.upload_handler]
+        return super().initialize_request(request, *args, **kwargs)
+
+    def get(self, request, pk):
+        name = Employee.objects.filter(pk=pk).values_list('image', flat=True).first()
+        if not name:
+            raise Http404
+        size = request.query_params.get('size')
+        if size:
+            sizes = images.thumbnail_sizes()
+            if not size.isdigit() or int(size) not in sizes:
+                return Response(
+                    {'detail': f"size must be one of {', '.join(map(str, sizes))}"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            size = int(size)
+        target = name
+        pending = False
+        if size:
+            target = images.thumbnail_name(name, size)
+            if not default_storage.exists(target):
+                # Not made in the background yet: queue it and serve the original meanwhile
+                try:
+                    images.schedule_thumbnails(name)
+                except FileNotFoundError:
+                    raise Http404 from None
+                pending = not default_storage.exists(target)
+                if pending:
+                    target, size = name, None
+        try:
+            etag = quote_etag(images.etag(name, size))
+        except FileNotFoundError:
+            raise Http404 from None
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            try:
+                response = FileResponse(default_storage.open(target, 'rb'), content_type=images.content_type(target))
+            except FileNotFoundError:
+                raise Http404 from None
+        response['ETag'] = etag
+        if pending:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(response, private=True, max_age=settings.EMPLOYEE_IMAGE_MAX_AGE)
+        return response
+
+    def post(self, request, pk):
+        employee = get_object_or_404(Employee, pk=pk)
+        upload = request.FILES.get('image')
+        if upload is None:
+            if self.upload_handler.too_large:
+                return Response(
+                    {'detail': f"Image is larger than {self.upload_handler.max_size} bytes"},
+                    status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                )
+            return Response({'detail': "No image uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            employee.image = images.store(upload)
+        except images.ImageValidationError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        employee.save(update_fields=['image'])
+        return Response({'image': employee.image.name}, status=status.HTTP_201_CREATED)
+
+
+class PayrollSummaryView(generics.ListAPIView):
+    """Maintained payroll totals per company x department x location."""
+
+    serializer_class = PayrollSummarySerializer
+    permission_classes = [IsAuthenticated, ModelPermission]
+    permission_model = PayrollSummary
+    filters = {
+        'company': 'company_id',
+        'department': 'department_id',
+        'location': 'location_id',
+    }
+
+    def get_queryset(self):
+        summaries = PayrollSummary.objects.order_by('company_id', 'department_id', 'location_id')
+        for param, field in self.filters.items():
+            value = self.request.query_params.get(param)
+            if value:
+                if not value.isdigit():
+                    raise ValidationError({param: "Must be an id."})
+                summaries = summaries.filter(**{field: value})
+        return summaries
+
+    @reads_from_replica
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+class PayrollRunListView(generics.ListCreateAPIView):
+    """
+    Queue a payroll run for a company (POST) or list recent runs. Runs
+    are processed by ``manage.py payroll_worker``, never in the request.
+    """
+
+    serializer_class = PayrollRunSerializer
+    permission_classes = [IsAdminUser, ModelPermission]
+    permission_model = PayrollRun
+    queryset = PayrollRun.objects.order_by('-id')
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
+
+class PayrollRunDetailView(generics.RetrieveAPIView):
+    serializer_class = PayrollRunDetailSerializer
+    permission_classes = [IsAdminUser, ModelPermission]
+    permission_model = PayrollRun
+    queryset = PayrollRun.objects.prefetch_related('chunks')
+
+
+class ScenarioCompareView(APIView):
+    """
+    Evaluate what-if increment scenarios against one snapshot of the
+    current packages and return totals and deltas per group. Nothing is
+    written; see ``user.scenarios``.
+    """
+
+    permission_classes = [IsAdminUser, ModelPermission]
+    permission_model = FinalImpactPerMonth
+    # Only reads
+    permission_actions = {'POST': 'view'}
+
+    @reads_from_replica
+    def post(self, request):
+        serializer = ScenarioComparisonSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        employees = Employee.objects.all()
+        if 'company' in data:
+            employees = employees.filter(company_name_id=data['company'])
+        if 'department' in data:
+            employees = employees.filter(department_id=data['department'])
+        try:
+            results = scenarios.compare(
+                [scenarios.Scenario(**scenario) for scenario in data['scenarios']],
+                employees, data.get('as_of'), data['group_by'],
+            )
+        except formulas.FormulaError as exc:
+            # e.g. a division by zero for some employee's inputs
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        # Amounts as strings, like the DecimalFields of the other endpoints
+        for result in results:
+            for row in [result['total'], *result['groups']]:
+                row.update((key, str(value)) for key, value in row.items() if isinstance(value, Decimal))
+        return Response(results)
+
+
+class EmployeeImportView(APIView):
+    """Upload a CSV/XLSX file of employees; see ``user.importers`` for the columns."""
+
+    parser_classes = [MultiPartParser]
+    permission_classes = [IsAdminUser, ModelPermission]
+    permission_model = Employee
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'detail': "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            chunk_size = int(request.data.get('chunk_size', 1000))
+        except ValueError:
+            return Response({'detail': "chunk_size must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        create_missing = str(request.data.get('create_missing', 'true')).lower() in ('1', 'true', 'yes')
+
+        try:
+            result = importers.import_file(upload, upload.name, max(chunk_size, 1), create_missing)
+        except importers.ImportDataError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result.as_dict(), status=status.HTTP_201_CREATED if result.created else status.HTTP_200_OK)
+
+
+class PayrollExportView(APIView):
+    """
+    Stream the payroll of all employees, optionally filtered by
+    ``?company=``, ``?department=`` or ``?location=`` ids.
+    """
+
+    permission_classes = [IsAdminUser, ModelPermission]
+    permission_model = CurrentPackageDetails
+    filters = {
+        'company': 'company_name_id',
+        'department': 'department_id',
+        'location': 'location_id',
+    }
+
+    @reads_from_replica
+    def get(self, request, file_format):
+        if file_format not in exporters.STREAMS:
+            return Response({'detail': f"Unsupported format {file_format!r}"}, status=status.HTTP_404_NOT_FOUND)
+
+        employees = Employee.objects.all()
+        for param, field in self.filters.items():
+            value = request.query_params.get(param)
+            if value:
+                if not value.isdigit():
+                    return Response({'detail': f"{param} must be an id"}, status=status.HTTP_400_BAD_REQUEST)
+                employees = employees.filter(**{field: value})
+
+        response = StreamingHttpResponse(
+            # Consumed after get() returns
+            stream_from_replica(exporters.stream_export(file_format, employees)),
+            content_type=exporters.CONTENT_TYPES[file_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="payroll.{file_format}"'
+        return response
+
+
+class InviteAcceptView(APIView):
+    """
+    Set the first password of an account created with ``create_users
+    --invite``: ``uid``, ``token`` (see ``provisioning.invite_token``) and
+    ``password``. The token stops working once the password is set.
+    """
+
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        serializer = InviteAcceptSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        user.set_password(serializer.validated_data['password'])
+        user.save(update_fields=['password'])
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+# Async read endpoints, served without a thread per request under ASGI
+# (pyroll.asgi). They use the async ORM and the async lookup cache, and
+# check the same permissions as their DRF counterparts.
+
+async def _require_user(request, model):
+    """Like IsAuthenticated and ModelPermission with ``permission_model = model``, for GET."""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'detail': "Authentication credentials were not provided."}, status=401)
+    opts = model._meta
+    if getattr(settings, 'API_MODEL_PERMISSIONS', False) and not await user.ahas_perm(
+        f'{opts.app_label}.view_{opts.model_name}'
+    ):
+        return JsonResponse({'detail': "You do not have permission to perform this action."}, status=403)
+    return None
+
+
+async def async_employee(request, pk):
+    if denied := await _require_user(request, Employee):
+        return denied
+    try:
+        employee = await Employee.objects.aget(pk=pk)
+    except Employee.DoesNotExist:
+        return JsonResponse({'detail': "Not found."}, status=404)
+    await lookups.aattach([employee])
+    return JsonResponse({
+        'emp_id': employee.emp_id,
+        'fullname': employee.fullname,
+        'company': employee.company_name.name,
+        'designation': employee.designation.title,
+        'department': employee.department.name,
+        'section': employee.section.name,
+        'location': employee.location.location,
+        'date_of_joining': employee.date_of_joining.isoformat(),
+    })
+
+
+async def async_employee_package(request, pk):
+    if denied := await _require_user(request, Employee):
+        return denied
+    try:
+        employee = await (
+            Employee.objects
+            .select_related('currentpackagedetails', 'proposedpackagedetails', 'finalimpactpermonth')
+            .aget(pk=pk)
+        )
+    except Employee.DoesNotExist:
+        return JsonResponse({'detail': "Not found."}, status=404)
+    await lookups.aattach([employee])
+    return JsonResponse(EmployeeReadSerializer(employee).data)
+
+
+async def async_payroll_summary(request):
+    if denied := await _require_user(request, PayrollSummary):
+        return denied
+    summaries = PayrollSummary.objects.order_by('company_id', 'department_id', 'location_id')
+    for param, field in PayrollSummaryView.filters.items():
+        value = request.GET.get(param)
+        if value:
+            if not value.isdigit():
+                return JsonResponse({param: ["Must be an id."]}, status=400)
+            summaries = summaries.filter(**{field: value})
+
+    results = []
+    async for summary in summaries:
+        company = await lookups.aget(Company, summary.company_id)
+        department = await lookups.aget(Department, summary.department_id)
+        location = await lookups.aget(Location, summary.location_id)
+        results.append({
+            'company': {'id': summary.company_id, 'name': company and company.name},
+            'department': {'id': summary.department_id, 'name': department and department.name},
+            'location': {'id': summary.location_id, 'name': location and location.location},
+            'headcount': summary.headcount,
+            'total_gross_salary': str(summary.total_gross_salary),
+            'total_revised_salary': str(summary.total_revised_salary),
+            'total_impact': str(summary.total_impact),
+            'updated_at': summary.updated_at.isoformat(),
+        })
+    return JsonResponse({'results': results})